@@ -0,0 +1,84 @@
+"""
+Benchmark merchant enrichment: dictionary compile time, cached index load time,
+and lookup throughput over a synthetic corpus of transaction descriptions.
+
+    uv run python benchmarks/bench_merchants.py --merchants 50000 --descriptions 200000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from credit_card_extraction.merchants import compile_merchant_index
+
+THAI_SYLLABLES = ["ร้าน", "กาแฟ", "สตาร์", "บัคส์", "เซเว่น", "ตลาด", "ข้าว", "มัน", "ไก่", "สาขา", "สีลม", "บางนา"]
+CITIES = ["BANGKOK TH", "CHIANG MAI TH", "MATSUBARA JP", "TOKYO JP", "SINGAPORE SG"]
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(3, 9)))
+
+
+def build_dictionary(count: int, rng: random.Random) -> list[dict]:
+    entries = []
+    for idx in range(count):
+        if idx % 5 == 0:
+            pattern = "".join(rng.choice(THAI_SYLLABLES) for _ in range(3))
+        else:
+            pattern = " ".join(_word(rng) for _ in range(rng.randint(1, 3)))
+        entries.append({"merchant": pattern.title(), "category": f"cat{idx % 40}", "patterns": [pattern]})
+    return entries
+
+
+def build_corpus(entries: list[dict], count: int, rng: random.Random) -> list[str]:
+    corpus = []
+    for _ in range(count):
+        if rng.random() < 0.7:
+            name = rng.choice(entries)["patterns"][0]
+        else:
+            name = _word(rng)
+        corpus.append(f"{name} {rng.randint(1, 9999):04d} {rng.choice(CITIES)}")
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--merchants", type=int, default=20000)
+    parser.add_argument("--descriptions", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    entries = build_dictionary(args.merchants, rng)
+    corpus = build_corpus(entries, args.descriptions, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dict_path = os.path.join(tmp, "merchants.json")
+        with open(dict_path, "w", encoding="utf-8") as fh:
+            json.dump(entries, fh, ensure_ascii=False)
+
+        started = time.perf_counter()
+        compile_merchant_index(dict_path)
+        compile_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index = compile_merchant_index(dict_path)
+        load_seconds = time.perf_counter() - started
+        cache_bytes = os.path.getsize(dict_path + ".idx")
+
+    started = time.perf_counter()
+    matched = sum(1 for description in corpus if index.lookup(description) is not None)
+    lookup_seconds = time.perf_counter() - started
+
+    print(f"merchants:        {args.merchants}")
+    print(f"descriptions:     {args.descriptions}")
+    print(f"compile:          {compile_seconds:.3f}s")
+    print(f"cached load:      {load_seconds:.3f}s ({cache_bytes / 1e6:.1f} MB)")
+    print(f"enrichment:       {lookup_seconds:.3f}s ({args.descriptions / lookup_seconds:,.0f} descriptions/s)")
+    print(f"matched:          {matched / args.descriptions:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Build a text index over synthetic transaction descriptions and report build time,
+on-disk size and search latency for selective and common queries.
+
+    uv run python benchmarks/bench_search.py --documents 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from credit_card_extraction.textindex import TextIndex
+
+LATIN = ["GRAB", "FOOD", "STARBUCKS", "SILOM", "7-ELEVEN", "LAZADA", "SHOPEE", "TOPS", "CENTRAL", "BANGKOK", "TAXI"]
+THAI = ["ร้านกาแฟ", "เซเว่น อีเลฟเว่น", "ห้างสรรพสินค้า", "ปั๊มน้ำมัน", "โรงพยาบาล", "ร้านอาหาร"]
+QUERIES = ["m42", "m42 grab", "grab food", "โรงพยาบาล m7", "ร้านกาแฟ"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200_000)
+    parser.add_argument("--merchants", type=int, default=5000, help="Distinct rare merchant words.")
+    parser.add_argument("--batch", type=int, default=2000, help="Documents per update (one statement batch).")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = LATIN + [f"M{idx}" for idx in range(args.merchants)]
+    with tempfile.TemporaryDirectory() as tmp:
+        index = TextIndex(tmp)
+        started = time.perf_counter()
+        batch = []
+        for doc_id in range(1, args.documents + 1):
+            batch.append((doc_id, " ".join(rng.sample(words, 3)) + " " + rng.choice(THAI)))
+            if len(batch) >= args.batch:
+                index.update(batch)
+                batch = []
+        index.update(batch)
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        print(f"build:    {time.perf_counter() - started:.1f}s, {index.segment_count()} segments, {size / 2**20:.1f} MB")
+
+        print(f"{'query':<16} {'hits':>8} {'exact ms':>9} {'confirm ms':>11}")
+        for query in QUERIES:
+            timings = {}
+            for exact in (True, False):
+                samples = []
+                for _ in range(args.repeat):
+                    started = time.perf_counter()
+                    hits = index.search(query, exact=exact)
+                    samples.append((time.perf_counter() - started) * 1000)
+                    if exact:
+                        count = len(hits)
+                timings[exact] = statistics.median(samples)
+            print(f"{query:<16} {count:>8} {timings[True]:>9.2f} {timings[False]:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
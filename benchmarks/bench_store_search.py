@@ -0,0 +1,87 @@
+"""
+Time `TransactionStore.query_transactions(q=...)` end to end with and without the
+text index: the first page, and walking several pages with the returned cursors.
+
+    uv run python benchmarks/bench_store_search.py --documents 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from credit_card_extraction.models import ExtractionResult, StatementHeader, Transaction
+from credit_card_extraction.store import TransactionStore
+from credit_card_extraction.textindex import TextIndex
+
+LATIN = ["GRAB", "FOOD", "STARBUCKS", "SILOM", "7-ELEVEN", "LAZADA", "SHOPEE", "TOPS", "CENTRAL", "BANGKOK", "TAXI"]
+THAI = ["ร้านกาแฟ", "เซเว่น อีเลฟเว่น", "ห้างสรรพสินค้า", "ปั๊มน้ำมัน", "โรงพยาบาล", "ร้านอาหาร"]
+QUERIES = ["m42", "m42 grab", "grab", "ร้านกาแฟ", "ร้าน", "โรงพยาบาล m7"]
+
+
+def _statements(args, rng):
+    words = LATIN + [f"M{idx}" for idx in range(args.merchants)]
+    start = date(2020, 1, 1)
+    for number in range(args.documents // args.batch):
+        yield ExtractionResult(
+            statement=StatementHeader(account_last4=f"{number % 4:04d}", statement_date=start + timedelta(days=number)),
+            transactions=[
+                Transaction(
+                    date=start + timedelta(days=number, hours=idx),
+                    description=" ".join(rng.sample(words, 3)) + " " + rng.choice(THAI),
+                    amount=round(rng.uniform(10, 5000), 2),
+                )
+                for idx in range(args.batch)
+            ],
+        )
+
+
+def _time(store, query, pages, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor, hits = None, 0
+        for _ in range(pages):
+            page = store.query_transactions(q=query, cursor=cursor, limit=100)
+            hits += len(page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), hits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200_000)
+    parser.add_argument("--merchants", type=int, default=5000, help="Distinct rare merchant words.")
+    parser.add_argument("--batch", type=int, default=2000, help="Transactions per statement.")
+    parser.add_argument("--pages", type=int, default=5, help="Pages walked per query in the second column.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "txn.sqlite3")
+        store = TransactionStore(db, text_index=TextIndex(os.path.join(tmp, "txn.textindex")))
+        started = time.perf_counter()
+        for result in _statements(args, random.Random(args.seed)):
+            store.save_result(result)
+        print(f"load:     {time.perf_counter() - started:.1f}s, {store.text_index.docs} rows")
+        plain = TransactionStore(db)
+
+        print(f"{'query':<16} {'estimate':>8} {'index ms':>9} {f'{args.pages} pages':>9} {'scan ms':>9} {f'{args.pages} pages':>9}")
+        for query in QUERIES:
+            estimate = store.text_index.estimate(query)
+            indexed = [_time(store, query, pages, args.repeat)[0] for pages in (1, args.pages)]
+            scanned = [_time(plain, query, pages, args.repeat)[0] for pages in (1, args.pages)]
+            print(
+                f"{query:<16} {estimate if estimate is not None else '-':>8} "
+                f"{indexed[0]:>9.2f} {indexed[1]:>9.2f} {scanned[0]:>9.2f} {scanned[1]:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
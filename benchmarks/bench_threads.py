@@ -0,0 +1,71 @@
+"""
+Compare the process pool (WorkerPool) with the thread pool (ThreadParsePool):
+throughput and total resident memory at several worker counts.
+
+PyMuPDF calls are serialized by FITZ_LOCK and PyMuPDF does not release the GIL,
+so on standard builds threads mostly save memory. On a free-threaded build
+(python3.13t and later) parsing runs in parallel between threads. The report
+says which kind of interpreter produced it.
+
+    uv run python benchmarks/bench_threads.py --documents 200 --workers 1,2,4
+"""
+import argparse
+import os
+import random
+import sys
+import sysconfig
+import tempfile
+import time
+
+from loadtest import SIZE_CLASSES, build_statement
+
+from credit_card_extraction.workers import ThreadParsePool, WorkerPool, current_rss_bytes, parse_task
+
+
+def run(executor, paths) -> float:
+    started = time.perf_counter()
+    for future in [executor.submit(parse_task, path) for path in paths]:
+        future.result()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=100)
+    parser.add_argument("--size", choices=sorted(SIZE_CLASSES), default="medium")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    free_threaded = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    gil_enabled = sys._is_gil_enabled() if hasattr(sys, "_is_gil_enabled") else True
+    print(f"python:           {sys.version.split()[0]} (free-threaded build: {free_threaded}, GIL enabled: {gil_enabled})")
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for idx in range(args.documents):
+            path = os.path.join(tmp, f"doc-{idx}.pdf")
+            with open(path, "wb") as fh:
+                fh.write(build_statement(*SIZE_CLASSES[args.size], rng))
+            paths.append(path)
+
+        print(f"{'mode':<8} {'workers':>7} {'docs/s':>9} {'rss MB':>9}")
+        for workers in (int(n) for n in args.workers.split(",")):
+            pool = WorkerPool(max_workers=workers)
+            run(pool, paths[:workers])  # spawn every worker before timing
+            seconds = run(pool, paths)
+            metrics = pool.metrics()
+            rss = current_rss_bytes() / 2**20 + sum(worker.rss_mb for worker in metrics.workers)
+            pool.shutdown()
+            print(f"{'process':<8} {workers:>7} {args.documents / seconds:>9.1f} {rss:>9.0f}")
+
+            threads = ThreadParsePool(max_workers=workers)
+            seconds = run(threads, paths)
+            rss = current_rss_bytes() / 2**20
+            threads.shutdown()
+            print(f"{'thread':<8} {workers:>7} {args.documents / seconds:>9.1f} {rss:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
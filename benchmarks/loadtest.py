@@ -0,0 +1,325 @@
+"""
+Load-test POST /parse with synthetic statements of several size classes.
+
+Runs fully offline, either in-process (ASGI transport, the app's own lifespan and
+worker pool) or against a running instance with --url. Closed-loop mode keeps
+--concurrency clients busy; open-loop mode sends Poisson arrivals at --rate per
+second regardless of how fast responses come back.
+
+The corpus repeats a few PDFs per size class, so the in-process app runs with its
+page and result caches disabled (--cache on to measure them); otherwise most
+requests would be cache hits and parse-path regressions would go unnoticed.
+
+    uv run python benchmarks/loadtest.py --concurrency 8 --duration 30
+    uv run python benchmarks/loadtest.py --rate 20 --duration 30 --mix small=0.8,large=0.2
+    uv run python benchmarks/loadtest.py --url http://127.0.0.1:8000 --concurrency 16 --json run.json
+    uv run python benchmarks/loadtest.py --concurrency 8 --baseline run.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+import httpx
+
+# name -> (pages, transactions per page)
+SIZE_CLASSES: Dict[str, Tuple[int, int]] = {
+    "small": (1, 20),
+    "medium": (5, 35),
+    "large": (30, 35),
+}
+MERCHANTS = ["KINSHO STORE MATSUBARA JP", "7-ELEVEN SILOM", "GRAB* TAXI BANGKOK", "STARBUCKS SIAM", "AMAZON WEB SERVICES"]
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def build_statement(pages: int, rows_per_page: int, rng: random.Random) -> bytes:
+    doc = fitz.open()
+    for page_idx in range(pages):
+        page = doc.new_page()
+        rows = []
+        if page_idx == 0:
+            rows += [
+                "1234-XXXX-XXXX-5678 Statement Date 01/01/2026 20/01/2026",
+                "123-4-56789-0 5,432.10",
+                "100,000 1,000.00 0.00 1,000.00",
+            ]
+        rows.append("Transaction Date Transaction Details Amount")
+        for _ in range(rows_per_page):
+            day = rng.randint(1, 28)
+            rows.append(
+                f"{day:02d}/12/2025 {day:02d}/12/2025 {rng.choice(MERCHANTS)} {rng.randint(1, 99999) / 100:,.2f}"
+            )
+        for idx, text in enumerate(rows):
+            page.insert_text((40, 40 + idx * 20), text, fontsize=9)
+    payload = doc.tobytes()
+    doc.close()
+    return payload
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SIZE_CLASSES:
+            raise SystemExit(f"Unknown size class {name!r}; choose from {', '.join(SIZE_CLASSES)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+@dataclass
+class Samples:
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+    def add(self, status: int, seconds: float):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 200:
+            self.latencies.append(seconds)
+
+
+def _proc_cpu_seconds(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/stat", "r") as fh:
+            fields = fh.read().rsplit(")", 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat.
+        return (int(fields[11]) + int(fields[12])) / _CLK_TCK
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+async def _worker_snapshot(client: httpx.AsyncClient) -> Dict[int, Tuple[Optional[float], float]]:
+    """
+    pid -> (CPU seconds, RSS MB) for every live parse worker. CPU is only readable
+    when the workers run on this machine.
+    """
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    snapshot = {}
+    for worker in response.json()["workers"]:
+        if worker["pid"] is not None:
+            snapshot[worker["pid"]] = (_proc_cpu_seconds(worker["pid"]), worker["rss_mb"])
+    return snapshot
+
+
+async def _send(client: httpx.AsyncClient, name: str, payload: bytes, samples: Dict[str, Samples]):
+    started = time.perf_counter()
+    try:
+        response = await client.post("/parse", files={"file": (f"{name}.pdf", payload, "application/pdf")})
+        status = response.status_code
+    except httpx.HTTPError:
+        status = 0
+    samples[name].add(status, time.perf_counter() - started)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    corpus: Dict[str, List[bytes]],
+    mix: Dict[str, float],
+    duration: float,
+    concurrency: int,
+    rate: Optional[float],
+    rng: random.Random,
+) -> Tuple[Dict[str, Samples], float]:
+    samples = {name: Samples() for name in mix}
+    names, weights = list(mix), list(mix.values())
+
+    def pick() -> Tuple[str, bytes]:
+        name = rng.choices(names, weights)[0]
+        return name, rng.choice(corpus[name])
+
+    started = time.perf_counter()
+    deadline = started + duration
+    if rate:
+        # Open loop: arrivals do not wait for earlier responses.
+        tasks = []
+        next_at = started
+        while True:
+            next_at += rng.expovariate(rate)
+            if next_at >= deadline:
+                break
+            await asyncio.sleep(max(next_at - time.perf_counter(), 0))
+            tasks.append(asyncio.create_task(_send(client, *pick(), samples)))
+        await asyncio.gather(*tasks)
+    else:
+        async def closed_loop_client():
+            while time.perf_counter() < deadline:
+                await _send(client, *pick(), samples)
+
+        await asyncio.gather(*(closed_loop_client() for _ in range(concurrency)))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples: Dict[str, Samples], elapsed: float, before: dict, after: dict) -> dict:
+    report = {"elapsed_s": elapsed, "classes": {}}
+    all_latencies: List[float] = []
+    for name, sample in samples.items():
+        latencies = sorted(sample.latencies)
+        all_latencies.extend(latencies)
+        report["classes"][name] = {
+            "requests": sum(sample.statuses.values()),
+            "ok": len(latencies),
+            "statuses": {str(code): count for code, count in sorted(sample.statuses.items())},
+            "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+    all_latencies.sort()
+    report["overall"] = {
+        "ok": len(all_latencies),
+        "throughput_rps": len(all_latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(all_latencies, 50) * 1000,
+        "p95_ms": percentile(all_latencies, 95) * 1000,
+        "p99_ms": percentile(all_latencies, 99) * 1000,
+    }
+
+    # CPU of workers that were recycled during the run is lost with their process.
+    cpu = 0.0
+    cpu_known = False
+    for pid, (cpu_after, _) in after.items():
+        cpu_before = before.get(pid, (0.0, 0.0))[0] or 0.0
+        if cpu_after is not None:
+            cpu += cpu_after - cpu_before
+            cpu_known = True
+    report["workers"] = {
+        "count": len(after),
+        "cpu_s": cpu if cpu_known else None,
+        "cpu_utilization": cpu / (elapsed * max(len(after), 1)) if cpu_known and elapsed else None,
+        "rss_mb": {str(pid): rss for pid, (_, rss) in after.items()},
+        "max_rss_mb": max((rss for _, rss in after.values()), default=0.0),
+    }
+    return report
+
+
+def print_report(report: dict):
+    print(f"elapsed: {report['elapsed_s']:.1f}s")
+    print(f"{'class':<8} {'ok':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    rows = list(report["classes"].items()) + [("overall", report["overall"])]
+    for name, row in rows:
+        print(
+            f"{name:<8} {row['ok']:>6} {row['throughput_rps']:>8.2f} {row['p50_ms']:>9.1f}"
+            f" {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f}  {row.get('statuses', '')}"
+        )
+    workers = report["workers"]
+    cpu = "n/a" if workers["cpu_s"] is None else f"{workers['cpu_s']:.1f}s ({workers['cpu_utilization']:.0%} per worker)"
+    print(f"workers: {workers['count']}  cpu: {cpu}  max rss: {workers['max_rss_mb']:.0f} MB")
+
+
+def check_regression(report: dict, baseline_path: str, max_regression: float) -> List[str]:
+    with open(baseline_path, "r") as fh:
+        baseline = json.load(fh)
+    failures = []
+    cache = baseline.get("config", {}).get("cache")
+    if cache != report["config"]["cache"]:
+        return [f"baseline was recorded with cache={cache}, this run with cache={report['config']['cache']}"]
+    for name, row in report["classes"].items():
+        base = baseline.get("classes", {}).get(name)
+        if not base or not base["ok"] or not row["ok"]:
+            continue
+        if row["p95_ms"] > base["p95_ms"] * (1 + max_regression):
+            failures.append(f"{name}: p95 {row['p95_ms']:.1f} ms vs baseline {base['p95_ms']:.1f} ms")
+        # Open-loop throughput follows the arrival rate, so only closed-loop runs are compared.
+        same_load = baseline.get("config", {}).get("mode") == report["config"]["mode"] == "closed"
+        if same_load and row["throughput_rps"] < base["throughput_rps"] * (1 - max_regression):
+            failures.append(f"{name}: {row['throughput_rps']:.2f} req/s vs baseline {base['throughput_rps']:.2f} req/s")
+    return failures
+
+
+async def _main(args) -> dict:
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    corpus = {
+        name: [build_statement(*SIZE_CLASSES[name], rng) for _ in range(args.variants)] for name in mix
+    }
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            return await _measure(client, corpus, mix, args, rng)
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ["CCE_DATA_DIR"] = data_dir
+        if args.workers:
+            os.environ["CCE_PARSE_WORKERS"] = str(args.workers)
+        if args.cache == "off":
+            os.environ["CCE_PAGE_CACHE_MB"] = "0"
+            os.environ["CCE_RESULT_CACHE_MB"] = "0"
+        from credit_card_extraction.api import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout) as client:
+                return await _measure(client, corpus, mix, args, rng)
+
+
+async def _measure(client: httpx.AsyncClient, corpus, mix, args, rng) -> dict:
+    if args.warmup:
+        # Start every worker process (they are spawned lazily) before measuring.
+        metrics = (await client.get("/metrics")).json()
+        warmup = [(name, corpus[name][0]) for name in mix] * max(len(metrics["workers"]), 1)
+        await asyncio.gather(*(_send(client, name, payload, {name: Samples()}) for name, payload in warmup))
+    before = await _worker_snapshot(client)
+    samples, elapsed = await run_load(client, corpus, mix, args.duration, args.concurrency, args.rate, rng)
+    after = await _worker_snapshot(client)
+    report = summarize(samples, elapsed, before, after)
+    report["config"] = {
+        "mode": "open" if args.rate else "closed",
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "mix": mix,
+        "target": args.url or "in-process",
+        # A running instance keeps whatever caches it was started with.
+        "cache": "server" if args.url else args.cache,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running instance; in-process when omitted.")
+    parser.add_argument("--workers", type=int, help="CCE_PARSE_WORKERS for the in-process app.")
+    parser.add_argument("--mix", default="small=0.7,medium=0.25,large=0.05", help="Size classes and weights.")
+    parser.add_argument("--variants", type=int, default=3, help="Distinct PDFs generated per size class.")
+    parser.add_argument(
+        "--cache", choices=("on", "off"), default="off", help="Page and result caches of the in-process app."
+    )
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to generate load.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Clients in closed-loop mode.")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate (requests/s, Poisson).")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="Write the report as JSON (usable as a later --baseline).")
+    parser.add_argument("--baseline", help="Fail if p95 or throughput regresses against this JSON report.")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    report = asyncio.run(_main(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(report, fh, indent=2)
+    if args.baseline:
+        failures = check_regression(report, args.baseline, args.max_regression)
+        for failure in failures:
+            print(f"REGRESSION {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+import fitz  # PyMuPDF
+
+from .extractor import FITZ_LOCK
+from .models import PreflightReport
+
+
+class ScannedDocumentError(ValueError):
+    """Raised when a PDF has no extractable text layer."""
+
+
+class AdmissionRejected(Exception):
+    """Raised when the parse queue is saturated for the request's lane."""
+
+    def __init__(self, retry_after: int, lane: str):
+        super().__init__(f"{lane} lane is saturated; retry after {retry_after}s")
+        self.retry_after = retry_after
+        self.lane = lane
+
+
+def preflight(file_path: str, sample_pages: int = 3) -> PreflightReport:
+    """
+    Cheap inspection of an upload before it is queued: page count, text-layer
+    presence (sampled from the first pages) and an estimated parse cost.
+    """
+    with FITZ_LOCK:
+        doc = fitz.open(file_path)
+        try:
+            page_count = doc.page_count
+            has_text = False
+            for page_num in range(min(sample_pages, page_count)):
+                if doc[page_num].get_text("text").strip():
+                    has_text = True
+                    break
+        finally:
+            doc.close()
+
+    return PreflightReport(
+        page_count=page_count,
+        has_text_layer=has_text,
+        cost=float(max(page_count, 1)),
+    )
+
+
+def check_text_layer(report: PreflightReport):
+    if not report.has_text_layer:
+        raise ScannedDocumentError("PDF has no text layer; scanned statements are not supported.")
+
+
+class _Lane:
+    def __init__(self, name: str, capacity: float, concurrency: int):
+        self.name = name
+        self.capacity = capacity
+        self.concurrency = concurrency
+        self.outstanding = 0.0
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+
+class AdmissionController:
+    """
+    Cost-weighted admission control for parse requests.
+
+    Requests are split into a small and a large lane by estimated cost so that
+    short statements never queue behind large bundles. Each lane admits work
+    while its outstanding cost (queued + running) stays under its capacity and
+    otherwise rejects with a Retry-After estimated from observed throughput.
+    """
+
+    def __init__(
+        self,
+        workers: int = 1,
+        small_cost: float = 20.0,
+        small_capacity: float = 200.0,
+        large_capacity: float = 2000.0,
+        initial_seconds_per_cost: float = 0.05,
+    ):
+        self.small_cost = small_cost
+        self.lanes: Dict[str, _Lane] = {
+            "small": _Lane("small", small_capacity, max(workers, 1)),
+            # Keep one worker free for the small lane whenever there is more than one.
+            "large": _Lane("large", large_capacity, max(workers - 1, 1)),
+        }
+        self.seconds_per_cost = initial_seconds_per_cost
+
+    def lane_for(self, cost: float) -> _Lane:
+        return self.lanes["small"] if cost <= self.small_cost else self.lanes["large"]
+
+    def retry_after(self, lane: _Lane) -> int:
+        backlog_seconds = lane.outstanding * self.seconds_per_cost / lane.concurrency
+        return max(1, math.ceil(backlog_seconds))
+
+    def admit(self, cost: float) -> _Lane:
+        lane = self.lane_for(cost)
+        # An idle lane always admits, so a single oversized document can still run.
+        if lane.outstanding > 0 and lane.outstanding + cost > lane.capacity:
+            raise AdmissionRejected(self.retry_after(lane), lane.name)
+        lane.outstanding += cost
+        return lane
+
+    @asynccontextmanager
+    async def slot(self, cost: float) -> AsyncIterator[_Lane]:
+        """
+        Admit a request (or raise AdmissionRejected) and hold an execution slot
+        in its lane for the duration of the block.
+        """
+        lane = self.admit(cost)
+        try:
+            async with lane.semaphore:
+                started = time.monotonic()
+                yield lane
+                self._observe(cost, time.monotonic() - started)
+        finally:
+            lane.outstanding -= cost
+
+    def _observe(self, cost: float, elapsed: float, alpha: float = 0.2):
+        sample = elapsed / max(cost, 1.0)
+        self.seconds_per_cost = (1 - alpha) * self.seconds_per_cost + alpha * sample
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {"outstanding": lane.outstanding, "capacity": lane.capacity, "concurrency": lane.concurrency}
+            for name, lane in self.lanes.items()
+        }
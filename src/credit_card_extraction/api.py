@@ -1,16 +1,152 @@
+import asyncio
 import os
 import tempfile
+import threading
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from .extractor import parse_pdf
-from .models import ExtractionResult
+from .admission import AdmissionController, AdmissionRejected, ScannedDocumentError, check_text_layer, preflight
+from .bundle import parse_bundle
+from .dedup import FingerprintIndex
+from .extractor import FieldProjection
+from .jobs import JobRunner, JobStore
+from .merchants import get_merchant_index
+from .models import (
+    BatchItem,
+    ExtractionResult,
+    JobInfo,
+    MonthlyRollup,
+    PreflightReport,
+    RuleSetInfo,
+    TransactionPage,
+    WorkerPoolMetrics,
+)
+from .pagecache import combine_page_cache_stats, configure_page_cache
+from .resultcache import configure_result_cache
+from .rules import RuleRegistry, configure_rules
+from .store import TransactionStore
+from .textindex import TextIndex
+from .workers import ThreadParsePool, WorkerPool, parse_task
 
-app = FastAPI(title="Credit Card Extraction", version="0.0.0")
+DATA_DIR_ENV = "CCE_DATA_DIR"
+JOB_WORKERS_ENV = "CCE_JOB_WORKERS"
+JOB_RETENTION_ENV = "CCE_JOB_RETENTION_SECONDS"
+JOB_MAX_ATTEMPTS_ENV = "CCE_JOB_MAX_ATTEMPTS"
+PARSE_WORKERS_ENV = "CCE_PARSE_WORKERS"
+PARSE_MODE_ENV = "CCE_PARSE_MODE"
+WORKER_MAX_TASKS_ENV = "CCE_WORKER_MAX_TASKS"
+WORKER_MAX_RSS_ENV = "CCE_WORKER_MAX_RSS_MB"
+SMALL_COST_ENV = "CCE_ADMISSION_SMALL_PAGES"
+SMALL_CAPACITY_ENV = "CCE_ADMISSION_SMALL_CAPACITY"
+LARGE_CAPACITY_ENV = "CCE_ADMISSION_LARGE_CAPACITY"
+STORE_PATH_ENV = "CCE_STORE_PATH"
+DEDUP_ENV = "CCE_DEDUP"
+TEXT_INDEX_ENV = "CCE_TEXT_INDEX"
+MERCHANT_DICT_ENV = "CCE_MERCHANT_DICT"
+PAGE_CACHE_ENV = "CCE_PAGE_CACHE_MB"
+RESULT_CACHE_ENV = "CCE_RESULT_CACHE_MB"
+BATCH_MAX_FILES_ENV = "CCE_BATCH_MAX_FILES"
+BATCH_MAX_PAGES_ENV = "CCE_BATCH_MAX_PAGES"
 
 
-@app.post("/parse", response_model=ExtractionResult)
-async def parse_statement(file: UploadFile = File(...)) -> ExtractionResult:
+def _data_dir() -> str:
+    path = os.environ.get(DATA_DIR_ENV, "var")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    parse_workers = int(os.environ.get(PARSE_WORKERS_ENV, os.cpu_count() or 1))
+    page_cache_mb = float(os.environ.get(PAGE_CACHE_ENV, 64))
+    result_cache_mb = float(os.environ.get(RESULT_CACHE_ENV, 32))
+    # Fails startup if the provider rules do not compile; workers load the same files.
+    rules = configure_rules()
+    rules.get()
+    thread_mode = os.environ.get(PARSE_MODE_ENV, "process") == "thread"
+    if thread_mode:
+        executor = ThreadParsePool(max_workers=parse_workers)
+    else:
+        executor = WorkerPool(
+            max_workers=parse_workers,
+            max_tasks_per_worker=int(os.environ.get(WORKER_MAX_TASKS_ENV, 500)),
+            max_rss_mb=float(os.environ.get(WORKER_MAX_RSS_ENV, 1024)),
+            page_cache_mb=page_cache_mb,
+            result_cache_mb=result_cache_mb,
+        )
+    # Bundles are split in this process (as is everything in thread mode), so it keeps its own page cache too.
+    page_cache = configure_page_cache(page_cache_mb)
+    result_cache = configure_result_cache(result_cache_mb if thread_mode else 0)
+    merchant_dict = os.environ.get(MERCHANT_DICT_ENV) or None
+    if merchant_dict:
+        # Compile (or validate the on-disk cache) once before workers start loading it.
+        get_merchant_index(merchant_dict)
+    admission = AdmissionController(
+        workers=parse_workers,
+        small_cost=float(os.environ.get(SMALL_COST_ENV, 20)),
+        small_capacity=float(os.environ.get(SMALL_CAPACITY_ENV, 200)),
+        large_capacity=float(os.environ.get(LARGE_CAPACITY_ENV, 2000)),
+    )
+    transaction_store = None
+    fingerprints = None
+    if os.environ.get(STORE_PATH_ENV):
+        if os.environ.get(DEDUP_ENV, "0") == "1":
+            fingerprints = FingerprintIndex(os.environ[STORE_PATH_ENV] + ".fingerprints")
+        text_index = None
+        if os.environ.get(TEXT_INDEX_ENV, "0") == "1":
+            text_index = TextIndex(os.environ[STORE_PATH_ENV] + ".textindex")
+        transaction_store = TransactionStore(
+            os.environ[STORE_PATH_ENV], fingerprints=fingerprints, text_index=text_index
+        )
+
+    def run_job(path: str) -> ExtractionResult:
+        result = executor.submit(parse_task, path, merchant_dict).result()
+        if transaction_store is not None:
+            transaction_store.save_result(result)
+        return result
+
+    store = JobStore(
+        os.path.join(_data_dir(), "jobs.sqlite3"),
+        retention_seconds=float(os.environ.get(JOB_RETENTION_ENV, 24 * 3600)),
+        max_attempts=int(os.environ.get(JOB_MAX_ATTEMPTS_ENV, "3")),
+    )
+    runner = JobRunner(store, run_job, workers=int(os.environ.get(JOB_WORKERS_ENV, "1")))
+    runner.start()
+    app.state.parse_executor = executor
+    app.state.merchant_dict = merchant_dict
+    app.state.page_cache = page_cache
+    app.state.result_cache = result_cache
+    app.state.rules = rules
+    app.state.admission = admission
+    # Bundle segments share the large lane's workers, so small statements keep a free one.
+    app.state.bundle_slots = threading.BoundedSemaphore(admission.lanes["large"].concurrency)
+    app.state.batch_max_files = int(os.environ.get(BATCH_MAX_FILES_ENV, 50))
+    app.state.batch_max_pages = float(os.environ.get(BATCH_MAX_PAGES_ENV, 200))
+    app.state.transaction_store = transaction_store
+    app.state.job_store = store
+    app.state.job_runner = runner
+    try:
+        yield
+    finally:
+        runner.stop()
+        store.close()
+        if transaction_store is not None:
+            transaction_store.close()
+        if fingerprints is not None:
+            fingerprints.close()
+        executor.shutdown(cancel_futures=True)
+
+
+app = FastAPI(title="Credit Card Extraction", version="0.0.0", lifespan=lifespan)
+
+
+async def _read_pdf_upload(file: UploadFile) -> bytes:
     if not file or not file.filename:
         raise HTTPException(status_code=400, detail="No file uploaded.")
 
@@ -18,24 +154,305 @@ async def parse_statement(file: UploadFile = File(...)) -> ExtractionResult:
     if not filename.endswith(".pdf") and file.content_type not in ("application/pdf", "application/octet-stream"):
         raise HTTPException(status_code=400, detail="Only PDF uploads are supported.")
 
-    suffix = ".pdf" if not filename.endswith(".pdf") else ""
+    payload = await file.read()
+    if not payload:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+    return payload
+
+
+def _preflight_upload(file_path: str) -> PreflightReport:
+    """
+    Opens the PDF (under the fitz lock), so handlers run it in the threadpool,
+    never on the event loop.
+    """
+    try:
+        report = preflight(file_path)
+        check_text_layer(report)
+    except ScannedDocumentError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail="Failed to open PDF.") from exc
+    return report
+
+
+async def _persist(request: Request, results: List[ExtractionResult]):
+    transaction_store: Optional[TransactionStore] = request.app.state.transaction_store
+    if transaction_store is not None:
+        await run_in_threadpool(transaction_store.save_results, results)
+
+
+def _write_temp_pdf(payload: bytes) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(payload)
+        return tmp.name
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def _parse_upload(request: Request, file: UploadFile, run):
+    payload = await _read_pdf_upload(file)
+
     temp_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            payload = await file.read()
-            if not payload:
-                raise HTTPException(status_code=400, detail="Uploaded file is empty.")
-            tmp.write(payload)
-            temp_path = tmp.name
+        temp_path = _write_temp_pdf(payload)
 
-        return parse_pdf(temp_path)
+        report = await run_in_threadpool(_preflight_upload, temp_path)
+        admission: AdmissionController = request.app.state.admission
+        async with admission.slot(report.cost):
+            return await run(temp_path)
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=503,
+            detail="Parse queue is saturated; retry later.",
+            headers={"Retry-After": str(exc.retry_after)},
+        ) from exc
     except HTTPException:
         raise
     except Exception as exc:
         raise HTTPException(status_code=400, detail="Failed to parse PDF.") from exc
     finally:
         if temp_path:
+            _remove_quietly(temp_path)
+
+
+@app.post("/parse", response_model=ExtractionResult)
+async def parse_statement(
+    request: Request,
+    file: UploadFile = File(...),
+    fields: Optional[str] = Query(None, description="Comma-separated sections or statement fields to return."),
+) -> ExtractionResult:
+    projection = None
+    if fields is not None:
+        try:
+            projection = FieldProjection.parse(fields)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    async def run(path: str) -> ExtractionResult:
+        loop = asyncio.get_running_loop()
+        if projection is not None:
+            # Partial results are returned as-is and never persisted.
+            result = await loop.run_in_executor(
+                request.app.state.parse_executor, parse_task, path, request.app.state.merchant_dict, projection
+            )
+            return JSONResponse(projection.apply(result))
+        result = await loop.run_in_executor(
+            request.app.state.parse_executor, parse_task, path, request.app.state.merchant_dict
+        )
+        await _persist(request, [result])
+        return result
+
+    return await _parse_upload(request, file, run)
+
+
+@app.post("/parse/bundle", response_model=List[ExtractionResult])
+async def parse_statement_bundle(request: Request, file: UploadFile = File(...)) -> List[ExtractionResult]:
+    async def run(path: str) -> List[ExtractionResult]:
+        results = await run_in_threadpool(
+            parse_bundle,
+            path,
+            executor=request.app.state.parse_executor,
+            max_pending=request.app.state.admission.lanes["large"].concurrency,
+            merchant_dict=request.app.state.merchant_dict,
+            page_cache=request.app.state.page_cache,
+            segment_slots=request.app.state.bundle_slots,
+        )
+        await _persist(request, results)
+        return results
+
+    return await _parse_upload(request, file, run)
+
+
+async def _parse_batch_item(request: Request, index: int, filename: str, path: str, cost: float) -> BatchItem:
+    admission: AdmissionController = request.app.state.admission
+    loop = asyncio.get_running_loop()
+    try:
+        async with admission.slot(cost):
+            result = await loop.run_in_executor(
+                request.app.state.parse_executor, parse_task, path, request.app.state.merchant_dict
+            )
+        await _persist(request, [result])
+        return BatchItem(index=index, filename=filename, status_code=200, result=result)
+    except AdmissionRejected as exc:
+        return BatchItem(
+            index=index,
+            filename=filename,
+            status_code=503,
+            error="Parse queue is saturated; retry later.",
+            retry_after=exc.retry_after,
+        )
+    except Exception:
+        return BatchItem(index=index, filename=filename, status_code=400, error="Failed to parse PDF.")
+    finally:
+        _remove_quietly(path)
+
+
+async def _stream_batch(request: Request, rejected: List[BatchItem], accepted: List[Tuple[int, str, str, float]]):
+    for item in rejected:
+        yield item.model_dump_json() + "\n"
+    tasks = [asyncio.create_task(_parse_batch_item(request, *entry)) for entry in accepted]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            yield item.model_dump_json() + "\n"
+    finally:
+        # Client went away: stop waiting for the rest and drop their temp files.
+        for task in tasks:
+            task.cancel()
+        for _, _, path, _ in accepted:
+            _remove_quietly(path)
+
+
+@app.post(
+    "/parse/batch",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/x-ndjson": {}}, "description": "One BatchItem per line."}},
+)
+async def parse_statement_batch(request: Request, files: List[UploadFile] = File(...)) -> StreamingResponse:
+    """
+    Parses many PDFs concurrently and streams one JSON line per file, in completion
+    order. Files that cannot be parsed get an error line; the batch itself only
+    fails (413) when it exceeds the file-count or total-page caps.
+    """
+    if len(files) > request.app.state.batch_max_files:
+        raise HTTPException(
+            status_code=413, detail=f"At most {request.app.state.batch_max_files} files per batch."
+        )
+
+    rejected: List[BatchItem] = []
+    accepted: List[Tuple[int, str, str, float]] = []
+    try:
+        for index, file in enumerate(files):
+            path = None
             try:
-                os.remove(temp_path)
-            except OSError:
-                pass
+                path = _write_temp_pdf(await _read_pdf_upload(file))
+                report = await run_in_threadpool(_preflight_upload, path)
+            except HTTPException as exc:
+                if path:
+                    _remove_quietly(path)
+                rejected.append(
+                    BatchItem(index=index, filename=file.filename, status_code=exc.status_code, error=exc.detail)
+                )
+                continue
+            accepted.append((index, file.filename, path, report.cost))
+
+        total_pages = sum(cost for _, _, _, cost in accepted)
+        if total_pages > request.app.state.batch_max_pages:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch has {total_pages:.0f} pages; the limit is {request.app.state.batch_max_pages:.0f}.",
+            )
+    except BaseException:
+        for _, _, path, _ in accepted:
+            _remove_quietly(path)
+        raise
+
+    return StreamingResponse(_stream_batch(request, rejected, accepted), media_type="application/x-ndjson")
+
+
+@app.get("/metrics", response_model=WorkerPoolMetrics)
+async def worker_metrics(request: Request) -> WorkerPoolMetrics:
+    executor: WorkerPool = request.app.state.parse_executor
+    metrics = executor.metrics()
+    if request.app.state.page_cache is not None:
+        metrics.page_cache = combine_page_cache_stats([metrics.page_cache, request.app.state.page_cache.stats()])
+    if request.app.state.result_cache is not None:
+        metrics.result_cache = combine_page_cache_stats(
+            [metrics.result_cache, request.app.state.result_cache.stats()]
+        )
+    return metrics
+
+
+@app.get("/rules", response_model=List[RuleSetInfo])
+async def list_rules(request: Request) -> List[RuleSetInfo]:
+    """
+    Provider rule sets currently in service in this process. Edited rule files are
+    picked up within a few seconds here and in every parse worker.
+    """
+    rules: RuleRegistry = request.app.state.rules
+    await run_in_threadpool(rules.reload)
+    return [ruleset.info() for ruleset in rules.rulesets()]
+
+
+@app.post("/jobs", response_model=JobInfo, status_code=202)
+async def submit_job(
+    request: Request,
+    file: UploadFile = File(...),
+    priority: int = Form(0),
+    callback_url: Optional[str] = Form(None),
+) -> JobInfo:
+    payload = await _read_pdf_upload(file)
+    if callback_url and urlparse(callback_url).scheme not in ("http", "https"):
+        raise HTTPException(status_code=400, detail="Callback URL must be http or https.")
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+        tmp.write(payload)
+        tmp.flush()
+        await run_in_threadpool(_preflight_upload, tmp.name)
+
+    store: JobStore = request.app.state.job_store
+    return await run_in_threadpool(
+        store.enqueue, payload, filename=file.filename, priority=priority, callback_url=callback_url
+    )
+
+
+@app.get("/jobs/{job_id}", response_model=JobInfo)
+async def get_job(request: Request, job_id: str) -> JobInfo:
+    store: JobStore = request.app.state.job_store
+    info = await run_in_threadpool(store.get, job_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return info
+
+
+@app.get("/transactions", response_model=TransactionPage)
+async def list_transactions(
+    request: Request,
+    account: Optional[str] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+) -> TransactionPage:
+    transaction_store: Optional[TransactionStore] = request.app.state.transaction_store
+    if transaction_store is None:
+        raise HTTPException(status_code=404, detail="Transaction store is not enabled.")
+    try:
+        return await run_in_threadpool(
+            transaction_store.query_transactions,
+            account=account,
+            date_from=date_from,
+            date_to=date_to,
+            q=q,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor.") from exc
+
+
+@app.get("/rollups", response_model=List[MonthlyRollup])
+async def list_rollups(
+    request: Request,
+    account: Optional[str] = None,
+    month_from: Optional[str] = Query(None, alias="from", pattern=r"^\d{4}-\d{2}$"),
+    month_to: Optional[str] = Query(None, alias="to", pattern=r"^\d{4}-\d{2}$"),
+    currency: Optional[str] = None,
+    foreign_currency: Optional[str] = Query(None, description="Foreign currency class; empty for domestic."),
+) -> List[MonthlyRollup]:
+    transaction_store: Optional[TransactionStore] = request.app.state.transaction_store
+    if transaction_store is None:
+        raise HTTPException(status_code=404, detail="Transaction store is not enabled.")
+    return await run_in_threadpool(
+        transaction_store.query_rollups,
+        account=account,
+        month_from=month_from,
+        month_to=month_to,
+        currency=currency,
+        foreign_currency=foreign_currency,
+    )
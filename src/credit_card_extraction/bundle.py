@@ -0,0 +1,137 @@
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+
+from .dedup import FingerprintIndex
+from .extractor import StatementParser, iter_page_lines, normalize_lines
+from .merchants import get_merchant_index
+from .models import ExtractionResult, NormalizedLine
+from .pagecache import PageCache
+from .rules import get_rules
+from .workers import WorkerPool
+
+# (card number, statement date) taken from the header dates row of a statement's first page
+HeaderSignature = Tuple[str, str]
+
+
+def header_signature(lines: Iterable[NormalizedLine]) -> Optional[HeaderSignature]:
+    """
+    Returns the card + statement date signature of a page, if the page carries a statement header.
+    """
+    header_dates_row = get_rules().header_dates_row
+    for line in lines:
+        match = header_dates_row.search(line.text)
+        if match:
+            return match.group(1), match.group(2)
+    return None
+
+
+def iter_page_segments(
+    pages: Iterable[Tuple[int, List[NormalizedLine]]],
+) -> Iterator[List[NormalizedLine]]:
+    """
+    Groups pages into statement segments. A new segment starts on every page whose
+    header signature differs from the current statement's; pages that repeat the
+    same header (continuation pages) stay in the current segment.
+    """
+    segment: List[NormalizedLine] = []
+    current: Optional[HeaderSignature] = None
+    for _, page_lines in pages:
+        signature = header_signature(page_lines)
+        if signature is not None and signature != current:
+            if segment:
+                yield segment
+            segment = []
+            current = signature
+        segment.extend(page_lines)
+    if segment:
+        yield segment
+
+
+def split_statements(lines: List[NormalizedLine]) -> List[List[NormalizedLine]]:
+    """
+    Splits already-normalized lines of a merged PDF into one list per statement.
+    """
+    pages: dict = {}
+    for line in lines:
+        pages.setdefault(line.page, []).append(line)
+    return list(iter_page_segments(sorted(pages.items())))
+
+
+def iter_statement_segments(file_path: str, page_cache: Optional[PageCache] = None) -> Iterator[List[NormalizedLine]]:
+    """
+    Streams statement segments out of a PDF, extracting one page at a time so that
+    only the segment being assembled is held in memory.
+    """
+    normalized_pages = (
+        (page_num, normalize_lines(raw_lines)) for page_num, raw_lines in iter_page_lines(file_path, page_cache)
+    )
+    return iter_page_segments(normalized_pages)
+
+
+def parse_segment(lines: List[NormalizedLine], merchant_dict: Optional[str] = None) -> ExtractionResult:
+    result = StatementParser().parse(lines)
+    if merchant_dict:
+        get_merchant_index(merchant_dict).enrich(result)
+    return result
+
+
+def parse_bundle(
+    file_path: str,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    dedupe: Optional[FingerprintIndex] = None,
+    merchant_dict: Optional[str] = None,
+    page_cache: Optional[PageCache] = None,
+    segment_slots: Optional[threading.Semaphore] = None,
+) -> List[ExtractionResult]:
+    """
+    Parses a PDF that may contain several merged statements and returns one
+    ExtractionResult per statement, in document order.
+
+    Segments are parsed in parallel on `executor` (a WorkerPool by default)
+    while extraction continues; at most `max_pending` segments are in flight at
+    once, which bounds memory for very large bundles. With `dedupe`, transactions
+    repeated across overlapping statements are kept only the first time.
+    `merchant_dict` enables merchant enrichment from a JSON merchant dictionary.
+    `page_cache` skips extraction of pages already seen in earlier documents.
+    `segment_slots`, shared by concurrent bundles, bounds their segments in flight
+    together, so bundles cannot fill the executor's queue ahead of other work.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = WorkerPool(max_workers=max_workers)
+    if max_pending is None:
+        max_pending = 2 * (max_workers or getattr(executor, "_max_workers", 1))
+
+    results: List[ExtractionResult] = []
+    pending: Deque[Future] = deque()
+    try:
+        for segment in iter_statement_segments(file_path, page_cache):
+            if len(pending) >= max_pending:
+                results.append(pending.popleft().result())
+            if segment_slots is not None:
+                # Wait on our own oldest segment first; block only with nothing of ours in flight.
+                while not segment_slots.acquire(blocking=not pending):
+                    results.append(pending.popleft().result())
+            try:
+                future = executor.submit(parse_segment, segment, merchant_dict)
+            except BaseException:
+                if segment_slots is not None:
+                    segment_slots.release()
+                raise
+            if segment_slots is not None:
+                future.add_done_callback(lambda _, slots=segment_slots: slots.release())
+            pending.append(future)
+        while pending:
+            results.append(pending.popleft().result())
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown()
+    if dedupe is not None:
+        results = [dedupe.filter_new(result)[0] for result in results]
+    return results
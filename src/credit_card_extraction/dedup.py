@@ -0,0 +1,115 @@
+import dbm
+import hashlib
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .models import ExtractionResult, Transaction
+
+FINGERPRINT_SIZE = 16
+
+
+def transaction_fingerprint(txn: Transaction, account: str = "", occurrence: int = 0) -> bytes:
+    """
+    Stable hash of a transaction's identity: account, date, post_date, amount and
+    whitespace/case-normalized description. `occurrence` distinguishes genuinely
+    repeated purchases within one statement (e.g. two identical coffees on the
+    same day), so overlapping statements dedupe them one-for-one.
+    """
+    description = " ".join(txn.description.split()).casefold()
+    post_date = txn.post_date.isoformat() if txn.post_date else ""
+    key = "\x1f".join((
+        account,
+        txn.date.isoformat(),
+        post_date,
+        f"{txn.amount:.2f}",
+        description,
+        str(occurrence),
+    ))
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=FINGERPRINT_SIZE).digest()
+
+
+def iter_fingerprints(result: ExtractionResult) -> Iterator[Tuple[Transaction, bytes]]:
+    account = result.statement.account_last4
+    seen: Dict[bytes, int] = {}
+    for txn in result.transactions:
+        base = transaction_fingerprint(txn, account)
+        occurrence = seen.get(base, 0)
+        seen[base] = occurrence + 1
+        fingerprint = base if occurrence == 0 else transaction_fingerprint(txn, account, occurrence)
+        yield txn, fingerprint
+
+
+class FingerprintIndex:
+    """
+    Set of transaction fingerprints answering "seen before?" in O(1).
+
+    Recent fingerprints live in an in-memory set; once it grows past
+    `max_memory_items` it is spilled into an on-disk hash table (dbm) at `path`.
+    Without a path the index is memory-only.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_memory_items: int = 1_000_000):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self._memory: Set[bytes] = set()
+        self._disk = dbm.open(path, "c") if path else None
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        if fingerprint in self._memory:
+            return True
+        return self._disk is not None and fingerprint in self._disk
+
+    def __len__(self) -> int:
+        return len(self._memory) + (len(self._disk) if self._disk is not None else 0)
+
+    def add(self, fingerprint: bytes) -> bool:
+        """
+        Record a fingerprint. Returns True if it had not been seen before.
+        """
+        if fingerprint in self:
+            return False
+        self._memory.add(fingerprint)
+        if self._disk is not None and len(self._memory) >= self.max_memory_items:
+            self.flush()
+        return True
+
+    def discard(self, fingerprints: Iterable[bytes]):
+        for fingerprint in fingerprints:
+            self._memory.discard(fingerprint)
+            if self._disk is not None and fingerprint in self._disk:
+                del self._disk[fingerprint]
+
+    def flush(self):
+        if self._disk is None:
+            return
+        for fingerprint in self._memory:
+            self._disk[fingerprint] = b""
+        self._memory.clear()
+        sync = getattr(self._disk, "sync", None)
+        if sync is not None:
+            sync()
+
+    def close(self):
+        if self._disk is not None:
+            self.flush()
+            self._disk.close()
+            self._disk = None
+
+    def filter_new(self, result: ExtractionResult) -> Tuple[ExtractionResult, List[bytes]]:
+        """
+        Drop transactions that were already recorded and record the rest.
+        Returns the filtered result and the fingerprints of the kept transactions, in order.
+        """
+        kept: List[Transaction] = []
+        fingerprints: List[bytes] = []
+        for txn, fingerprint in iter_fingerprints(result):
+            if self.add(fingerprint):
+                kept.append(txn)
+                fingerprints.append(fingerprint)
+
+        skipped = len(result.transactions) - len(kept)
+        if not skipped:
+            return result, fingerprints
+        filtered = result.model_copy(deep=True)
+        filtered.transactions = kept
+        filtered.validation.warnings.append(f"Skipped {skipped} duplicate transaction(s) already ingested.")
+        return filtered, fingerprints
@@ -1,7 +1,13 @@
+import hashlib
 import re
+import threading
 from datetime import datetime
-from typing import List, Tuple, Dict, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 import fitz  # PyMuPDF
+from .merchants import MerchantIndex
+from .pagecache import PageCache, page_fingerprint
+from .resultcache import ResultCache, result_cache_key
+from .rules import DEFAULT_PROVIDER, RuleSet, get_rules
 from .models import (
     RawLine, 
     NormalizedLine, 
@@ -13,57 +19,70 @@ from .models import (
     RewardBalance
 )
 
-class StatementParser:
-    # TTB specific patterns
-    DATE_PATTERN = re.compile(r"(\d{2}/\d{2}/\d{4})")
-    AMOUNT_PATTERN = re.compile(r"(-?[\d,]+\.\d{2})")
-    FX_PATTERN = re.compile(r"^([A-Z]{3})\s+([\d,]+\.\d{2})$")
-    TXN_TWO_DATES_PATTERN = re.compile(
-        r"(?P<trans>\d{2}/\d{2}/\d{4})\s+"
-        r"(?P<post>\d{2}/\d{2}/\d{4})\s+"
-        r"(?P<desc>.+?)\s+"
-        r"(?P<amount>-?[\d,]+\.\d{2})"
-        r"(?=\s+\d{2}/\d{2}/\d{4}|\s*$)"
-    )
-    TXN_ONE_DATE_PATTERN = re.compile(
-        r"(?P<trans>\d{2}/\d{2}/\d{4})\s+"
-        r"(?P<desc>.+?)\s+"
-        r"(?P<amount>-?[\d,]+\.\d{2})"
-        r"(?=\s+\d{2}/\d{2}/\d{4}|\s*$)"
-    )
-    CONTROL_CHARS = re.compile(r"[\x00-\x1F\x7F-\x9F]")
-    MULTISPACE_PATTERN = re.compile(r"\s+")
-    
-    # Complex Header Patterns
-    # Line with Card + Statement Date + Due Date
-    HEADER_DATES_ROW = re.compile(r"(\d{4}-[\dXx-]{7,}-\d{4}).*?(\d{2}/\d{2}/\d{4})\s+(\d{2}/\d{2}/\d{4})")
-    # Direct Debit Line for Outstanding Balance: Account ... Balance
-    DIRECT_DEBIT_ROW = re.compile(r"\d{3}-\d-\d{5}-\d\s+([\d,]+\.\d{2})")
-    # Credit Info Row: Limit ... MinPay ... PastDue ... TotalMin
-    # Heuristic: 4 numbers, last 3 having decimals
-    CREDIT_INFO_ROW = re.compile(r"([0-9,]+)\s+([0-9,]+\.\d{2})\s+([0-9,]+\.\d{2})\s+([0-9,]+\.\d{2})")
-    
-    # Header summary patterns (Single key-value fallback)
-    HEADER_SUMMARY_PATTERNS = {
-        "payment_due_date": re.compile(r"Payment Due Date\s*[:\s]\s*(\d{2}/\d{2}/\d{4})", re.IGNORECASE),
-        "credit_limit": re.compile(r"Credit Limit\(Baht\)\s*[:\s]\s*([\d,]+\.\d{2}|[\d,]+)", re.IGNORECASE),
-        "min_payment": re.compile(r"Min\. Payment Amount\s*[:\s]\s*([\d,]+\.\d{2}|[\d,]+)", re.IGNORECASE),
-        "past_due_amount": re.compile(r"Past Due Amount\s*[:\s]\s*([\d,]+\.\d{2}|[\d,]+)", re.IGNORECASE),
-        "total_min_payment": re.compile(r"Total Min\. Payment Amount\s*[:\s]\s*([\d,]+\.\d{2}|[\d,]+)", re.IGNORECASE),
-        "outstanding_balance": re.compile(r"Outstanding Balance\s*[:\s]\s*([\d,]+\.\d{2}|[\d,]+)", re.IGNORECASE),
-        "previous_balance": re.compile(r"(?:Previous|Prev)\s*Balance\s*[:\s]?\s*([\d,]+\.\d{2}|[\d,]+)", re.IGNORECASE),
-        "new_balance": re.compile(r"(?:New Balance|Total Amount Due)\s*[:\s]?\s*([\d,]+\.\d{2}|[\d,]+)", re.IGNORECASE),
-    }
-    
-    FOOTER_KEYWORDS = [
-        "sub total balance", "grand total",
-        "bank's copy", "pay-in-slip", "ส่วนสำาหรับธนาคาร",
-        "service code", "cardholder name", "ชื่อผู้ถือบัตร",
-        "scan to", "สแกนเพื่อ", "www.ttbbank.com",
-        "amount in words", "จำนวนเงินเป็นตัวหนังสือ"
-    ]
-
-    def __init__(self):
+# MuPDF is not thread-safe: every PyMuPDF call made outside a dedicated worker
+# process goes through this lock (see ThreadParsePool).
+FITZ_LOCK = threading.RLock()
+
+RESULT_SECTIONS = frozenset(ExtractionResult.model_fields)
+HEADER_FIELDS = frozenset(StatementHeader.model_fields)
+
+
+class FieldProjection:
+    """
+    The parts of an ExtractionResult a caller asked for. Names are result sections
+    (`statement`, `transactions`, `rewards`, `validation`) or StatementHeader fields,
+    optionally written as `statement.<field>`.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.header_fields: Set[str] = set()
+        self.sections: Set[str] = set()
+        for name in fields:
+            name = name.strip()
+            if not name:
+                continue
+            if name.startswith("statement."):
+                name = name[len("statement."):]
+            if name == "statement":
+                self.header_fields |= HEADER_FIELDS
+            elif name in RESULT_SECTIONS:
+                self.sections.add(name)
+            elif name in HEADER_FIELDS:
+                self.header_fields.add(name)
+            else:
+                raise ValueError(f"Unknown field: {name}")
+        if not self.header_fields and not self.sections:
+            raise ValueError("No fields requested.")
+
+    @classmethod
+    def parse(cls, fields: str) -> "FieldProjection":
+        return cls(fields.split(","))
+
+    @property
+    def transactions(self) -> bool:
+        return "transactions" in self.sections
+
+    @property
+    def header_only(self) -> bool:
+        return not self.sections & {"transactions", "rewards"}
+
+    def apply(self, result: ExtractionResult) -> Dict[str, Any]:
+        include: Dict[str, Any] = {section: True for section in self.sections}
+        if self.header_fields:
+            include["statement"] = set(self.header_fields)
+        return result.model_dump(mode="json", include=include)
+
+
+class ParseSession:
+    """
+    Mutable state of a single parse. Sessions are never shared between threads.
+    """
+
+    __slots__ = ("rules", "state", "result", "current_transaction", "header_fields_seen")
+
+    def __init__(self, rules: RuleSet):
+        # Pinned for the whole document, even if the registry swaps in new rules meanwhile.
+        self.rules = rules
         self.state = ParserState.START
         self.result = ExtractionResult(
             statement=StatementHeader(account_last4="UNKNOWN"),
@@ -71,15 +90,93 @@ class StatementParser:
             validation=ValidationResult()
         )
         self.current_transaction: Optional[Transaction] = None
+        # Header fields found so far, used to stop projected parses early (provider is fixed).
+        self.header_fields_seen: Set[str] = {"provider"}
+
+
+def _session_attribute(name: str) -> property:
+    def getter(self):
+        return getattr(self.session, name)
+
+    def setter(self, value):
+        setattr(self.session, name, value)
+
+    return property(getter, setter)
+
+
+class StatementParser:
+    """
+    Reusable, thread-safe statement parser. The provider's patterns and keywords
+    come from its compiled RuleSet (see rules.py); per-document state, including the
+    RuleSet in use, lives in a ParseSession that is local to the calling thread, and
+    every parse() starts a fresh one.
+    """
+
+    CONTROL_CHARS = re.compile(r"[\x00-\x1F\x7F-\x9F]")
+    MULTISPACE_PATTERN = re.compile(r"\s+")
+
+    rules = _session_attribute("rules")
+    state = _session_attribute("state")
+    result = _session_attribute("result")
+    current_transaction = _session_attribute("current_transaction")
+    header_fields_seen = _session_attribute("header_fields_seen")
+
+    def __init__(
+        self,
+        parse_transactions: bool = True,
+        provider: str = DEFAULT_PROVIDER,
+        rules: Optional[RuleSet] = None,
+    ):
+        self.parse_transactions = parse_transactions
+        self.provider = rules.provider if rules is not None else provider
+        # Fixed rules (mainly for tests); otherwise the registry's current rules per document.
+        self._rules = rules
+        self._local = threading.local()
         # self.pending_fx removed as FX follows transaction
 
-    def parse(self, lines: List[NormalizedLine]) -> ExtractionResult:
+    @property
+    def session(self) -> ParseSession:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self.reset()
+        return session
+
+    def reset(self, rules: Optional[RuleSet] = None) -> ParseSession:
+        """
+        Starts a new document for the calling thread, with `rules` or the current
+        rules of this parser's provider.
+        """
+        self._local.session = ParseSession(rules or self._rules or get_rules(self.provider))
+        return self._local.session
+
+    def parse(self, lines: List[NormalizedLine], rules: Optional[RuleSet] = None) -> ExtractionResult:
         """
         Main parsing loop using a state machine.
         """
+        self.reset(rules)
+        self.feed(lines)
+        return self.finish()
+
+    def feed(self, lines: Iterable[NormalizedLine]):
+        """
+        Processes more lines; lets callers feed a document page by page.
+        """
         for line in lines:
             self._process_line(line)
-        
+
+    def header_complete(self, fields: Iterable[str]) -> bool:
+        """
+        True once none of `fields` can still change: each was found, or the header
+        section is over (only the previous balance appears after it).
+        """
+        missing = set(fields) - self.header_fields_seen
+        if not missing:
+            return True
+        if self.state in (ParserState.START, ParserState.HEADER):
+            return False
+        return "previous_balance" not in missing
+
+    def finish(self) -> ExtractionResult:
         # Flush last transaction
         self._flush_current()
         
@@ -98,8 +195,7 @@ class StatementParser:
         return cleaned.strip()
 
     def _find_footer_index(self, lower_text: str) -> Optional[int]:
-        hits = [lower_text.find(k) for k in self.FOOTER_KEYWORDS if k in lower_text]
-        return min(hits) if hits else None
+        return self.rules.find_footer(lower_text)
 
     def _looks_like_noise(self, text: str) -> bool:
         if "B^^^B" in text:
@@ -116,6 +212,10 @@ class StatementParser:
             cleaned = cleaned[:footer_index].strip()
         return cleaned
 
+    def _set_header(self, field: str, value: Any):
+        setattr(self.result.statement, field, value)
+        self.header_fields_seen.add(field)
+
     def _process_line(self, line: NormalizedLine):
         """
         TTB-specific parsing logic.
@@ -126,10 +226,11 @@ class StatementParser:
         
         # Global state transitions
         lower_text = text.lower()
-        if "transaction date" in lower_text or "วันที่ใช้บัตร" in text or "transaction details" in lower_text:
+        rules = self.rules
+        if any(marker in lower_text for marker in rules.transaction_markers):
             self.state = ParserState.TRANSACTIONS
             return
-        elif "reward" in lower_text or "point" in lower_text:
+        elif any(marker in lower_text for marker in rules.reward_markers):
             self._flush_current()
             self.state = ParserState.REWARDS
             return
@@ -157,7 +258,7 @@ class StatementParser:
                 self._flush_current()
                 self.state = ParserState.FOOTER
                 return
-        elif "แบบฟอร์ม" in text: # Check raw text for Thai forms
+        elif any(marker in lower_text for marker in rules.footer_markers): # e.g. Thai payment forms
             self._flush_current()
             self.state = ParserState.FOOTER
             return
@@ -179,85 +280,89 @@ class StatementParser:
             
             # Check for PREVIOUS BALANCE (which acts like a header line inside txn section)
             if "previous balance" in lower_text:
-                 match = self.HEADER_SUMMARY_PATTERNS["previous_balance"].search(text)
+                 pattern = rules.summary_patterns.get("previous_balance")
+                 match = pattern.search(text) if pattern is not None else None
                  if match:
                      try:
-                        self.result.statement.previous_balance = float(match.group(1).replace(",", ""))
+                        self._set_header("previous_balance", float(match.group(1).replace(",", "")))
                      except ValueError:
                         pass
                  return
-            
+
+            if not self.parse_transactions:
+                return
             self._parse_transaction_line(text)
             if footer_pending:
                 self._flush_current()
                 self.state = ParserState.FOOTER
 
     def _parse_header_line(self, text: str):
+        rules = self.rules
         # 1. Try Complex Multi-Value Lines first
         
         # Date Row: Card + Statement + Due
-        dates_row_match = self.HEADER_DATES_ROW.search(text)
+        dates_row_match = rules.header_dates_row.search(text)
         if dates_row_match:
-            self.result.statement.account_last4 = dates_row_match.group(1)
+            self._set_header("account_last4", dates_row_match.group(1))
             try:
-                self.result.statement.statement_date = datetime.strptime(dates_row_match.group(2), "%d/%m/%Y").date()
-                self.result.statement.payment_due_date = datetime.strptime(dates_row_match.group(3), "%d/%m/%Y").date()
+                self._set_header("statement_date", datetime.strptime(dates_row_match.group(2), "%d/%m/%Y").date())
+                self._set_header("payment_due_date", datetime.strptime(dates_row_match.group(3), "%d/%m/%Y").date())
             except ValueError:
                 pass
             return # Consumed this line
 
         # Direct Debit Row for Outstanding Balance
-        dd_match = self.DIRECT_DEBIT_ROW.search(text)
+        dd_match = rules.direct_debit_row.search(text)
         if dd_match:
             try:
-                self.result.statement.outstanding_balance = float(dd_match.group(1).replace(",", ""))
+                self._set_header("outstanding_balance", float(dd_match.group(1).replace(",", "")))
             except ValueError:
                 pass
             return
             
         # Credit Info Row
-        credit_match = self.CREDIT_INFO_ROW.search(text)
+        credit_match = rules.credit_info_row.search(text)
         if credit_match:
             try:
-                self.result.statement.credit_limit = float(credit_match.group(1).replace(",", ""))
-                self.result.statement.min_payment = float(credit_match.group(2).replace(",", ""))
-                self.result.statement.past_due_amount = float(credit_match.group(3).replace(",", ""))
+                self._set_header("credit_limit", float(credit_match.group(1).replace(",", "")))
+                self._set_header("min_payment", float(credit_match.group(2).replace(",", "")))
+                self._set_header("past_due_amount", float(credit_match.group(3).replace(",", "")))
                 # group(4) is total min payment
-                self.result.statement.total_min_payment = float(credit_match.group(4).replace(",", ""))
+                self._set_header("total_min_payment", float(credit_match.group(4).replace(",", "")))
             except ValueError:
                 pass
             return
 
         # 2. Standard single field extraction
         # Extract Card Number: XXXX-XXXX-XXXX-1234
-        card_match = re.search(r"(\d{4}-[\dXx-]{7,}-\d{4})", text)
+        card_match = rules.card_number.search(text)
         if card_match and "THE PRIMA" in text: # Avoid re-matching if already caught
              pass
         elif card_match and self.result.statement.account_last4 == "UNKNOWN":
-             self.result.statement.account_last4 = card_match.group(1)
+             self._set_header("account_last4", card_match.group(1))
         
         # Extract Statement Date (fallback)
         if self.result.statement.statement_date is None:
-            date_match = self.DATE_PATTERN.search(text)
+            date_match = rules.date.search(text)
             if date_match and "Date" in text:
                  try:
-                    self.result.statement.statement_date = datetime.strptime(date_match.group(1), "%d/%m/%Y").date()
+                    self._set_header("statement_date", datetime.strptime(date_match.group(1), "%d/%m/%Y").date())
                  except ValueError:
                     pass
 
         # Extract summary fields
-        for field, pattern in self.HEADER_SUMMARY_PATTERNS.items():
+        for field, pattern, is_date in rules.header_summary:
             match = pattern.search(text)
             if match:
                 val = match.group(1)
-                if "date" in field:
+                if is_date:
                     try:
-                        setattr(self.result.statement, field, datetime.strptime(val, "%d/%m/%Y").date())
+                        self._set_header(field, datetime.strptime(val, "%d/%m/%Y").date())
                     except ValueError:
                         pass
                 else:
                     try:
-                        setattr(self.result.statement, field, float(val.replace(",", "")))
+                        self._set_header(field, float(val.replace(",", "")))
                     except ValueError:
                         pass
 
@@ -267,9 +372,10 @@ class StatementParser:
             self.current_transaction = None
 
     def _parse_transaction_line(self, text: str):
+        rules = self.rules
         # 1. Check for FX line (POST-Fix: FX follows transaction) 
         # e.g. "JPY 2,580.00"
-        fx_match = self.FX_PATTERN.match(text)
+        fx_match = rules.fx.match(text)
         if fx_match:
             curr, amt_str = fx_match.groups()
             if self.current_transaction:
@@ -277,9 +383,9 @@ class StatementParser:
                 self.current_transaction.foreign_amount = float(amt_str.replace(",", ""))
             return
 
-        matches = list(self.TXN_TWO_DATES_PATTERN.finditer(text))
+        matches = list(rules.txn_two_dates.finditer(text))
         if not matches:
-            matches = list(self.TXN_ONE_DATE_PATTERN.finditer(text))
+            matches = list(rules.txn_one_date.finditer(text))
 
         if matches:
             self._flush_current()
@@ -309,7 +415,7 @@ class StatementParser:
 
         # 2. Check for main transaction line
         # e.g. "08/12/2025 11/12/2025 KINSHO STORE MATSUBARA JP 393.71"
-        dates = self.DATE_PATTERN.findall(text)
+        dates = rules.date.findall(text)
         if len(dates) >= 1:
             dates = dates[:2]
             # We found a potential new transaction
@@ -320,7 +426,7 @@ class StatementParser:
             post_date_str = dates[1] if len(dates) > 1 else trans_date_str
             
             # Extract amount (usually the last number)
-            amounts = self.AMOUNT_PATTERN.findall(text)
+            amounts = rules.amount.findall(text)
             amount = 0.0
             if amounts:
                 amount = float(amounts[-1].replace(",", ""))
@@ -354,26 +460,74 @@ class StatementParser:
                 if "transaction date" not in text.lower():
                     self.current_transaction.description += " " + text
 
-def extract_text_with_coords(file_path: str) -> List[RawLine]:
+# Shared parsers; safe to use from any number of threads.
+_FULL_PARSER = StatementParser()
+_HEADER_PARSER = StatementParser(parse_transactions=False)
+
+def extract_page_lines(page: "fitz.Page", page_num: int) -> List[RawLine]:
+    """
+    Extracts the text blocks of a single page along with their bounding box coordinates.
+    """
+    raw_lines = []
+    # Using "blocks" to get text grouped by blocks with their rectangles
+    blocks = page.get_text("blocks")
+    for b in blocks:
+        text = b[4].strip()
+        if text:
+            raw_lines.append(RawLine(
+                text=text,
+                page=page_num,
+                bbox=(b[0], b[1], b[2], b[3])
+            ))
+    return raw_lines
+
+def _cached_page_lines(
+    doc: "fitz.Document", page: "fitz.Page", page_num: int, cache: PageCache, memo: Dict[int, bytes]
+) -> List[RawLine]:
+    key = page_fingerprint(doc, page, memo)
+    blocks = cache.get(key)
+    if blocks is None:
+        raw_lines = extract_page_lines(page, page_num)
+        cache.put(key, [(*line.bbox, line.text) for line in raw_lines])
+        return raw_lines
+    return [RawLine(text=text, page=page_num, bbox=(x0, y0, x1, y1)) for x0, y0, x1, y1, text in blocks]
+
+def iter_page_lines(
+    file_path: Union[str, bytes], page_cache: Optional[PageCache] = None
+) -> Iterator[Tuple[int, List[RawLine]]]:
+    """
+    Yields (page number, raw lines) one page at a time so callers can stream large documents.
+    `file_path` may also be the PDF's bytes, for callers that already read the file.
+    With a page cache, pages whose content and resources were seen before are not extracted again.
+    """
+    with FITZ_LOCK:
+        if isinstance(file_path, (bytes, bytearray)):
+            doc = fitz.open(stream=file_path, filetype="pdf")
+        else:
+            doc = fitz.open(file_path)
+    memo: Dict[int, bytes] = {}
+    try:
+        for page_idx in range(doc.page_count):
+            # Hold the lock per page only, so other threads can parse in between.
+            with FITZ_LOCK:
+                page = doc.load_page(page_idx)
+                if page_cache is None:
+                    page_lines = extract_page_lines(page, page_idx + 1)
+                else:
+                    page_lines = _cached_page_lines(doc, page, page_idx + 1, page_cache, memo)
+                del page
+            yield page_idx + 1, page_lines
+    finally:
+        with FITZ_LOCK:
+            doc.close()
+
+def extract_text_with_coords(file_path: Union[str, bytes], page_cache: Optional[PageCache] = None) -> List[RawLine]:
     """
     Extracts text blocks from a PDF file along with their bounding box coordinates.
     """
-    doc = fitz.open(file_path)
     raw_lines = []
-    
-    for page_num, page in enumerate(doc):
-        # Using "blocks" to get text grouped by blocks with their rectangles
-        blocks = page.get_text("blocks")
-        for b in blocks:
-            text = b[4].strip()
-            if text:
-                raw_lines.append(RawLine(
-                    text=text,
-                    page=page_num + 1,
-                    bbox=(b[0], b[1], b[2], b[3])
-                ))
-    
-    doc.close()
+    for _, page_lines in iter_page_lines(file_path, page_cache):
+        raw_lines.extend(page_lines)
     return raw_lines
 
 def normalize_lines(raw_lines: List[RawLine], y_tolerance: float = 3.0) -> List[NormalizedLine]:
@@ -428,11 +582,56 @@ def normalize_lines(raw_lines: List[RawLine], y_tolerance: float = 3.0) -> List[
             
     return normalized_lines
 
-def parse_pdf(file_path: str) -> ExtractionResult:
+def parse_pdf(
+    file_path: Union[str, bytes],
+    merchant_index: Optional[MerchantIndex] = None,
+    fields: Optional[Iterable[str]] = None,
+    page_cache: Optional[PageCache] = None,
+    result_cache: Optional[ResultCache] = None,
+) -> ExtractionResult:
     """
     End-to-end helper: extract text, normalize lines, and parse into structured output.
+    When a merchant index is given, transactions are enriched with merchant and category.
+
+    `fields` limits the work to the requested parts (see FieldProjection): without
+    transactions, transaction lines are skipped, and when only header fields are
+    requested, extraction stops at the page where the last of them is found.
+    Sections that were not requested are left at their defaults.
+    `page_cache` reuses extracted blocks of pages seen in earlier documents;
+    `result_cache` reuses whole results of identical documents parsed with the same
+    rule set and fields.
     """
-    raw_lines = extract_text_with_coords(file_path)
-    normalized = normalize_lines(raw_lines)
-    parser = StatementParser()
-    return parser.parse(normalized)
+    projection = None
+    if fields is not None:
+        projection = fields if isinstance(fields, FieldProjection) else FieldProjection(fields)
+    # One rule set for the whole document, also used in the cache key.
+    rules = get_rules(_FULL_PARSER.provider)
+
+    key = None
+    result = None
+    if result_cache is not None:
+        if not isinstance(file_path, (bytes, bytearray)):
+            with open(file_path, "rb") as fh:
+                file_path = fh.read()
+        names = projection.header_fields | projection.sections if projection is not None else None
+        key = result_cache_key(hashlib.sha256(file_path).digest(), rules, names)
+        result = result_cache.get_result(key)
+
+    if result is None:
+        if projection is None:
+            raw_lines = extract_text_with_coords(file_path, page_cache)
+            normalized = normalize_lines(raw_lines)
+            result = _FULL_PARSER.parse(normalized, rules)
+        else:
+            parser = _FULL_PARSER if projection.transactions else _HEADER_PARSER
+            parser.reset(rules)
+            for _, page_lines in iter_page_lines(file_path, page_cache):
+                parser.feed(normalize_lines(page_lines))
+                if projection.header_only and parser.header_complete(projection.header_fields):
+                    break
+            result = parser.finish()
+        if key is not None:
+            result_cache.put_result(key, result)
+    if merchant_index is not None and result.transactions:
+        merchant_index.enrich(result)
+    return result
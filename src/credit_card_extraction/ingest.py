@@ -0,0 +1,549 @@
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import heapq
+import logging
+import os
+import select
+import shutil
+import signal
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .models import ExtractionResult
+from .store import TransactionStore
+from .textindex import TextIndex
+from .workers import WorkerPool, parse_task
+
+logger = logging.getLogger(__name__)
+
+_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingested_files (
+    sha256 TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    output_path TEXT,
+    retry_at REAL,
+    updated_at REAL NOT NULL
+);
+"""
+
+# File signature used to detect that a writer has finished: (size, mtime_ns)
+Signature = Tuple[int, int]
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _hash_settled(path: str) -> Tuple[str, Signature]:
+    """
+    Content hash of a settled file plus its signature afterwards, so a write that
+    raced the hash is noticed.
+    """
+    sha256 = file_sha256(path)
+    st = os.stat(path)
+    return sha256, (st.st_size, st.st_mtime_ns)
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    Write to a temp file in the target directory, fsync, then rename into place,
+    so readers never observe a partially written output.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+class InotifyWatcher:
+    """
+    Minimal ctypes binding to Linux inotify reporting files that were closed after
+    writing or moved into a watched directory.
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_Q_OVERFLOW = 0x00004000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, directories: Iterable[str]):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError("inotify is only available on Linux")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        for directory in directories:
+            wd = self._libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+            )
+            if wd < 0:
+                os.close(self.fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+            self._dirs[wd] = directory
+        self.overflowed = False
+
+    def read(self, timeout: float) -> List[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        paths: List[str] = []
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _, name_len = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + name_len].rstrip(b"\0")
+            offset += name_len
+            if mask & self.IN_Q_OVERFLOW:
+                self.overflowed = True
+            elif name and wd in self._dirs:
+                paths.append(os.path.join(self._dirs[wd], os.fsdecode(name)))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class IngestDaemon:
+    """
+    Watch-folder ingestion: picks up statement PDFs dropped into `watch_dirs`,
+    waits until each file has stopped changing, skips content that was already
+    processed (by SHA-256), parses on a worker pool, and writes results atomically
+    to `output_dir` and/or a TransactionStore. Files that keep failing are moved
+    to `quarantine_dir` after `max_retries` attempts.
+
+    The loop sleeps only until the next candidate settles or the next directory
+    event; a worker finishing a file wakes it through a self-pipe, so a freed
+    slot is refilled immediately instead of after a full `poll_interval`.
+    Candidates wait in a heap ordered by when they may have settled and are
+    stat'ed only when due; settled files are hashed on a small thread pool. Each
+    file thus costs a bounded amount of loop work however large the backlog.
+    """
+
+    def __init__(
+        self,
+        watch_dirs: List[str],
+        state_path: str,
+        quarantine_dir: str,
+        executor: Executor,
+        output_dir: Optional[str] = None,
+        store: Optional[TransactionStore] = None,
+        merchant_dict: Optional[str] = None,
+        settle_seconds: float = 2.0,
+        poll_interval: float = 1.0,
+        rescan_interval: float = 60.0,
+        max_retries: int = 3,
+        retry_backoff: float = 30.0,
+        max_in_flight: Optional[int] = None,
+        use_inotify: bool = True,
+    ):
+        if output_dir is None and store is None:
+            raise ValueError("IngestDaemon needs an output_dir, a store, or both.")
+        self.watch_dirs = [os.path.abspath(d) for d in watch_dirs]
+        self.output_dir = output_dir
+        self.quarantine_dir = quarantine_dir
+        self.store = store
+        self.executor = executor
+        self.merchant_dict = merchant_dict
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_in_flight = max_in_flight or 2 * getattr(executor, "_max_workers", 1)
+        for directory in filter(None, (output_dir, quarantine_dir)):
+            os.makedirs(directory, exist_ok=True)
+
+        self._state = sqlite3.connect(state_path)
+        self._state.row_factory = sqlite3.Row
+        self._state.execute("PRAGMA journal_mode=WAL")
+        self._state.execute("PRAGMA synchronous=NORMAL")
+        self._state.executescript(_STATE_SCHEMA)
+
+        # path -> (signature, first time this signature was observed)
+        self._candidates: Dict[str, Tuple[Signature, float]] = {}
+        # path -> signature already handled in this process; avoids re-hashing unchanged files.
+        self._settled: Dict[str, Signature] = {}
+        # path -> time before which a failed file is not retried
+        self._deferred: Dict[str, float] = {}
+        # (time a candidate may have settled, path); stale entries are skipped when popped.
+        self._due: List[Tuple[float, str]] = []
+        # Settled paths waiting for a slot, and those being hashed (both in _queued).
+        self._ready: Deque[str] = deque()
+        self._queued: Set[str] = set()
+        self._hashing: Dict[Future, Tuple[str, Signature]] = {}
+        self._hasher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ingest-hash")
+        self._in_flight: Dict[Future, Tuple[str, str]] = {}
+        self._last_scan = self._last_poll = 0.0
+        self._dir_mtimes: Dict[str, int] = {}
+        # Written by futures' done callbacks to wake the loop from _wait().
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._watcher: Optional[InotifyWatcher] = None
+        if use_inotify:
+            try:
+                self._watcher = InotifyWatcher(self.watch_dirs)
+            except OSError:
+                logger.info("inotify unavailable; falling back to polling")
+
+    # Discovery -------------------------------------------------------------
+
+    def _observe(self, path: str, now: float, st: Optional[os.stat_result] = None):
+        if not path.lower().endswith(".pdf"):
+            return
+        try:
+            st = st or os.stat(path)
+        except OSError:
+            self._candidates.pop(path, None)
+            return
+        signature = (st.st_size, st.st_mtime_ns)
+        if self._settled.get(path) == signature:
+            return
+        previous = self._candidates.get(path)
+        if previous is None or previous[0] != signature:
+            self._candidates[path] = (signature, now)
+            self._schedule(path)
+
+    def _due_at(self, path: str) -> float:
+        _, since = self._candidates[path]
+        return max(since + self.settle_seconds, self._deferred.get(path, 0.0))
+
+    def _schedule(self, path: str):
+        heapq.heappush(self._due, (self._due_at(path), path))
+
+    def _scan(self, now: float, full: bool = True):
+        """
+        Observes the PDFs in the watch folders. A partial scan skips folders whose
+        mtime has not changed and stats only names not seen before: candidates are
+        re-checked when due, and rewrites of settled files wait for a full scan.
+        """
+        for directory in self.watch_dirs:
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+                if not full and self._dir_mtimes.get(directory) == mtime:
+                    continue
+                self._dir_mtimes[directory] = mtime
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if not entry.is_file(follow_symlinks=False) or not entry.name.lower().endswith(".pdf"):
+                            continue
+                        if not full and (entry.path in self._candidates or entry.path in self._settled):
+                            continue
+                        self._observe(entry.path, now, entry.stat(follow_symlinks=False))
+            except FileNotFoundError:
+                continue
+        self._last_poll = now
+        if full:
+            self._last_scan = now
+
+    def _discover(self, timeout: float):
+        now = time.time()
+        overflowed = self._watcher is not None and self._watcher.overflowed
+        if overflowed or now - self._last_scan >= self.rescan_interval:
+            if overflowed:
+                self._watcher.overflowed = False
+            self._scan(now)
+        elif self._watcher is None and now - self._last_poll >= self.poll_interval:
+            self._scan(now, full=False)
+        for path in self._wait(min(timeout, self._wait_timeout(time.time()))):
+            self._observe(path, time.time())
+
+    def _wait(self, timeout: float) -> List[str]:
+        """
+        Blocks up to `timeout` for a directory event or a finished parse. Returns
+        the paths reported by the watcher.
+        """
+        fds = [self._wake_r] + ([self._watcher.fd] if self._watcher is not None else [])
+        ready, _, _ = select.select(fds, [], [], timeout)
+        if self._wake_r in ready:
+            try:
+                while os.read(self._wake_r, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+        if self._watcher is not None and self._watcher.fd in ready:
+            return self._watcher.read(0)
+        return []
+
+    def _wake(self, _future: Future):
+        try:
+            os.write(self._wake_w, b"\0")
+        except OSError:
+            # Pipe full (a wakeup is already pending) or closed during shutdown.
+            pass
+
+    def _wait_timeout(self, now: float) -> float:
+        """
+        How long discovery may block: not at all while a settled file waits for a
+        free slot, otherwise until the next candidate is due, at most
+        `poll_interval`. With every slot busy, a finished parse wakes the loop.
+        """
+        if self._ready and self._has_free_slot():
+            return 0.0
+        timeout = self.poll_interval
+        if self._due:
+            timeout = min(timeout, max(self._due[0][0] - now, 0.0))
+        return timeout
+
+    def _settle_due(self, now: float):
+        """
+        Checks the candidates whose settle window or retry backoff has ended: one
+        stat each, then either queued for hashing or rescheduled if still changing.
+        """
+        while self._due and self._due[0][0] <= now:
+            due, path = heapq.heappop(self._due)
+            if path not in self._candidates or path in self._queued or due < self._due_at(path):
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._candidates[path]
+                continue
+            signature = (st.st_size, st.st_mtime_ns)
+            if signature != self._candidates[path][0]:
+                self._candidates[path] = (signature, now)
+                self._schedule(path)
+            elif st.st_size > 0:
+                # Empty files stay candidates until a write changes their signature.
+                self._queued.add(path)
+                self._ready.append(path)
+
+    # Processing ------------------------------------------------------------
+
+    def _status(self, sha256: str) -> Optional[sqlite3.Row]:
+        return self._state.execute("SELECT * FROM ingested_files WHERE sha256 = ?", (sha256,)).fetchone()
+
+    def _has_free_slot(self) -> bool:
+        return len(self._hashing) + len(self._in_flight) < self.max_in_flight
+
+    def _requeue(self, path: str):
+        self._queued.discard(path)
+        if path in self._candidates:
+            self._schedule(path)
+
+    def _start_hashing(self, now: float):
+        while self._ready and self._has_free_slot():
+            path = self._ready.popleft()
+            candidate = self._candidates.get(path)
+            if candidate is None or now < self._due_at(path):
+                # Changed again after settling; it is due later.
+                self._requeue(path)
+                continue
+            future = self._hasher.submit(_hash_settled, path)
+            future.add_done_callback(self._wake)
+            self._hashing[future] = (path, candidate[0])
+
+    def _submit_hashed(self, now: float):
+        for future in [f for f in self._hashing if f.done()]:
+            path, signature = self._hashing.pop(future)
+            candidate = self._candidates.get(path)
+            if candidate is None or candidate[0] != signature:
+                self._requeue(path)
+                continue
+            try:
+                sha256, after = future.result()
+            except OSError:
+                self._deferred[path] = now + self.poll_interval
+                self._requeue(path)
+                continue
+            if after != signature:
+                self._candidates[path] = (after, now)
+                self._requeue(path)
+                continue
+            self._queued.discard(path)
+            row = self._status(sha256)
+            if row is not None and row["status"] in ("done", "quarantined", "running"):
+                del self._candidates[path]
+                self._settled[path] = signature
+                continue
+            if row is not None and row["retry_at"] and row["retry_at"] > now:
+                self._deferred[path] = row["retry_at"]
+                self._schedule(path)
+                continue
+            self._deferred.pop(path, None)
+
+            self._state.execute(
+                "INSERT INTO ingested_files (sha256, path, status, updated_at) VALUES (?, ?, 'running', ?) "
+                "ON CONFLICT (sha256) DO UPDATE SET path = excluded.path, status = 'running', updated_at = excluded.updated_at",
+                (sha256, path, now),
+            )
+            del self._candidates[path]
+            self._settled[path] = signature
+            future = self.executor.submit(parse_task, path, self.merchant_dict)
+            self._in_flight[future] = (path, sha256)
+            future.add_done_callback(self._wake)
+
+    def _output_path(self, path: str, sha256: str) -> str:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.output_dir, f"{stem}.{sha256[:12]}.json")
+
+    def _complete(self, path: str, sha256: str, result: ExtractionResult):
+        output_path = None
+        if self.output_dir is not None:
+            output_path = self._output_path(path, sha256)
+            write_atomic(output_path, result.model_dump_json(indent=2).encode("utf-8"))
+        if self.store is not None:
+            self.store.save_result(result)
+        self._state.execute(
+            "UPDATE ingested_files SET status = 'done', output_path = ?, last_error = NULL, retry_at = NULL, "
+            "updated_at = ? WHERE sha256 = ?",
+            (output_path, time.time(), sha256),
+        )
+
+    def _fail(self, path: str, sha256: str, error: BaseException):
+        row = self._status(sha256)
+        attempts = (row["attempts"] if row else 0) + 1
+        now = time.time()
+        if attempts >= self.max_retries:
+            # The content hash keeps same-named files from different folders or days apart.
+            stem, ext = os.path.splitext(os.path.basename(path))
+            target = os.path.join(self.quarantine_dir, f"{stem}.{sha256[:12]}{ext}")
+            try:
+                shutil.move(path, target)
+            except OSError:
+                logger.warning("Could not move %s to quarantine", path, exc_info=True)
+            status, retry_at = "quarantined", None
+        else:
+            status, retry_at = "failed", now + self.retry_backoff * attempts
+            # Make the file a candidate again; it is retried once the backoff has passed.
+            self._settled.pop(path, None)
+            self._deferred[path] = retry_at
+            self._observe(path, now)
+        self._state.execute(
+            "UPDATE ingested_files SET status = ?, attempts = ?, last_error = ?, retry_at = ?, updated_at = ? "
+            "WHERE sha256 = ?",
+            (status, attempts, repr(error), retry_at, now, sha256),
+        )
+
+    def _reap(self):
+        for future in [f for f in self._in_flight if f.done()]:
+            path, sha256 = self._in_flight.pop(future)
+            try:
+                self._complete(path, sha256, future.result())
+            except Exception as exc:
+                logger.warning("Ingest of %s failed: %r", path, exc)
+                self._fail(path, sha256, exc)
+
+    def run_once(self, timeout: float = 0.0) -> int:
+        """
+        One discovery/submit/reap cycle; discovery waits up to `timeout` for new
+        files or finished parses. Returns the number of files still pending
+        (waiting to settle or in flight).
+        """
+        self._discover(timeout)
+        self._reap()
+        now = time.time()
+        self._submit_hashed(now)
+        self._settle_due(now)
+        self._start_hashing(now)
+        self._state.commit()
+        return len(self._candidates) + len(self._in_flight)
+
+    def recover(self):
+        """
+        Files left 'running' by a previous process are retried.
+        """
+        self._state.execute("UPDATE ingested_files SET status = 'failed' WHERE status = 'running'")
+        self._state.commit()
+
+    def run(self, stop: Optional[threading.Event] = None, once: bool = False):
+        """
+        Main loop. With `once`, process what is currently in the watch folders and return.
+        """
+        stop = stop or threading.Event()
+        self.recover()
+        # Whatever is already in the folders, whenever the last scan was.
+        self._scan(time.time())
+        while not stop.is_set():
+            pending = self.run_once(timeout=self.poll_interval)
+            if once and pending == 0:
+                break
+        # Let in-flight documents finish before exiting.
+        while self._in_flight or self._hashing:
+            self.run_once(timeout=self.poll_interval)
+
+    def close(self):
+        if self._watcher is not None:
+            self._watcher.close()
+        self._hasher.shutdown()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        self._state.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Watch folders and ingest statement PDFs.")
+    parser.add_argument("--watch", action="append", required=True, help="Directory to watch (repeatable).")
+    parser.add_argument("--output", help="Directory for per-file JSON results.")
+    parser.add_argument("--store", help="SQLite transaction store to write results into.")
+    parser.add_argument("--text-index", action="store_true", help="Maintain a search index next to --store.")
+    parser.add_argument("--quarantine", required=True, help="Directory for files that keep failing.")
+    parser.add_argument("--state", default="var/ingest.sqlite3", help="SQLite file tracking processed hashes.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--merchant-dict", default=None)
+    parser.add_argument("--page-cache-mb", type=float, default=64.0, help="Per-worker page cache size (0 disables).")
+    parser.add_argument("--settle-seconds", type=float, default=2.0)
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--poll", action="store_true", help="Disable inotify and poll the directories.")
+    parser.add_argument("--once", action="store_true", help="Process current files and exit.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    os.makedirs(os.path.dirname(os.path.abspath(args.state)), exist_ok=True)
+    executor = WorkerPool(max_workers=args.workers, page_cache_mb=args.page_cache_mb)
+    store = None
+    if args.store:
+        text_index = TextIndex(args.store + ".textindex") if args.text_index else None
+        store = TransactionStore(args.store, text_index=text_index)
+    daemon = IngestDaemon(
+        args.watch,
+        state_path=args.state,
+        quarantine_dir=args.quarantine,
+        executor=executor,
+        output_dir=args.output,
+        store=store,
+        merchant_dict=args.merchant_dict,
+        settle_seconds=args.settle_seconds,
+        max_retries=args.max_retries,
+        use_inotify=not args.poll,
+    )
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    try:
+        daemon.run(stop, once=args.once)
+    finally:
+        daemon.close()
+        executor.shutdown()
+        if store is not None:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from .models import ExtractionResult, JobInfo, JobStatus
+
+logger = logging.getLogger(__name__)
+
+ParseFn = Callable[[str], ExtractionResult]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    filename TEXT,
+    payload_path TEXT NOT NULL,
+    callback_url TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_expiry ON jobs (expires_at);
+"""
+
+
+def _to_datetime(ts: Optional[float]) -> Optional[datetime]:
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, tz=timezone.utc)
+
+
+class JobStore:
+    """
+    Durable job queue backed by a local SQLite database.
+    Uploaded payloads are spooled to disk next to the database so that queued
+    jobs survive a restart of the service.
+    """
+
+    def __init__(self, db_path: str, retention_seconds: float = 24 * 3600.0, max_attempts: int = 3):
+        self.db_path = db_path
+        self.spool_dir = os.path.join(os.path.dirname(os.path.abspath(db_path)), "spool")
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max_attempts
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self.recover()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def recover(self) -> int:
+        """
+        Requeue jobs that were running when the process stopped. A job that has
+        already been claimed max_attempts times is failed instead, so a payload
+        that keeps taking the process down cannot crash-loop the service.
+        """
+        now = time.time()
+        with self._lock:
+            poisoned = self._conn.execute(
+                "SELECT id, payload_path FROM jobs WHERE status = ? AND attempts >= ?",
+                (JobStatus.RUNNING.value, self.max_attempts),
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, expires_at = ? "
+                "WHERE status = ? AND attempts >= ?",
+                (
+                    JobStatus.FAILED.value,
+                    f"Job was interrupted {self.max_attempts} times; giving up.",
+                    now,
+                    now + self.retention_seconds,
+                    JobStatus.RUNNING.value,
+                    self.max_attempts,
+                ),
+            )
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?",
+                (JobStatus.QUEUED.value, JobStatus.RUNNING.value),
+            )
+        for row in poisoned:
+            logger.warning("Job %s failed after %d interrupted attempts", row["id"], self.max_attempts)
+            _remove_quietly(row["payload_path"])
+        return cur.rowcount
+
+    def enqueue(
+        self,
+        payload: bytes,
+        filename: Optional[str] = None,
+        priority: int = 0,
+        callback_url: Optional[str] = None,
+    ) -> JobInfo:
+        job_id = uuid.uuid4().hex
+        payload_path = os.path.join(self.spool_dir, f"{job_id}.pdf")
+        tmp_path = payload_path + ".tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(payload)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, payload_path)
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, priority, filename, payload_path, callback_url, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, JobStatus.QUEUED.value, priority, filename, payload_path, callback_url, time.time()),
+            )
+        return self.get(job_id)
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """
+        Atomically take the highest-priority queued job and mark it running.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY priority DESC, created_at ASC LIMIT 1",
+                    (JobStatus.QUEUED.value,),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        (JobStatus.RUNNING.value, time.time(), row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def complete(self, job_id: str, result: ExtractionResult):
+        self._finish(job_id, JobStatus.SUCCEEDED, result=result.model_dump_json())
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, JobStatus.FAILED, error=error)
+
+    def _finish(self, job_id: str, status: JobStatus, result: Optional[str] = None, error: Optional[str] = None):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT payload_path FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, expires_at = ? WHERE id = ?",
+                (status.value, result, error, now, now + self.retention_seconds, job_id),
+            )
+        if row is not None:
+            _remove_quietly(row["payload_path"])
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row["expires_at"] is not None and row["expires_at"] <= time.time():
+            return None
+        return _row_to_info(row)
+
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload_path FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).fetchall()
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(r["id"],) for r in rows])
+        for row in rows:
+            _remove_quietly(row["payload_path"])
+        return len(rows)
+
+
+def _row_to_info(row: sqlite3.Row) -> JobInfo:
+    result = None
+    if row["result"]:
+        result = ExtractionResult.model_validate_json(row["result"])
+    return JobInfo(
+        id=row["id"],
+        status=JobStatus(row["status"]),
+        priority=row["priority"],
+        filename=row["filename"],
+        callback_url=row["callback_url"],
+        attempts=row["attempts"],
+        created_at=_to_datetime(row["created_at"]),
+        started_at=_to_datetime(row["started_at"]),
+        finished_at=_to_datetime(row["finished_at"]),
+        result=result,
+        error=row["error"],
+    )
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def notify_callback(url: str, info: JobInfo, timeout: float = 10.0):
+    """
+    POST the finished job as JSON to the client's callback URL.
+    Failures are logged and otherwise ignored; the result stays available via GET.
+    """
+    body = json.dumps(info.model_dump(mode="json")).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout):
+            pass
+    except Exception:
+        logger.warning("Callback to %s for job %s failed", url, info.id, exc_info=True)
+
+
+class JobRunner:
+    """
+    Background worker threads that pull jobs from a JobStore in priority order.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        parse_fn: ParseFn,
+        workers: int = 1,
+        poll_interval: float = 0.5,
+        purge_interval: float = 60.0,
+        notify: Callable[[str, JobInfo], None] = notify_callback,
+    ):
+        self.store = store
+        self.parse_fn = parse_fn
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self.notify = notify
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._last_purge = 0.0
+
+    def start(self):
+        self._stop.clear()
+        for idx in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"job-worker-{idx}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if time.time() - self._last_purge >= self.purge_interval:
+                self._last_purge = time.time()
+                self.store.purge_expired()
+            if not self.run_once():
+                self._stop.wait(self.poll_interval)
+
+    def run_once(self) -> bool:
+        """
+        Process a single job if one is queued. Returns False when the queue is empty.
+        """
+        row = self.store.claim()
+        if row is None:
+            return False
+        job_id = row["id"]
+        try:
+            result = self.parse_fn(row["payload_path"])
+        except Exception as exc:
+            self.store.fail(job_id, f"Failed to parse PDF: {exc}")
+        else:
+            self.store.complete(job_id, result)
+
+        if row["callback_url"]:
+            info = self.store.get(job_id)
+            if info is not None:
+                self.notify(row["callback_url"], info)
+        return True
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import pickle
+import unicodedata
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .models import ExtractionResult
+
+# Bump when the compiled layout changes so stale on-disk caches are rebuilt.
+INDEX_FORMAT_VERSION = 1
+
+
+class MerchantEntry(BaseModel):
+    merchant: str
+    category: Optional[str] = None
+    patterns: List[str]
+
+
+def _is_thai(ch: str) -> bool:
+    return "฀" <= ch <= "๿"
+
+
+def normalize_text(text: str) -> str:
+    """
+    NFKC + casefold, every non-alphanumeric run collapsed to a single space.
+    Thai letters and combining vowels/tone marks are kept as-is.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    out: List[str] = []
+    pending_space = False
+    for ch in text:
+        if ch.isalnum() or _is_thai(ch):
+            if pending_space and out:
+                out.append(" ")
+            pending_space = False
+            out.append(ch)
+        else:
+            pending_space = True
+    return "".join(out)
+
+
+def _pattern_key(pattern: str) -> str:
+    normalized = normalize_text(pattern)
+    if not normalized:
+        return ""
+    # Latin/digit patterns must match whole tokens; Thai has no word separators,
+    # so Thai patterns match anywhere in the description.
+    if any(_is_thai(ch) for ch in normalized):
+        return normalized
+    return f" {normalized} "
+
+
+class MerchantIndex:
+    """
+    Aho-Corasick automaton over normalized description characters.
+
+    Each state keeps the best (longest) dictionary match ending there, merged
+    along failure links at compile time, so a lookup is one pass over the
+    description: time depends on description length only, not dictionary size.
+    """
+
+    def __init__(self, entries: Iterable[MerchantEntry]):
+        self.entries: List[Tuple[str, Optional[str]]] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._best: List[Optional[Tuple[int, int]]] = [None]  # (pattern length, entry index)
+
+        for entry in entries:
+            entry_idx = len(self.entries)
+            self.entries.append((entry.merchant, entry.category))
+            for pattern in entry.patterns:
+                key = _pattern_key(pattern)
+                if key:
+                    self._insert(key, entry_idx)
+        self._build_failure_links()
+
+    def _insert(self, key: str, entry_idx: int):
+        state = 0
+        for ch in key:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            state = nxt
+        current = self._best[state]
+        if current is None or len(key) > current[0]:
+            self._best[state] = (len(key), entry_idx)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                inherited = self._best[self._fail[nxt]]
+                own = self._best[nxt]
+                if inherited is not None and (own is None or inherited[0] > own[0]):
+                    self._best[nxt] = inherited
+
+    def lookup(self, description: str) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        Returns (merchant, category) for the longest dictionary pattern found in
+        the description, or None.
+        """
+        text = f" {normalize_text(description)} "
+        goto, fail, best_at = self._goto, self._fail, self._best
+        state = 0
+        best: Optional[Tuple[int, int]] = None
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            hit = best_at[state]
+            if hit is not None and (best is None or hit[0] > best[0]):
+                best = hit
+        if best is None:
+            return None
+        return self.entries[best[1]]
+
+    def enrich(self, result: ExtractionResult) -> ExtractionResult:
+        for txn in result.transactions:
+            match = self.lookup(txn.description)
+            if match is not None:
+                txn.merchant, txn.category = match
+        return result
+
+
+def load_merchant_entries(dict_path: str) -> List[MerchantEntry]:
+    with open(dict_path, "r", encoding="utf-8") as fh:
+        return [MerchantEntry.model_validate(item) for item in json.load(fh)]
+
+
+def compile_merchant_index(dict_path: str, cache_path: Optional[str] = None) -> MerchantIndex:
+    """
+    Loads a compiled index for a JSON merchant dictionary, rebuilding and caching
+    it on disk (`<dict_path>.idx` by default) whenever the dictionary changes.
+    """
+    with open(dict_path, "rb") as fh:
+        digest = hashlib.sha256(fh.read()).hexdigest()
+    cache_path = cache_path or f"{dict_path}.idx"
+    cache_key = (INDEX_FORMAT_VERSION, digest)
+
+    try:
+        with open(cache_path, "rb") as fh:
+            key, index = pickle.load(fh)
+        if key == cache_key:
+            return index
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        pass
+
+    index = MerchantIndex(load_merchant_entries(dict_path))
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as fh:
+            pickle.dump((cache_key, index), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+    return index
+
+
+@lru_cache(maxsize=4)
+def get_merchant_index(dict_path: str) -> MerchantIndex:
+    """
+    Per-process cached index, so pool workers load the compiled dictionary once.
+    """
+    return compile_merchant_index(dict_path)
@@ -1,6 +1,6 @@
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field
-from datetime import date
+from datetime import date, datetime
 from enum import Enum, auto
 
 class ParserState(Enum):
@@ -46,6 +46,28 @@ class Transaction(BaseModel):
     foreign_currency: Optional[str] = None
     conversion_rate: Optional[float] = None
     notes: Optional[str] = None
+    merchant: Optional[str] = None
+    category: Optional[str] = None
+
+class StoredTransaction(Transaction):
+    id: int
+    statement_id: int
+    account: str
+
+class TransactionPage(BaseModel):
+    items: List[StoredTransaction] = []
+    next_cursor: Optional[str] = None
+
+class MonthlyRollup(BaseModel):
+    account: str
+    month: str  # YYYY-MM of post_date
+    currency: str
+    foreign_currency: Optional[str] = None
+    count: int
+    total: float
+    debits: float
+    credits: float
+    foreign_total: float = 0.0
 
 class RewardBalance(BaseModel):
     points_previous_balance: int = 0
@@ -63,6 +85,94 @@ class ExtractionResult(BaseModel):
     rewards: Optional[RewardBalance] = None
     validation: ValidationResult = Field(default_factory=ValidationResult)
 
+class BatchItem(BaseModel):
+    """One NDJSON line of a /parse/batch response."""
+    index: int
+    filename: Optional[str] = None
+    status_code: int
+    result: Optional[ExtractionResult] = None
+    error: Optional[str] = None
+    retry_after: Optional[int] = None
+
+class PreflightReport(BaseModel):
+    page_count: int
+    has_text_layer: bool
+    cost: float
+
+class WorkerStats(BaseModel):
+    worker: int
+    pid: Optional[int] = None
+    tasks: int = 0
+    rss_mb: float = 0.0
+
+class RecycleEvent(BaseModel):
+    worker: int
+    reason: str
+    tasks: int
+    rss_mb: float
+    at: float
+
+class PageCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_mb: float = 0.0
+    hit_rate: float = 0.0
+
+class RuleSetInfo(BaseModel):
+    provider: str
+    version: str
+    digest: str
+    path: Optional[str] = None
+    loaded_at: float
+
+class WorkerPoolMetrics(BaseModel):
+    workers: List[WorkerStats] = []
+    tasks_completed: int = 0
+    tasks_failed: int = 0
+    queued: int = 0
+    peak_document_rss_mb: float = 0.0
+    recycles: Dict[str, int] = {}
+    recent_recycles: List[RecycleEvent] = []
+    page_cache: Optional[PageCacheStats] = None
+    result_cache: Optional[PageCacheStats] = None
+
+class StageStats(BaseModel):
+    name: str
+    workers: int
+    items: int = 0
+    busy_s: float = 0.0
+    starved_s: float = 0.0  # waiting for input from the previous stage
+    blocked_s: float = 0.0  # waiting for room in the next stage
+    utilization: float = 0.0
+
+class PipelineReport(BaseModel):
+    elapsed_s: float
+    documents: int = 0
+    failed: int = 0
+    stages: List[StageStats] = []
+    bottleneck: Optional[str] = None
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class JobInfo(BaseModel):
+    id: str
+    status: JobStatus
+    priority: int = 0
+    filename: Optional[str] = None
+    callback_url: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[ExtractionResult] = None
+    error: Optional[str] = None
+
 class ParserStateOutput(BaseModel):
     """Container for intermediate parser states if needed"""
     pass
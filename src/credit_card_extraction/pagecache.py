@@ -0,0 +1,196 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import fitz  # PyMuPDF
+
+from .models import PageCacheStats
+
+# Bump when the key derivation or cached layout changes.
+PAGE_KEY_VERSION = b"2"
+
+# (x0, y0, x1, y1, text); page numbers are attached on the way out so entries are shareable.
+CachedBlock = Tuple[float, float, float, float, str]
+
+_REF_PATTERN = re.compile(r"(\d+) (\d+) R")
+# /Parent (page tree, popups) and /P (an annotation's page) point back at the page.
+_PARENT_PATTERN = re.compile(r"/(?:Parent|P)\s+\d+\s+\d+\s+R")
+_BLOCK_OVERHEAD = 64
+
+
+def _object_digest(doc: "fitz.Document", xref: int, memo: Dict[int, bytes], active: Set[int]) -> bytes:
+    """
+    Content digest of an indirect object and everything it references, with object
+    numbers replaced by the digests of their targets, so the same font or image
+    hashes identically in differently numbered (e.g. re-exported) files.
+    """
+    if xref in memo:
+        return memo[xref]
+    if xref in active:
+        return b"cycle"
+    active.add(xref)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(_resolve_refs(doc, doc.xref_object(xref, compressed=True), memo, active))
+    if doc.xref_is_stream(xref):
+        h.update(hashlib.blake2b(doc.xref_stream_raw(xref) or b"").digest())
+    active.discard(xref)
+    memo[xref] = h.digest()
+    return memo[xref]
+
+
+def _resolve_refs(doc: "fitz.Document", source: str, memo: Dict[int, bytes], active: Set[int]) -> bytes:
+    # Back links lead into the page tree, which would make keys document-specific.
+    source = _PARENT_PATTERN.sub("", source)
+    parts: List[bytes] = []
+    last = 0
+    for match in _REF_PATTERN.finditer(source):
+        parts.append(source[last:match.start()].encode("utf-8", "surrogateescape"))
+        parts.append(_object_digest(doc, int(match.group(1)), memo, active).hex().encode("ascii"))
+        last = match.end()
+    parts.append(source[last:].encode("utf-8", "surrogateescape"))
+    return b"".join(parts)
+
+
+def _resources_digest(doc: "fitz.Document", page: "fitz.Page", memo: Dict[int, bytes]) -> bytes:
+    xref = page.xref
+    # Resources may be inherited from an ancestor in the page tree.
+    for _ in range(32):
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind == "xref":
+            return _object_digest(doc, int(value.split()[0]), memo, set())
+        if kind == "dict":
+            return _resolve_refs(doc, value, memo, set())
+        kind, value = doc.xref_get_key(xref, "Parent")
+        if kind != "xref":
+            break
+        xref = int(value.split()[0])
+    return b""
+
+
+def _annots_digest(doc: "fitz.Document", page: "fitz.Page", memo: Dict[int, bytes]) -> bytes:
+    # get_text() includes annotation and widget text, so their dictionaries and
+    # appearance streams are part of the key.
+    kind, value = doc.xref_get_key(page.xref, "Annots")
+    if kind == "xref":
+        return _object_digest(doc, int(value.split()[0]), memo, set())
+    if kind == "array":
+        return _resolve_refs(doc, value, memo, set())
+    return b""
+
+
+def page_fingerprint(doc: "fitz.Document", page: "fitz.Page", memo: Optional[Dict[int, bytes]] = None) -> bytes:
+    """
+    Key for a page's extracted blocks: its content stream, the resources it draws with
+    (fonts, form XObjects, images), its annotations and its geometry. `memo` caches object digests
+    across the pages of one document.
+    """
+    memo = memo if memo is not None else {}
+    h = hashlib.blake2b(digest_size=20)
+    h.update(PAGE_KEY_VERSION)
+    h.update(page.read_contents())
+    h.update(_resources_digest(doc, page, memo))
+    h.update(_annots_digest(doc, page, memo))
+    h.update(repr((tuple(page.rect), tuple(page.mediabox), page.rotation)).encode("ascii"))
+    return h.digest()
+
+
+def _hit_rate(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def _entry_size(blocks: Iterable[CachedBlock]) -> int:
+    return sum(_BLOCK_OVERHEAD + len(block[4].encode("utf-8")) for block in blocks)
+
+
+class PageCache:
+    """
+    In-memory LRU of extracted page blocks keyed by page_fingerprint, bounded by the
+    approximate size of the cached text. Safe to share between threads.
+    """
+
+    def __init__(self, max_mb: float = 64.0):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._entries: "OrderedDict[bytes, Tuple[List[CachedBlock], int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: bytes) -> Optional[List[CachedBlock]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def _size(self, blocks: List[CachedBlock]) -> int:
+        return _entry_size(blocks)
+
+    def put(self, key: bytes, blocks: List[CachedBlock]):
+        size = self._size(blocks)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (blocks, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> PageCacheStats:
+        with self._lock:
+            return PageCacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                size_mb=self._bytes / (1024 * 1024),
+                hit_rate=_hit_rate(self.hits, self.misses),
+            )
+
+
+def combine_page_cache_stats(stats: Iterable[Optional[PageCacheStats]]) -> Optional[PageCacheStats]:
+    combined: Optional[PageCacheStats] = None
+    for item in stats:
+        if item is None:
+            continue
+        if combined is None:
+            combined = item.model_copy()
+            continue
+        combined.hits += item.hits
+        combined.misses += item.misses
+        combined.evictions += item.evictions
+        combined.entries += item.entries
+        combined.size_mb += item.size_mb
+    if combined is not None:
+        combined.hit_rate = _hit_rate(combined.hits, combined.misses)
+    return combined
+
+
+_default_cache: Optional[PageCache] = None
+
+
+def configure_page_cache(max_mb: float) -> Optional[PageCache]:
+    """
+    Sets this process's shared page cache; 0 disables it.
+    """
+    global _default_cache
+    _default_cache = PageCache(max_mb) if max_mb > 0 else None
+    return _default_cache
+
+
+def get_page_cache() -> Optional[PageCache]:
+    return _default_cache
@@ -0,0 +1,282 @@
+import argparse
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from .extractor import parse_pdf
+from .ingest import write_atomic
+from .merchants import get_merchant_index
+from .models import ExtractionResult, PipelineReport, StageStats
+from .pagecache import get_page_cache
+from .resultcache import get_result_cache
+from .workers import WorkerPool
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+def parse_bytes_task(payload: bytes, merchant_dict: Optional[str] = None) -> Tuple[ExtractionResult, float]:
+    """
+    Pool entry point for the pipeline: parses an already-read PDF and returns the
+    result with the seconds spent in the worker.
+    """
+    started = time.perf_counter()
+    merchant_index = get_merchant_index(merchant_dict) if merchant_dict else None
+    result = parse_pdf(
+        payload, merchant_index=merchant_index, page_cache=get_page_cache(), result_cache=get_result_cache()
+    )
+    return result, time.perf_counter() - started
+
+
+def iter_pdf_paths(inputs: Iterable[str]) -> Iterator[str]:
+    """
+    Expands files and directories (recursively) into PDF paths.
+    """
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in sorted(files):
+                    if name.lower().endswith(".pdf"):
+                        yield os.path.join(root, name)
+        else:
+            yield item
+
+
+class _StageTimer:
+    def __init__(self, name: str, workers: int):
+        self.stats = StageStats(name=name, workers=workers)
+        self._lock = threading.Lock()
+
+    def add(self, busy: float = 0.0, starved: float = 0.0, blocked: float = 0.0, items: int = 0):
+        with self._lock:
+            self.stats.busy_s += busy
+            self.stats.starved_s += starved
+            self.stats.blocked_s += blocked
+            self.stats.items += items
+
+    def finish(self, elapsed: float) -> StageStats:
+        if elapsed and self.stats.workers:
+            self.stats.utilization = self.stats.busy_s / (elapsed * self.stats.workers)
+        return self.stats
+
+
+class Pipeline:
+    """
+    Bulk processing as three overlapping stages joined by bounded queues:
+
+        read (threads) -> extract + parse (process pool) -> serialize + write (threads)
+
+    At most `max_in_flight` documents are between the read queue and a finished
+    write, so a slow sink stalls the parse stage, which in turn fills the read
+    queue and stalls the readers; memory stays bounded whatever the input size.
+    Every stage records busy, starved (waiting for input) and blocked (waiting
+    for room downstream) time; the report names the most utilized stage.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        executor: Executor,
+        readers: int = 2,
+        writers: int = 2,
+        read_queue_size: Optional[int] = None,
+        max_in_flight: Optional[int] = None,
+        merchant_dict: Optional[str] = None,
+    ):
+        self.output_dir = output_dir
+        self.executor = executor
+        self.readers = readers
+        self.writers = writers
+        pool_workers = getattr(executor, "_max_workers", 1)
+        self.pool_workers = pool_workers
+        self.max_in_flight = max_in_flight or 2 * pool_workers
+        self._read_queue: "queue.Queue" = queue.Queue(maxsize=read_queue_size or 2 * pool_workers)
+        self._write_queue: "queue.Queue" = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self.merchant_dict = merchant_dict
+        self._paths_lock = threading.Lock()
+        self._pending_lock = threading.Condition()
+        self._pending = 0
+        self._failed = 0
+        self._written = 0
+        self._read_timer = _StageTimer("read", readers)
+        self._parse_timer = _StageTimer("parse", pool_workers)
+        self._write_timer = _StageTimer("write", writers)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def output_path(self, path: str, sha256: str) -> str:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.output_dir, f"{stem}.{sha256[:12]}.json")
+
+    def _record_failure(self, path: str, error: BaseException):
+        logger.warning("Failed to process %s: %r", path, error)
+        with self._pending_lock:
+            self._failed += 1
+
+    # Stages -----------------------------------------------------------------
+
+    def _reader(self, paths: Iterator[str]):
+        while True:
+            with self._paths_lock:
+                path = next(paths, None)
+            if path is None:
+                return
+            started = time.perf_counter()
+            try:
+                with open(path, "rb") as fh:
+                    payload = fh.read()
+            except OSError as exc:
+                self._record_failure(path, exc)
+                continue
+            read_done = time.perf_counter()
+            self._read_queue.put((path, payload))
+            self._read_timer.add(busy=read_done - started, blocked=time.perf_counter() - read_done, items=1)
+
+    def _dispatcher(self):
+        while True:
+            waited = time.perf_counter()
+            item = self._read_queue.get()
+            got = time.perf_counter()
+            if item is _DONE:
+                self._parse_timer.add(starved=got - waited)
+                break
+            # Waiting for an in-flight slot means the write stage is behind.
+            self._slots.acquire()
+            submitted = time.perf_counter()
+            self._parse_timer.add(starved=got - waited, blocked=submitted - got)
+
+            path, payload = item
+            digest = hashlib.sha256(payload).hexdigest()
+            with self._pending_lock:
+                self._pending += 1
+            try:
+                future = self.executor.submit(parse_bytes_task, payload, self.merchant_dict)
+            except Exception as exc:
+                # E.g. a broken or shut-down pool: no write will release this slot or pending count.
+                self._slots.release()
+                with self._pending_lock:
+                    self._pending -= 1
+                    self._pending_lock.notify_all()
+                self._record_failure(path, exc)
+                continue
+            future.add_done_callback(lambda f, path=path, digest=digest: self._parsed(path, digest, f))
+
+        with self._pending_lock:
+            self._pending_lock.wait_for(lambda: self._pending == 0)
+        for _ in range(self.writers):
+            self._write_queue.put(_DONE)
+
+    def _parsed(self, path: str, digest: str, future: Future):
+        self._write_queue.put((path, digest, future))
+        with self._pending_lock:
+            self._pending -= 1
+            self._pending_lock.notify_all()
+
+    def _writer(self):
+        while True:
+            waited = time.perf_counter()
+            item = self._write_queue.get()
+            started = time.perf_counter()
+            self._write_timer.add(starved=started - waited)
+            if item is _DONE:
+                return
+            path, digest, future = item
+            try:
+                result, worker_seconds = future.result()
+                self._parse_timer.add(busy=worker_seconds, items=1)
+                write_atomic(self.output_path(path, digest), result.model_dump_json(indent=2).encode("utf-8"))
+            except Exception as exc:
+                self._record_failure(path, exc)
+            else:
+                with self._pending_lock:
+                    self._written += 1
+                self._write_timer.add(busy=time.perf_counter() - started, items=1)
+            finally:
+                self._slots.release()
+
+    def run(self, inputs: Iterable[str]) -> PipelineReport:
+        paths = iter_pdf_paths(inputs)
+        started = time.perf_counter()
+        readers = [
+            threading.Thread(target=self._reader, args=(paths,), name=f"pipeline-read-{idx}", daemon=True)
+            for idx in range(self.readers)
+        ]
+        writers = [
+            threading.Thread(target=self._writer, name=f"pipeline-write-{idx}", daemon=True)
+            for idx in range(self.writers)
+        ]
+        dispatcher = threading.Thread(target=self._dispatcher, name="pipeline-dispatch", daemon=True)
+        for thread in readers + writers + [dispatcher]:
+            thread.start()
+        for thread in readers:
+            thread.join()
+        self._read_queue.put(_DONE)
+        dispatcher.join()
+        for thread in writers:
+            thread.join()
+
+        elapsed = time.perf_counter() - started
+        stages = [timer.finish(elapsed) for timer in (self._read_timer, self._parse_timer, self._write_timer)]
+        bottleneck = max(stages, key=lambda stage: stage.utilization) if elapsed else None
+        return PipelineReport(
+            elapsed_s=elapsed,
+            documents=self._written,
+            failed=self._failed,
+            stages=stages,
+            bottleneck=bottleneck.name if bottleneck else None,
+        )
+
+
+def run_pipeline(
+    inputs: Iterable[str],
+    output_dir: str,
+    executor: Optional[Executor] = None,
+    max_workers: Optional[int] = None,
+    **kwargs,
+) -> PipelineReport:
+    own_executor = executor is None
+    if own_executor:
+        executor = WorkerPool(max_workers=max_workers)
+    try:
+        return Pipeline(output_dir, executor, **kwargs).run(inputs)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Pipelined bulk extraction of PDF statements.")
+    parser.add_argument("inputs", nargs="+", help="PDF files or directories.")
+    parser.add_argument("--output", required=True, help="Directory for per-file JSON results.")
+    parser.add_argument("--workers", type=int, default=None, help="Parse processes (default: CPU count).")
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    parser.add_argument("--merchant-dict", default=None)
+    parser.add_argument("--page-cache-mb", type=float, default=64.0, help="Per-worker page cache size (0 disables).")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    executor = WorkerPool(max_workers=args.workers, page_cache_mb=args.page_cache_mb)
+    try:
+        report = Pipeline(
+            args.output,
+            executor,
+            readers=args.readers,
+            writers=args.writers,
+            max_in_flight=args.max_in_flight,
+            merchant_dict=args.merchant_dict,
+        ).run(args.inputs)
+    finally:
+        executor.shutdown()
+    print(report.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
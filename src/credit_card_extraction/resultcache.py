@@ -0,0 +1,58 @@
+import hashlib
+from typing import Iterable, Optional
+
+from .models import ExtractionResult
+from .pagecache import PageCache
+from .rules import RuleSet
+
+# Bump when the key derivation changes.
+RESULT_KEY_VERSION = b"1"
+
+
+def result_cache_key(document_digest: bytes, rules: RuleSet, fields: Optional[Iterable[str]] = None) -> bytes:
+    """
+    Key of a parse result: the document's bytes, the provider, the exact rule set
+    (version + file digest) and the requested fields. A rule change for one provider
+    changes only that provider's keys; its old entries are never hit again and age
+    out of the LRU, while other providers keep their warm entries.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    h.update(RESULT_KEY_VERSION)
+    h.update(document_digest)
+    for part in (rules.provider, rules.token, ",".join(sorted(fields)) if fields is not None else "*"):
+        h.update(b"\x1f")
+        h.update(part.encode("utf-8"))
+    return h.digest()
+
+
+class ResultCache(PageCache):
+    """
+    LRU of parse results (before merchant enrichment) stored as JSON, bounded by the
+    JSON size. Every hit returns a new ExtractionResult, so callers may mutate it.
+    """
+
+    def _size(self, payload: bytes) -> int:
+        return len(payload)
+
+    def get_result(self, key: bytes) -> Optional[ExtractionResult]:
+        payload = self.get(key)
+        return ExtractionResult.model_validate_json(payload) if payload is not None else None
+
+    def put_result(self, key: bytes, result: ExtractionResult):
+        self.put(key, result.model_dump_json().encode("utf-8"))
+
+
+_default_cache: Optional[ResultCache] = None
+
+
+def configure_result_cache(max_mb: float) -> Optional[ResultCache]:
+    """
+    Sets this process's shared result cache; 0 disables it.
+    """
+    global _default_cache
+    _default_cache = ResultCache(max_mb) if max_mb > 0 else None
+    return _default_cache
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    return _default_cache
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Pattern, Tuple
+
+from .models import RuleSetInfo
+
+logger = logging.getLogger(__name__)
+
+RULES_DIR_ENV = "CCE_RULES_DIR"
+DEFAULT_RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rulesets")
+DEFAULT_PROVIDER = "ttb"
+
+REQUIRED_PATTERNS = (
+    "date",
+    "amount",
+    "fx",
+    "txn_two_dates",
+    "txn_one_date",
+    "card_number",
+    "header_dates_row",
+    "direct_debit_row",
+    "credit_info_row",
+)
+SECTIONS = ("transactions", "rewards", "footer")
+
+
+class RuleSetError(ValueError):
+    """Raised for a rule file that cannot be compiled, or an unknown provider."""
+
+
+class RuleSet:
+    """
+    A provider's parsing rules compiled from a versioned JSON file: regexes are
+    compiled once, header summary patterns are kept in file order with their value
+    type resolved, and the footer keywords become a single alternation, so finding
+    the earliest footer keyword is one regex search instead of a scan per keyword.
+    Immutable once built; parses in flight keep the RuleSet they started with.
+    """
+
+    def __init__(self, spec: Mapping[str, Any], digest: str, path: Optional[str] = None):
+        try:
+            self.provider: str = spec["provider"]
+            self.version: str = str(spec["version"])
+            patterns = spec["patterns"]
+            missing = [name for name in REQUIRED_PATTERNS if name not in patterns]
+            if missing:
+                raise RuleSetError(f"Missing patterns: {', '.join(missing)}")
+            self.date = re.compile(patterns["date"])
+            self.amount = re.compile(patterns["amount"])
+            self.fx = re.compile(patterns["fx"])
+            self.txn_two_dates = re.compile(patterns["txn_two_dates"])
+            self.txn_one_date = re.compile(patterns["txn_one_date"])
+            self.card_number = re.compile(patterns["card_number"])
+            self.header_dates_row = re.compile(patterns["header_dates_row"])
+            self.direct_debit_row = re.compile(patterns["direct_debit_row"])
+            self.credit_info_row = re.compile(patterns["credit_info_row"])
+
+            # (field, pattern, value is a date)
+            self.header_summary: Tuple[Tuple[str, Pattern[str], bool], ...] = tuple(
+                (
+                    item["field"],
+                    re.compile(item["pattern"], re.IGNORECASE if item.get("ignore_case") else 0),
+                    "date" in item["field"],
+                )
+                for item in spec.get("header_summary", ())
+            )
+            self.summary_patterns: Mapping[str, Pattern[str]] = MappingProxyType(
+                {field: pattern for field, pattern, _ in self.header_summary}
+            )
+
+            sections = spec.get("sections", {})
+            markers: Dict[str, Tuple[str, ...]] = {
+                name: tuple(marker.lower() for marker in sections.get(name, ())) for name in SECTIONS
+            }
+            self.transaction_markers = markers["transactions"]
+            self.reward_markers = markers["rewards"]
+            self.footer_markers = markers["footer"]
+
+            self.footer_keywords: Tuple[str, ...] = tuple(
+                keyword.lower() for keyword in spec.get("footer_keywords", ())
+            )
+            self._footer = (
+                re.compile("|".join(re.escape(keyword) for keyword in self.footer_keywords))
+                if self.footer_keywords
+                else None
+            )
+        except RuleSetError:
+            raise
+        except (KeyError, TypeError, re.error) as exc:
+            raise RuleSetError(f"Invalid rule set {path or ''}: {exc!r}") from exc
+        self.digest = digest
+        self.path = path
+        self.loaded_at = time.time()
+
+    @property
+    def token(self) -> str:
+        """
+        Identifies exactly these rules: the declared version plus the file digest, so
+        an edit that forgets to bump the version still changes cache keys.
+        """
+        return f"{self.version}+{self.digest[:12]}"
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleSet":
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        try:
+            spec = json.loads(raw)
+        except ValueError as exc:
+            raise RuleSetError(f"Invalid rule set {path}: {exc}") from exc
+        return cls(spec, hashlib.sha256(raw).hexdigest(), path)
+
+    def find_footer(self, lower_text: str) -> Optional[int]:
+        """
+        Index of the earliest footer keyword in already lower-cased text, or None.
+        """
+        if self._footer is None:
+            return None
+        match = self._footer.search(lower_text)
+        return match.start() if match else None
+
+    def info(self) -> RuleSetInfo:
+        return RuleSetInfo(
+            provider=self.provider,
+            version=self.version,
+            digest=self.digest,
+            path=self.path,
+            loaded_at=self.loaded_at,
+        )
+
+
+class RuleRegistry:
+    """
+    The compiled rule sets of one process, loaded from `*.json` files in `rules_dir`.
+
+    `get()` checks the files' modification times at most every `check_interval`
+    seconds and recompiles only files that changed; the provider table is then
+    replaced with a single reference assignment, so readers never see a partial
+    update and parses in flight finish with the rules they started with. A file
+    that fails to compile is logged and its previous rules stay in service.
+    """
+
+    def __init__(self, rules_dir: str = DEFAULT_RULES_DIR, check_interval: float = 2.0):
+        self.rules_dir = rules_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._rulesets: Mapping[str, RuleSet] = MappingProxyType({})
+        # path -> ((mtime_ns, size), provider)
+        self._files: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._checked_at = 0.0
+        self.reload()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        stats = {}
+        try:
+            names = sorted(os.listdir(self.rules_dir))
+        except OSError as exc:
+            logger.warning("Cannot list rules directory %s: %r", self.rules_dir, exc)
+            return stats
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.rules_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def reload(self) -> List[str]:
+        """
+        Recompiles changed rule files and swaps them in. Returns the providers whose
+        rules changed.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            stats = self._scan()
+            rulesets = dict(self._rulesets)
+            files = dict(self._files)
+            changed: List[str] = []
+
+            for path in set(files) - set(stats):
+                # Rules of a removed file stay in service until another file replaces them.
+                files.pop(path)
+
+            for path, stat in stats.items():
+                previous = files.get(path)
+                if previous is not None and previous[0] == stat:
+                    continue
+                try:
+                    ruleset = RuleSet.from_file(path)
+                except (OSError, RuleSetError) as exc:
+                    logger.warning("Keeping previous rules; %s failed to compile: %r", path, exc)
+                    continue
+                files[path] = (stat, ruleset.provider)
+                current = rulesets.get(ruleset.provider)
+                if current is None or current.token != ruleset.token:
+                    rulesets[ruleset.provider] = ruleset
+                    changed.append(ruleset.provider)
+                    logger.info("Loaded %s rules %s from %s", ruleset.provider, ruleset.token, path)
+
+            self._files = files
+            if changed:
+                self._rulesets = MappingProxyType(rulesets)
+            return changed
+
+    def get(self, provider: str = DEFAULT_PROVIDER) -> RuleSet:
+        if self.check_interval >= 0 and time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+        ruleset = self._rulesets.get(provider)
+        if ruleset is None:
+            raise RuleSetError(f"No rules loaded for provider: {provider}")
+        return ruleset
+
+    def rulesets(self) -> List[RuleSet]:
+        return [self._rulesets[provider] for provider in sorted(self._rulesets)]
+
+
+_registry: Optional[RuleRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def configure_rules(rules_dir: Optional[str] = None, check_interval: float = 2.0) -> RuleRegistry:
+    """
+    Sets this process's rule registry. Without `rules_dir`, CCE_RULES_DIR or the
+    packaged rule sets are used.
+    """
+    global _registry
+    with _registry_lock:
+        _registry = RuleRegistry(rules_dir or os.environ.get(RULES_DIR_ENV) or DEFAULT_RULES_DIR, check_interval)
+        return _registry
+
+
+def get_rule_registry() -> RuleRegistry:
+    """
+    This process's registry, created on first use (pool workers inherit CCE_RULES_DIR).
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = RuleRegistry(os.environ.get(RULES_DIR_ENV) or DEFAULT_RULES_DIR)
+    return _registry
+
+
+def get_rules(provider: str = DEFAULT_PROVIDER) -> RuleSet:
+    return get_rule_registry().get(provider)
@@ -0,0 +1,408 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .ingest import write_atomic
+from .workers import WorkerCrashedError, WorkerPool, parse_task
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_DIR = "manifest"
+LEASE_DIR = "leases"
+CLAIM_DIR = "claims"
+OUTPUT_DIR = "out"
+HOST_DIR = "hosts"
+DONE_DIR = "done"
+
+
+def document_key(doc_id: str) -> str:
+    return hashlib.sha1(doc_id.encode("utf-8")).hexdigest()[:20]
+
+
+def shard_of(doc_id: str, shards: int) -> int:
+    return int(document_key(doc_id), 16) % shards
+
+
+def shard_name(shard: int) -> str:
+    return f"shard-{shard:05d}"
+
+
+def _create_exclusive(path: str, content: str) -> bool:
+    """
+    Atomically create `path` with `content`; returns False if it already exists.
+    The content is written to a private O_EXCL temp file and hard-linked into
+    place, so other hosts never observe a half-written lease.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+    try:
+        with os.fdopen(fd, "w") as fh:
+            fh.write(content)
+        os.link(tmp_path, path)
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(tmp_path)
+    return True
+
+
+def _read_record(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r") as fh:
+            record = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _read_owner(path: str) -> Optional[str]:
+    record = _read_record(path)
+    return record.get("host") if record is not None else None
+
+
+def plan(shared_dir: str, input_dir: str, shards: int = 256) -> int:
+    """
+    Writes one manifest per shard listing the PDFs that hash into it. Document ids
+    are paths relative to `input_dir`, so every host computes the same split.
+    Returns the number of documents planned.
+    """
+    buckets: Dict[int, List[str]] = {}
+    input_dir = os.path.abspath(input_dir)
+    for root, _, files in os.walk(input_dir):
+        for name in files:
+            if name.lower().endswith(".pdf"):
+                doc_id = os.path.relpath(os.path.join(root, name), input_dir)
+                buckets.setdefault(shard_of(doc_id, shards), []).append(doc_id)
+
+    manifest_dir = os.path.join(shared_dir, MANIFEST_DIR)
+    os.makedirs(manifest_dir, exist_ok=True)
+    meta = {"input_dir": input_dir, "shards": shards}
+    write_atomic(os.path.join(shared_dir, "plan.json"), json.dumps(meta).encode("utf-8"))
+    for shard in range(shards):
+        docs = sorted(buckets.get(shard, []))
+        write_atomic(os.path.join(manifest_dir, f"{shard_name(shard)}.txt"), "\n".join(docs).encode("utf-8"))
+    return sum(len(docs) for docs in buckets.values())
+
+
+class ShardWorker:
+    """
+    One host's view of a sharded bulk run coordinated through a shared directory.
+
+    - Hosts claim whole shards with exclusive lease files and publish liveness by
+      touching `hosts/<host>.alive`; a lease whose owner stopped heartbeating can be
+      taken over by renaming it away and re-creating it; a contender that finds it
+      renamed away someone else's fresh lease puts it back and backs off.
+    - Each document is claimed with an exclusive claim file before it is parsed, so
+      an idle host can steal from the tail of another host's shard without both
+      processing the same document.
+    - Outputs are written atomically to one file per document key, so a document
+      redone after a crash replaces its output rather than duplicating it.
+    - A document whose worker process died gets no output and its claim is
+      released, so it is retried; only after `max_crashes` such failures on this
+      host is the crash recorded as its output. Parse errors are recorded at once.
+    """
+
+    def __init__(
+        self,
+        shared_dir: str,
+        executor: Executor,
+        host_id: Optional[str] = None,
+        lease_timeout: float = 60.0,
+        heartbeat_interval: float = 10.0,
+        max_in_flight: Optional[int] = None,
+        merchant_dict: Optional[str] = None,
+        max_crashes: int = 3,
+    ):
+        self.shared_dir = shared_dir
+        self.executor = executor
+        self.host_id = host_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.max_in_flight = max_in_flight or 2 * getattr(executor, "_max_workers", 1)
+        self.merchant_dict = merchant_dict
+        self.max_crashes = max_crashes
+        self._crashes: Dict[str, int] = {}
+        with open(os.path.join(shared_dir, "plan.json"), "r") as fh:
+            meta = json.load(fh)
+        self.input_dir = meta["input_dir"]
+        self.shards = meta["shards"]
+        for sub in (LEASE_DIR, CLAIM_DIR, OUTPUT_DIR, HOST_DIR, DONE_DIR):
+            os.makedirs(os.path.join(shared_dir, sub), exist_ok=True)
+        self._stop = threading.Event()
+        self.processed = 0
+
+    # Liveness ---------------------------------------------------------------
+
+    def _heartbeat_path(self, host: str) -> str:
+        return os.path.join(self.shared_dir, HOST_DIR, f"{host}.alive")
+
+    def heartbeat(self):
+        path = self._heartbeat_path(self.host_id)
+        with open(path, "a"):
+            pass
+        os.utime(path, None)
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            self.heartbeat()
+
+    def is_alive(self, host: Optional[str]) -> bool:
+        if host is None:
+            return False
+        if host == self.host_id:
+            return True
+        try:
+            return time.time() - os.path.getmtime(self._heartbeat_path(host)) < self.lease_timeout
+        except OSError:
+            return False
+
+    def _take_over(self, path: str, content: str, dead: Optional[dict]) -> bool:
+        """
+        Replace an exclusive file still holding `dead`, the record of an owner seen
+        as dead. The file is renamed to a unique tombstone first; if the tombstone
+        turns out to hold another record, a faster contender already replaced the
+        dead owner, so its file is put back and this contender loses. The final
+        exclusive create decides between contenders that each removed the dead record.
+        """
+        tombstone = f"{path}.dead-{uuid.uuid4().hex}"
+        try:
+            os.rename(path, tombstone)
+        except FileNotFoundError:
+            return _create_exclusive(path, content)
+        if _read_record(tombstone) != dead:
+            try:
+                os.link(tombstone, path)
+            except FileExistsError:
+                logger.warning("Could not restore %s after a lost takeover race", path)
+            os.remove(tombstone)
+            return False
+        os.remove(tombstone)
+        return _create_exclusive(path, content)
+
+    # Shards -----------------------------------------------------------------
+
+    def _lease_path(self, shard: int, steal: bool = False) -> str:
+        suffix = "steal" if steal else "lease"
+        return os.path.join(self.shared_dir, LEASE_DIR, f"{shard_name(shard)}.{suffix}")
+
+    def _done_path(self, shard: int) -> str:
+        return os.path.join(self.shared_dir, DONE_DIR, shard_name(shard))
+
+    def _manifest(self, shard: int) -> List[str]:
+        path = os.path.join(self.shared_dir, MANIFEST_DIR, f"{shard_name(shard)}.txt")
+        with open(path, "r", encoding="utf-8") as fh:
+            return [line for line in fh.read().splitlines() if line]
+
+    def _acquire(self, path: str) -> bool:
+        content = json.dumps({"host": self.host_id, "at": time.time()})
+        if _create_exclusive(path, content):
+            return True
+        record = _read_record(path)
+        owner = record.get("host") if record is not None else None
+        if owner == self.host_id:
+            return True
+        if not self.is_alive(owner):
+            return self._take_over(path, content, record)
+        return False
+
+    def next_shard(self) -> Optional[Tuple[int, bool]]:
+        """
+        Returns (shard, stealing). Prefers unowned or orphaned shards; when there
+        are none, joins a live host's shard as its (single) stealer.
+        """
+        # Start at a host-specific offset so hosts do not contend on the same shards.
+        offset = random.Random(self.host_id).randrange(self.shards)
+        order = [(offset + i) % self.shards for i in range(self.shards)]
+        pending = [shard for shard in order if not os.path.exists(self._done_path(shard))]
+        for shard in pending:
+            if self._acquire(self._lease_path(shard)):
+                return shard, False
+        for shard in pending:
+            if self._acquire(self._lease_path(shard, steal=True)):
+                return shard, True
+        return None
+
+    def _release(self, shard: int, steal: bool):
+        path = self._lease_path(shard, steal)
+        if _read_owner(path) == self.host_id:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # Documents --------------------------------------------------------------
+
+    def _claim_path(self, shard: int, key: str) -> str:
+        return os.path.join(self.shared_dir, CLAIM_DIR, shard_name(shard), f"{key}.claim")
+
+    def output_path(self, shard: int, key: str) -> str:
+        return os.path.join(self.shared_dir, OUTPUT_DIR, shard_name(shard), f"{key}.json")
+
+    def _claim_documents(self, shard: int, docs: List[str]) -> Iterator[Tuple[str, str]]:
+        for doc_id in docs:
+            key = document_key(doc_id)
+            if os.path.exists(self.output_path(shard, key)):
+                continue
+            if self._acquire(self._claim_path(shard, key)):
+                yield doc_id, key
+
+    def _release_claim(self, shard: int, key: str):
+        path = self._claim_path(shard, key)
+        if _read_owner(path) == self.host_id:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def process_shard(self, shard: int, steal: bool = False) -> int:
+        docs = self._manifest(shard)
+        if steal:
+            docs.reverse()
+        os.makedirs(os.path.dirname(self._claim_path(shard, "x")), exist_ok=True)
+        os.makedirs(os.path.dirname(self.output_path(shard, "x")), exist_ok=True)
+
+        count = 0
+        in_flight: Dict[Future, Tuple[str, str]] = {}
+        for doc_id, key in self._claim_documents(shard, docs):
+            if self._stop.is_set():
+                break
+            path = os.path.join(self.input_dir, doc_id)
+            in_flight[self.executor.submit(parse_task, path, self.merchant_dict)] = (doc_id, key)
+            while len(in_flight) >= self.max_in_flight:
+                count += self._collect(shard, in_flight)
+        while in_flight:
+            count += self._collect(shard, in_flight)
+
+        if all(os.path.exists(self.output_path(shard, document_key(d))) for d in docs):
+            _create_exclusive(self._done_path(shard), self.host_id)
+        self._release(shard, steal)
+        return count
+
+    def _collect(self, shard: int, in_flight: Dict[Future, Tuple[str, str]]) -> int:
+        done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+        written = 0
+        for future in done:
+            doc_id, key = in_flight.pop(future)
+            record = {"doc_id": doc_id, "host": self.host_id}
+            try:
+                record["result"] = future.result().model_dump(mode="json")
+            except WorkerCrashedError as exc:
+                self._crashes[key] = self._crashes.get(key, 0) + 1
+                if self._crashes[key] < self.max_crashes:
+                    logger.warning("Worker crashed on %s; releasing it for a retry", doc_id)
+                    self._release_claim(shard, key)
+                    continue
+                record["error"] = repr(exc)
+            except Exception as exc:
+                record["error"] = repr(exc)
+            write_atomic(self.output_path(shard, key), json.dumps(record).encode("utf-8"))
+            self.processed += 1
+            written += 1
+        return written
+
+    def run(self, poll_interval: float = 1.0) -> int:
+        """
+        Work until every shard is done. Returns the number of documents this host processed.
+        """
+        self.heartbeat()
+        beat = threading.Thread(target=self._heartbeat_loop, name="shard-heartbeat", daemon=True)
+        beat.start()
+        try:
+            while not self._stop.is_set():
+                picked = self.next_shard()
+                if picked is None:
+                    if all(os.path.exists(self._done_path(s)) for s in range(self.shards)):
+                        break
+                    self._stop.wait(poll_interval)
+                    continue
+                if not self.process_shard(*picked):
+                    # Every remaining document is claimed by a live host; wait for it to finish.
+                    self._stop.wait(poll_interval)
+        finally:
+            self._stop.set()
+            beat.join()
+        return self.processed
+
+    def stop(self):
+        self._stop.set()
+
+
+def merge(shared_dir: str, output_path: str) -> int:
+    """
+    Concatenates per-document outputs into one JSON Lines file in shard/manifest
+    order. Each document contributes exactly one line. Returns the line count.
+    """
+    with open(os.path.join(shared_dir, "plan.json"), "r") as fh:
+        shards = json.load(fh)["shards"]
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as out:
+        for shard in range(shards):
+            with open(os.path.join(shared_dir, MANIFEST_DIR, f"{shard_name(shard)}.txt"), "r", encoding="utf-8") as fh:
+                docs = [line for line in fh.read().splitlines() if line]
+            for doc_id in docs:
+                path = os.path.join(shared_dir, OUTPUT_DIR, shard_name(shard), f"{document_key(doc_id)}.json")
+                try:
+                    with open(path, "r", encoding="utf-8") as fh:
+                        out.write(fh.read().strip() + "\n")
+                    count += 1
+                except FileNotFoundError:
+                    logger.warning("No output for %s (shard %s)", doc_id, shard)
+    os.replace(tmp_path, output_path)
+    return count
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Sharded bulk extraction over a shared directory.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    plan_cmd = sub.add_parser("plan", help="Split input PDFs into shard manifests.")
+    plan_cmd.add_argument("shared_dir")
+    plan_cmd.add_argument("input_dir")
+    plan_cmd.add_argument("--shards", type=int, default=256)
+
+    work_cmd = sub.add_parser("work", help="Process shards on this host until all are done.")
+    work_cmd.add_argument("shared_dir")
+    work_cmd.add_argument("--workers", type=int, default=None)
+    work_cmd.add_argument("--host-id", default=None)
+    work_cmd.add_argument("--lease-timeout", type=float, default=60.0)
+    work_cmd.add_argument("--merchant-dict", default=None)
+    work_cmd.add_argument("--page-cache-mb", type=float, default=64.0, help="Per-worker page cache size (0 disables).")
+
+    merge_cmd = sub.add_parser("merge", help="Merge per-document outputs into one JSONL file.")
+    merge_cmd.add_argument("shared_dir")
+    merge_cmd.add_argument("output")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "plan":
+        print(plan(args.shared_dir, args.input_dir, args.shards))
+    elif args.command == "work":
+        executor = WorkerPool(max_workers=args.workers, page_cache_mb=args.page_cache_mb)
+        try:
+            worker = ShardWorker(
+                args.shared_dir,
+                executor,
+                host_id=args.host_id,
+                lease_timeout=args.lease_timeout,
+                heartbeat_interval=args.lease_timeout / 6,
+                merchant_dict=args.merchant_dict,
+            )
+            print(worker.run())
+        finally:
+            executor.shutdown()
+    else:
+        print(merge(args.shared_dir, args.output))
+
+
+if __name__ == "__main__":
+    main()
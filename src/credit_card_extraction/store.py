@@ -0,0 +1,518 @@
+import json
+import math
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+
+from .dedup import FingerprintIndex, iter_fingerprints
+from .models import ExtractionResult, MonthlyRollup, StatementHeader, StoredTransaction, TransactionPage
+from .textindex import TextIndex, query_pattern, search_text
+
+UNKNOWN_ACCOUNT = "UNKNOWN"
+
+_STATEMENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    provider TEXT NOT NULL,
+    account TEXT NOT NULL,
+    statement_date TEXT,
+    header TEXT NOT NULL,
+    ingested_at REAL NOT NULL
+);
+"""
+
+_SCHEMA = _STATEMENTS_TABLE.format(name="statements") + """
+-- Only statements with a known card and date identify a statement to replace.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_statement_key ON statements (provider, account, statement_date)
+    WHERE account != 'UNKNOWN' AND statement_date IS NOT NULL;
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    statement_id INTEGER NOT NULL REFERENCES statements (id) ON DELETE CASCADE,
+    account TEXT NOT NULL,
+    date TEXT NOT NULL,
+    post_date TEXT,
+    description TEXT NOT NULL,
+    amount REAL NOT NULL,
+    currency TEXT NOT NULL,
+    foreign_amount REAL,
+    foreign_currency TEXT,
+    conversion_rate REAL,
+    notes TEXT,
+    merchant TEXT,
+    category TEXT,
+    fingerprint BLOB,
+    description_norm TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_txn_account_date ON transactions (account, date, id);
+CREATE INDEX IF NOT EXISTS idx_txn_date ON transactions (date, id);
+CREATE INDEX IF NOT EXISTS idx_txn_account_post_date ON transactions (account, post_date);
+CREATE INDEX IF NOT EXISTS idx_txn_amount ON transactions (amount);
+CREATE INDEX IF NOT EXISTS idx_txn_statement ON transactions (statement_id);
+CREATE TABLE IF NOT EXISTS rollup_monthly (
+    account TEXT NOT NULL,
+    month TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    foreign_currency TEXT NOT NULL,
+    txn_count INTEGER NOT NULL,
+    total_minor INTEGER NOT NULL,
+    debit_minor INTEGER NOT NULL,
+    credit_minor INTEGER NOT NULL,
+    foreign_minor INTEGER NOT NULL,
+    PRIMARY KEY (account, month, currency, foreign_currency)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO store_meta (key, value) VALUES ('generation', 0);
+"""
+
+# Monthly rollup rows for a set of transactions. Amounts are summed in minor units
+# (integers), so adding and later subtracting a statement restores totals exactly.
+# Months come from post_date, falling back to the transaction date; foreign_currency
+# is '' for domestic spend.
+_ROLLUP_SELECT = """
+SELECT
+    account,
+    substr(coalesce(post_date, date), 1, 7),
+    currency,
+    coalesce(foreign_currency, ''),
+    :sign * count(*),
+    :sign * sum(CAST(round(amount * 100) AS INTEGER)),
+    :sign * sum(CASE WHEN amount > 0 THEN CAST(round(amount * 100) AS INTEGER) ELSE 0 END),
+    :sign * sum(CASE WHEN amount < 0 THEN CAST(round(amount * 100) AS INTEGER) ELSE 0 END),
+    :sign * sum(CAST(round(coalesce(foreign_amount, 0) * 100) AS INTEGER))
+FROM transactions
+{where}
+GROUP BY 1, 2, 3, 4
+"""
+
+_ROLLUP_UPSERT = """
+INSERT INTO rollup_monthly
+    (account, month, currency, foreign_currency, txn_count, total_minor, debit_minor, credit_minor, foreign_minor)
+{select}
+ON CONFLICT (account, month, currency, foreign_currency) DO UPDATE SET
+    txn_count = txn_count + excluded.txn_count,
+    total_minor = total_minor + excluded.total_minor,
+    debit_minor = debit_minor + excluded.debit_minor,
+    credit_minor = credit_minor + excluded.credit_minor,
+    foreign_minor = foreign_minor + excluded.foreign_minor
+"""
+
+_TXN_COLUMNS = (
+    "statement_id, account, date, post_date, description, amount, "
+    "currency, foreign_amount, foreign_currency, conversion_rate, notes, merchant, category, fingerprint"
+)
+
+
+def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: Iterable[Tuple[str, str]]):
+    present = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, declaration in columns:
+        if name not in present:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {declaration}")
+
+
+def _migrate_transaction_columns(conn: sqlite3.Connection):
+    # Columns added after the first store layout (fingerprints, merchant enrichment).
+    _add_missing_columns(conn, "transactions", (("merchant", "TEXT"), ("category", "TEXT"), ("fingerprint", "BLOB")))
+
+
+def _migrate_statement_key(conn: sqlite3.Connection):
+    # Drop the table-level UNIQUE (provider, account, statement_date) in favour of the
+    # partial idx_statement_key, so unparsed headers no longer collide.
+    conn.execute(_STATEMENTS_TABLE.format(name="statements_migrated"))
+    conn.execute(
+        "INSERT INTO statements_migrated (id, provider, account, statement_date, header, ingested_at) "
+        "SELECT id, provider, account, statement_date, header, ingested_at FROM statements"
+    )
+    conn.execute("DROP TABLE statements")
+    conn.execute("ALTER TABLE statements_migrated RENAME TO statements")
+
+
+def _migrate_description_norm(conn: sqlite3.Connection):
+    # Matching form of each description for `q` queries (see textindex.search_text).
+    _add_missing_columns(conn, "transactions", (("description_norm", "TEXT"),))
+    rows = conn.execute("SELECT id, description FROM transactions").fetchall()
+    conn.executemany(
+        "UPDATE transactions SET description_norm = ? WHERE id = ?",
+        ((search_text(row["description"]), row["id"]) for row in rows),
+    )
+
+
+# Step N brings a store from user_version N to N + 1. New stores are created at the latest version.
+_MIGRATIONS = (_migrate_transaction_columns, _migrate_statement_key, _migrate_description_norm)
+
+
+def _iso(value: Optional[date]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def encode_cursor(txn_date: date, txn_id: int) -> str:
+    return f"{txn_date.isoformat()}:{txn_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    txn_date, _, txn_id = cursor.partition(":")
+    date.fromisoformat(txn_date)
+    return txn_date, int(txn_id)
+
+
+class TransactionStore:
+    """
+    Local SQLite persistence for parsed statements and their transactions.
+
+    Statements are keyed by (provider, account, statement_date); saving the same
+    statement again replaces its previous rows. Statements whose card or date was
+    not parsed are always stored as new ones. With a FingerprintIndex,
+    transactions already stored from an overlapping statement are skipped.
+
+    Monthly rollups (per account, month, currency and foreign currency) are kept
+    in step with every save: a statement's rows are added on insert and
+    subtracted again when it is replaced.
+
+    With a TextIndex, descriptions are indexed after every committed save and
+    selective `q` queries are answered from it. Each save bumps a generation counter in the
+    database; an index that did not record the latest generation (e.g. after a
+    crash between the commit and the index update) is rebuilt on open.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 1000,
+        fingerprints: Optional[FingerprintIndex] = None,
+        text_index: Optional[TextIndex] = None,
+    ):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.fingerprints = fingerprints
+        self.text_index = text_index
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Before foreign keys are enabled: rebuilding a table must not cascade into its children.
+        fresh = self._migrate()
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        if fresh:
+            self._conn.execute(f"PRAGMA user_version = {len(_MIGRATIONS)}")
+        if self._conn.execute("SELECT 1 FROM rollup_monthly LIMIT 1").fetchone() is None:
+            # New table on an existing store (or an empty store): build it once.
+            self.rebuild_rollups()
+        if fingerprints is not None:
+            self._warm_fingerprints()
+        if text_index is not None and text_index.synced_to != self._generation():
+            self.rebuild_text_index()
+
+    def _migrate(self) -> bool:
+        """
+        Upgrades a store created by an older version in one transaction. Returns True
+        for a new (empty) database.
+        """
+        tables = self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'statements'")
+        if tables.fetchone() is None:
+            return True
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(_MIGRATIONS):
+            return False
+        self._conn.execute("BEGIN")
+        try:
+            for step in _MIGRATIONS[version:]:
+                step(self._conn)
+            self._conn.execute(f"PRAGMA user_version = {len(_MIGRATIONS)}")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        return False
+
+    def _warm_fingerprints(self):
+        # Idempotent: also restores entries an on-disk index lost in a crash before its last flush.
+        rows = self._conn.execute("SELECT fingerprint FROM transactions WHERE fingerprint IS NOT NULL")
+        for row in rows:
+            self.fingerprints.add(row["fingerprint"])
+
+    def _generation(self) -> int:
+        return self._conn.execute("SELECT value FROM store_meta WHERE key = 'generation'").fetchone()["value"]
+
+    def rebuild_text_index(self):
+        """
+        Re-indexes every stored description from scratch.
+        """
+        with self._lock:
+            generation = self._generation()
+            rows = self._conn.execute("SELECT id, description FROM transactions ORDER BY id").fetchall()
+            self.text_index.rebuild(((row["id"], row["description"]) for row in rows), synced_to=generation)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def save_result(self, result: ExtractionResult) -> int:
+        """
+        Persist one statement and its transactions in a single database transaction.
+        Returns the statement id.
+        """
+        return self.save_results([result])[0]
+
+    def save_results(self, results: Iterable[ExtractionResult]) -> List[int]:
+        ids: List[int] = []
+        added: List[bytes] = []
+        removed: List[bytes] = []
+        indexed: List[Tuple[int, str]] = []
+        unindexed: List[int] = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for result in results:
+                    ids.append(self._insert(result, added, removed, indexed, unindexed))
+                self._conn.execute("UPDATE store_meta SET value = value + 1 WHERE key = 'generation'")
+                generation = self._generation()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                if self.fingerprints is not None:
+                    self.fingerprints.discard(added)
+                    for fingerprint in removed:
+                        self.fingerprints.add(fingerprint)
+                raise
+            if self.text_index is not None:
+                # Still under the store lock, so index updates apply in commit order: a
+                # newer save's tombstones are never undone by an older save's rows, and
+                # synced_to only moves forward.
+                self.text_index.update(indexed, unindexed, synced_to=generation)
+        return ids
+
+    def _insert(
+        self,
+        result: ExtractionResult,
+        added: List[bytes],
+        removed: List[bytes],
+        indexed: List[Tuple[int, str]],
+        unindexed: List[int],
+    ) -> int:
+        header = result.statement
+        account = header.account_last4
+        key = (header.provider, account, _iso(header.statement_date))
+        previous = None
+        # Without a card number and date the statement cannot be identified, so it is always added.
+        if account != UNKNOWN_ACCOUNT and header.statement_date is not None:
+            previous = self._conn.execute(
+                "SELECT id FROM statements WHERE provider = ? AND account = ? AND statement_date = ?"
+                " AND account != 'UNKNOWN' AND statement_date IS NOT NULL",
+                key,
+            ).fetchone()
+        if previous is not None:
+            if self.fingerprints is not None:
+                # The replaced statement's transactions are no longer "seen".
+                old = [
+                    row["fingerprint"]
+                    for row in self._conn.execute(
+                        "SELECT fingerprint FROM transactions WHERE statement_id = ? AND fingerprint IS NOT NULL",
+                        (previous["id"],),
+                    )
+                ]
+                self.fingerprints.discard(old)
+                removed.extend(old)
+            if self.text_index is not None:
+                rows = self._conn.execute("SELECT id FROM transactions WHERE statement_id = ?", (previous["id"],))
+                unindexed.extend(row["id"] for row in rows)
+            self._apply_rollup(previous["id"], account, sign=-1)
+            self._conn.execute("DELETE FROM statements WHERE id = ?", (previous["id"],))
+
+        if self.fingerprints is not None:
+            result, fingerprints = self.fingerprints.filter_new(result)
+            added.extend(fingerprints)
+        else:
+            fingerprints = [fingerprint for _, fingerprint in iter_fingerprints(result)]
+        cur = self._conn.execute(
+            "INSERT INTO statements (provider, account, statement_date, header, ingested_at) VALUES (?, ?, ?, ?, ?)",
+            key + (header.model_dump_json(), time.time()),
+        )
+        statement_id = cur.lastrowid
+
+        rows = [
+            (
+                statement_id,
+                account,
+                _iso(txn.date),
+                _iso(txn.post_date),
+                txn.description,
+                txn.amount,
+                txn.currency,
+                txn.foreign_amount,
+                txn.foreign_currency,
+                txn.conversion_rate,
+                txn.notes,
+                txn.merchant,
+                txn.category,
+                fingerprint,
+                search_text(txn.description),
+            )
+            for txn, fingerprint in zip(result.transactions, fingerprints)
+        ]
+        for start in range(0, len(rows), self.batch_size):
+            self._conn.executemany(
+                f"INSERT INTO transactions ({_TXN_COLUMNS}, description_norm) VALUES ({', '.join('?' * 15)})",
+                rows[start:start + self.batch_size],
+            )
+        self._apply_rollup(statement_id, account, sign=1)
+        if self.text_index is not None:
+            indexed.extend(
+                (row["id"], row["description"])
+                for row in self._conn.execute(
+                    "SELECT id, description FROM transactions WHERE statement_id = ?", (statement_id,)
+                )
+            )
+        return statement_id
+
+    def _apply_rollup(self, statement_id: int, account: str, sign: int):
+        select = _ROLLUP_SELECT.format(where="WHERE statement_id = :statement_id")
+        self._conn.execute(_ROLLUP_UPSERT.format(select=select), {"sign": sign, "statement_id": statement_id})
+        if sign < 0:
+            self._conn.execute("DELETE FROM rollup_monthly WHERE account = ? AND txn_count = 0", (account,))
+
+    def rebuild_rollups(self):
+        """
+        Recomputes every rollup row from the transactions table with one set-based
+        GROUP BY. Only needed after out-of-band edits; saves keep rollups current.
+        """
+        # "WHERE 1" keeps the upsert's ON CONFLICT from parsing as a join constraint.
+        select = _ROLLUP_SELECT.format(where="WHERE 1")
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("DELETE FROM rollup_monthly")
+                self._conn.execute(_ROLLUP_UPSERT.format(select=select), {"sign": 1})
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def query_rollups(
+        self,
+        account: Optional[str] = None,
+        month_from: Optional[str] = None,
+        month_to: Optional[str] = None,
+        currency: Optional[str] = None,
+        foreign_currency: Optional[str] = None,
+    ) -> List[MonthlyRollup]:
+        """
+        Reads precomputed monthly rollups (months as YYYY-MM); cost depends on the
+        number of rollup rows returned, not on the number of transactions.
+        Pass foreign_currency="" for domestic spend only.
+        """
+        clauses: List[str] = []
+        params: List[object] = []
+        for column, op, value in (
+            ("account", "=", account),
+            ("month", ">=", month_from),
+            ("month", "<=", month_to),
+            ("currency", "=", currency),
+            ("foreign_currency", "=", foreign_currency),
+        ):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT * FROM rollup_monthly {where} ORDER BY account, month, currency, foreign_currency"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            MonthlyRollup(
+                account=row["account"],
+                month=row["month"],
+                currency=row["currency"],
+                foreign_currency=row["foreign_currency"] or None,
+                count=row["txn_count"],
+                total=row["total_minor"] / 100,
+                debits=row["debit_minor"] / 100,
+                credits=row["credit_minor"] / 100,
+                foreign_total=row["foreign_minor"] / 100,
+            )
+            for row in rows
+        ]
+
+    def get_statement(self, statement_id: int) -> Optional[StatementHeader]:
+        with self._lock:
+            row = self._conn.execute("SELECT header FROM statements WHERE id = ?", (statement_id,)).fetchone()
+        return StatementHeader.model_validate_json(row["header"]) if row else None
+
+    def query_transactions(
+        self,
+        account: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        q: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> TransactionPage:
+        """
+        Keyset-paginated transaction query ordered by (date, id).
+        Pass the returned `next_cursor` back as `cursor` to fetch the next page.
+        `q` matches whole Latin words and Thai substrings of the normalized
+        description, with or without a text index.
+
+        Selective queries read their candidate ids from the index. For common terms
+        the ordered scan is cheaper: it stops after `limit` matches, while the
+        index would hand over every posting on every page. The choice is made from
+        the rarest term's document frequency: scanning reads about limit * docs / df
+        rows, the index path about df.
+        """
+        clauses: List[str] = []
+        params: List[object] = []
+        if account:
+            clauses.append("account = ?")
+            params.append(account)
+        if date_from:
+            clauses.append("date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            clauses.append("date <= ?")
+            params.append(date_to.isoformat())
+        if q and self.text_index is not None:
+            estimate = self.text_index.estimate(q)
+            if estimate is not None and estimate <= math.sqrt(limit * max(self.text_index.docs, 1)):
+                # Candidates are a superset (out-of-order trigrams, skipped common terms); confirmed below.
+                clauses.append("id IN (SELECT value FROM json_each(?))")
+                params.append(json.dumps(self.text_index.search(q, exact=False)))
+        if q:
+            clauses.append("instr(description_norm, ?) > 0")
+            params.append(query_pattern(q))
+        if cursor:
+            clauses.append("(date, id) > (?, ?)")
+            params.extend(decode_cursor(cursor))
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT id, {_TXN_COLUMNS} FROM transactions {where} ORDER BY date, id LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [limit + 1]).fetchall()
+
+        items = [_row_to_transaction(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit and items:
+            next_cursor = encode_cursor(items[-1].date, items[-1].id)
+        return TransactionPage(items=items, next_cursor=next_cursor)
+
+
+def _row_to_transaction(row: sqlite3.Row) -> StoredTransaction:
+    return StoredTransaction(
+        id=row["id"],
+        statement_id=row["statement_id"],
+        account=row["account"],
+        date=date.fromisoformat(row["date"]),
+        post_date=date.fromisoformat(row["post_date"]) if row["post_date"] else None,
+        description=row["description"],
+        amount=row["amount"],
+        currency=row["currency"],
+        foreign_amount=row["foreign_amount"],
+        foreign_currency=row["foreign_currency"],
+        conversion_rate=row["conversion_rate"],
+        notes=row["notes"],
+        merchant=row["merchant"],
+        category=row["category"],
+    )
@@ -0,0 +1,497 @@
+import json
+import logging
+import os
+import re
+import threading
+from itertools import accumulate
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .merchants import _is_thai, normalize_text
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAGIC = b"CCETI\x01"
+MANIFEST_NAME = "manifest.json"
+FORMAT_VERSION = 2
+THAI_GRAM = 3
+# search(exact=False) stops intersecting when a term has this many times more postings than candidates.
+_CONFIRM_RATIO = 16
+# One multi-byte varint: continuation bytes, then the final byte.
+_LONG_VARINT = re.compile(rb"[\x80-\xff]+[\x00-\x7f]")
+_CONTINUATION_BYTES = bytes(range(0x80, 0x100))
+
+
+def _script_runs(word: str) -> Iterator[Tuple[bool, str]]:
+    start = 0
+    for idx in range(1, len(word) + 1):
+        if idx == len(word) or _is_thai(word[idx]) != _is_thai(word[start]):
+            yield _is_thai(word[start]), word[start:idx]
+            start = idx
+
+
+def _runs(text: str) -> List[Tuple[bool, str]]:
+    return [run for word in normalize_text(text).split(" ") for run in _script_runs(word) if run[1]]
+
+
+def search_text(text: str) -> str:
+    """
+    A description as stored for matching: the normalized text with a space between
+    Latin and Thai runs, padded with spaces, so that `query_pattern` finds whole
+    Latin words and Thai substrings with a plain substring test.
+    """
+    return " " + " ".join(run for _, run in _runs(text)) + " "
+
+
+def query_pattern(query: str) -> str:
+    """
+    Substring of `search_text` that a matching description contains. Latin runs at
+    the edges are space-bounded (whole words); Thai edges are not.
+    """
+    runs = _runs(query)
+    if not runs:
+        return ""
+    pattern = " ".join(run for _, run in runs)
+    if not runs[0][0]:
+        pattern = " " + pattern
+    if not runs[-1][0]:
+        pattern += " "
+    return pattern
+
+
+def tokenize(text: str) -> Set[str]:
+    """
+    Index terms of a description: Latin/digit runs of the normalized text are
+    whole-word terms; Thai runs (no word separators) become character trigrams.
+    """
+    tokens: Set[str] = set()
+    for word in normalize_text(text).split(" "):
+        for thai, run in _script_runs(word):
+            if thai and len(run) >= THAI_GRAM:
+                tokens.update(run[idx:idx + THAI_GRAM] for idx in range(len(run) - THAI_GRAM + 1))
+            elif run:
+                tokens.add(run)
+    return tokens
+
+
+def query_tokens(query: str) -> Optional[Set[str]]:
+    """
+    Terms a query needs, or None when the index cannot answer it (no terms, or a
+    Thai run shorter than a trigram).
+    """
+    for word in normalize_text(query).split(" "):
+        for thai, run in _script_runs(word):
+            if thai and len(run) < THAI_GRAM:
+                return None
+    return tokenize(query) or None
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_tombstones(deleted: Dict[int, int]) -> bytes:
+    """
+    {id: generation} as the varint size of the ids' postings, the postings, then
+    one varint generation per id.
+    """
+    ids = sorted(deleted)
+    blob = encode_postings(ids)
+    out = bytearray()
+    _write_varint(out, len(blob))
+    out += blob
+    for doc_id in ids:
+        _write_varint(out, deleted[doc_id])
+    return bytes(out)
+
+
+def decode_tombstones(data: bytes) -> Dict[int, int]:
+    size, pos = _read_varint(data, 0)
+    ids = decode_postings(data[pos:pos + size])
+    pos += size
+    deleted: Dict[int, int] = {}
+    for doc_id in ids:
+        deleted[doc_id], pos = _read_varint(data, pos)
+    return deleted
+
+
+def encode_postings(ids: Iterable[int]) -> bytes:
+    """
+    Strictly increasing ids as varint-encoded gaps (1-2 bytes per id in practice).
+    """
+    out = bytearray()
+    previous = 0
+    for doc_id in ids:
+        _write_varint(out, doc_id - previous)
+        previous = doc_id
+    return bytes(out)
+
+
+def decode_postings(data: Iterable[int]) -> List[int]:
+    """
+    Inverse of `encode_postings`. Runs of one-byte gaps (most of a common term's
+    list) are summed at C speed; only multi-byte varints are decoded in Python.
+    """
+    data = bytes(data)
+    continuation = len(data) - len(data.translate(None, _CONTINUATION_BYTES))
+    if not continuation:
+        return list(accumulate(data))
+    if continuation * 4 > len(data):
+        # Mostly long gaps (a rare term): a plain loop beats matching each varint.
+        ids: List[int] = []
+        value = shift = previous = 0
+        for byte in data:
+            value |= (byte & 0x7F) << shift
+            if byte & 0x80:
+                shift += 7
+            else:
+                previous += value
+                ids.append(previous)
+                value = shift = 0
+        return ids
+    gaps: List[int] = []
+    pos = 0
+    for match in _LONG_VARINT.finditer(data):
+        gaps.extend(data[pos:match.start()])
+        gaps.append(_read_varint(data, match.start())[0])
+        pos = match.end()
+    gaps.extend(data[pos:])
+    return list(accumulate(gaps))
+
+
+def _dead_ids(segments: List["Segment"], deleted: Dict[int, int]) -> List[FrozenSet[int]]:
+    # Segments are ordered by generation, so an older segment's dead ids are a
+    # superset of a newer one's; walk newest first and share unchanged sets.
+    by_generation = sorted(deleted.items(), key=lambda item: item[1], reverse=True)
+    dead: FrozenSet[int] = frozenset()
+    result: List[FrozenSet[int]] = []
+    pos = 0
+    for segment in reversed(segments):
+        start = pos
+        while pos < len(by_generation) and by_generation[pos][1] >= segment.generation:
+            pos += 1
+        if pos > start:
+            dead = dead.union(doc_id for doc_id, _ in by_generation[start:pos])
+        result.append(dead)
+    result.reverse()
+    return result
+
+
+class Segment:
+    """
+    Immutable on-disk postings file:
+
+        magic | varint term count | per term (sorted): varint len, utf-8 term,
+        varint document frequency, varint postings size | postings blobs
+
+    Postings are delta-varint encoded and decoded only for the terms a query uses.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Generation from the file name (seg-<generation>.bin); orders segments for tombstones.
+        self.generation = int(os.path.basename(path)[4:-4])
+        with open(path, "rb") as fh:
+            data = fh.read()
+        if not data.startswith(SEGMENT_MAGIC):
+            raise ValueError(f"Not a text index segment: {path}")
+        pos = len(SEGMENT_MAGIC)
+        count, pos = _read_varint(data, pos)
+        terms: Dict[str, Tuple[int, int, int]] = {}
+        offset = 0
+        for _ in range(count):
+            length, pos = _read_varint(data, pos)
+            term = data[pos:pos + length].decode("utf-8")
+            pos += length
+            df, pos = _read_varint(data, pos)
+            size, pos = _read_varint(data, pos)
+            terms[term] = (df, offset, size)
+            offset += size
+        self._data = memoryview(data)[pos:]
+        self.terms = terms
+        self.postings_count = sum(df for df, _, _ in terms.values())
+
+    def df(self, term: str) -> int:
+        entry = self.terms.get(term)
+        return entry[0] if entry else 0
+
+    def postings(self, term: str) -> List[int]:
+        entry = self.terms.get(term)
+        if entry is None:
+            return []
+        _, offset, size = entry
+        return decode_postings(self._data[offset:offset + size])
+
+    @staticmethod
+    def write(path: str, postings: Iterable[Tuple[str, List[int]]]):
+        """
+        Writes (term, sorted ids) pairs, given in term order, to a new segment file.
+        """
+        header = bytearray()
+        blobs: List[bytes] = []
+        entries = bytearray()
+        count = 0
+        for term, ids in postings:
+            blob = encode_postings(ids)
+            encoded = term.encode("utf-8")
+            _write_varint(entries, len(encoded))
+            entries += encoded
+            _write_varint(entries, len(ids))
+            _write_varint(entries, len(blob))
+            blobs.append(blob)
+            count += 1
+        header += SEGMENT_MAGIC
+        _write_varint(header, count)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(header)
+            fh.write(entries)
+            for blob in blobs:
+                fh.write(blob)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+
+class TextIndex:
+    """
+    Inverted index over transaction descriptions, stored in directory `path`.
+
+    Every update writes the new documents as one small segment and records removed
+    documents as tombstones; a manifest rewritten with os.replace commits both, so
+    a crash leaves the previous state intact. A tombstone holds the newest segment
+    generation it applies to, so an id that is removed and then re-added (SQLite
+    reuses ids) is live in the new segment while its old postings stay dead. Segments are merged newest-first
+    while the older one is no larger than the newer (like a binary counter), which
+    keeps their number logarithmic in the document count. Once tombstones exceed
+    `compact_ratio` of the live documents, everything is compacted into a single
+    segment without them. `search()` intersects the posting lists of a query's
+    terms, rarest first.
+    """
+
+    def __init__(self, path: str, compact_ratio: float = 0.2):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._segments: List[Segment] = []
+        # id -> newest segment generation whose postings of it are dead
+        self._deleted: Dict[int, int] = {}
+        # Per segment (aligned with _segments): its dead ids.
+        self._dead: List[FrozenSet[int]] = []
+        self._generation = 0
+        self.docs = 0
+        self.synced_to: Optional[int] = None
+        self._load()
+
+    # Persistence ------------------------------------------------------------
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        try:
+            with open(self._file(MANIFEST_NAME), "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+            if manifest.get("format") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported text index format: {manifest.get('format')}")
+            segments = [Segment(self._file(name)) for name in manifest["segments"]]
+            deleted: Dict[int, int] = {}
+            if manifest.get("deleted"):
+                with open(self._file(manifest["deleted"]), "rb") as fh:
+                    deleted = decode_tombstones(fh.read())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as exc:
+            # Treated as empty; the store notices it is out of sync and rebuilds it.
+            logger.warning("Ignoring unreadable text index at %s: %r", self.path, exc)
+            return
+        self._segments = segments
+        self._deleted = deleted
+        self._dead = _dead_ids(segments, deleted)
+        self._generation = manifest["generation"]
+        self.docs = manifest["docs"]
+        self.synced_to = manifest.get("synced_to")
+
+    def _next_name(self, prefix: str) -> str:
+        self._generation += 1
+        return f"{prefix}-{self._generation:08d}.bin"
+
+    def _commit(self, segments: List[Segment], deleted: Dict[int, int], docs: int, synced_to: Optional[int]):
+        deleted_name = None
+        if deleted:
+            deleted_name = self._next_name("del")
+            with open(self._file(deleted_name), "wb") as fh:
+                fh.write(encode_tombstones(deleted))
+                fh.flush()
+                # Durable before the manifest that references it.
+                os.fsync(fh.fileno())
+        manifest = {
+            "format": FORMAT_VERSION,
+            "generation": self._generation,
+            "segments": [os.path.basename(segment.path) for segment in segments],
+            "deleted": deleted_name,
+            "docs": docs,
+            "synced_to": synced_to,
+        }
+        tmp_path = self._file(f"{MANIFEST_NAME}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, self._file(MANIFEST_NAME))
+
+        # New state is durable: publish it, then drop files it no longer references.
+        dead = _dead_ids(segments, deleted)
+        self._segments, self._deleted, self._dead = segments, deleted, dead
+        self.docs, self.synced_to = docs, synced_to
+        live = set(manifest["segments"]) | {deleted_name, MANIFEST_NAME}
+        for name in os.listdir(self.path):
+            if name not in live:
+                try:
+                    os.remove(self._file(name))
+                except OSError:
+                    pass
+
+    def _merge(self, segments: List[Segment], deleted: Dict[int, int]) -> Segment:
+        dead = _dead_ids(segments, deleted)
+
+        def merged() -> Iterator[Tuple[str, List[int]]]:
+            for term in sorted(set().union(*(segment.terms for segment in segments))):
+                ids: Set[int] = set()
+                for segment, segment_dead in zip(segments, dead):
+                    ids.update(set(segment.postings(term)).difference(segment_dead))
+                if ids:
+                    yield term, sorted(ids)
+
+        path = self._file(self._next_name("seg"))
+        Segment.write(path, merged())
+        return Segment(path)
+
+    # Updates ----------------------------------------------------------------
+
+    def update(
+        self,
+        added: Iterable[Tuple[int, str]],
+        removed: Iterable[int] = (),
+        synced_to: Optional[int] = None,
+    ):
+        """
+        Indexes `added` (id, description) pairs and forgets `removed` ids in one
+        commit. `synced_to` records the store generation this update brings the
+        index up to.
+        """
+        with self._lock:
+            removed = set(removed)
+            postings: Dict[str, List[int]] = {}
+            added_ids: Set[int] = set()
+            for doc_id, text in added:
+                added_ids.add(doc_id)
+                for term in tokenize(text):
+                    postings.setdefault(term, []).append(doc_id)
+
+            # Tombstones cover the existing segments only: SQLite may hand a removed id
+            # to a new row, whose postings go into the new segment below.
+            deleted = dict(self._deleted)
+            if self._segments:
+                newest = self._segments[-1].generation
+                deleted.update((doc_id, newest) for doc_id in removed)
+            docs = self.docs - len(removed) + len(added_ids)
+            segments = list(self._segments)
+            if postings:
+                path = self._file(self._next_name("seg"))
+                Segment.write(path, ((term, sorted(ids)) for term, ids in sorted(postings.items())))
+                segments.append(Segment(path))
+
+            if deleted and len(deleted) > self.compact_ratio * max(docs, 1):
+                segments = [self._merge(segments, deleted)] if segments else []
+                deleted = {}
+            while len(segments) >= 2 and segments[-2].postings_count <= segments[-1].postings_count:
+                segments[-2:] = [self._merge(segments[-2:], deleted)]
+            self._commit(segments, deleted, docs, synced_to)
+
+    def compact(self):
+        """
+        Merges every segment into one and drops tombstoned documents.
+        """
+        with self._lock:
+            segments = [self._merge(self._segments, self._deleted)] if self._segments else []
+            self._commit(segments, {}, self.docs, self.synced_to)
+
+    def rebuild(self, documents: Iterable[Tuple[int, str]], synced_to: Optional[int] = None, batch_size: int = 50_000):
+        """
+        Replaces the whole index with `documents` (id, description), in batches.
+        """
+        with self._lock:
+            self._commit([], {}, 0, None)
+        batch: List[Tuple[int, str]] = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                self.update(batch)
+                batch = []
+        self.update(batch, synced_to=synced_to)
+
+    # Queries ----------------------------------------------------------------
+
+    def estimate(self, query: str) -> Optional[int]:
+        """
+        Upper bound on the matches of `query` without decoding any postings: the
+        document frequency of its rarest term. None when the index cannot answer it.
+        """
+        terms = query_tokens(query)
+        if terms is None:
+            return None
+        with self._lock:
+            segments = self._segments
+        return min(sum(segment.df(term) for segment in segments) for term in terms)
+
+    def search(self, query: str, exact: bool = True) -> Optional[List[int]]:
+        """
+        Sorted ids of documents containing every term of `query`, or None when the
+        query cannot be answered from the index. Thai trigrams may match out of
+        order, so callers confirm candidates against the description.
+
+        With `exact=False` (for callers that confirm anyway), intersection stops
+        once the candidates are far fewer than the next term's postings, since
+        decoding that list would cost more than confirming the candidates.
+        """
+        terms = query_tokens(query)
+        if terms is None:
+            return None
+        with self._lock:
+            segments, dead = self._segments, self._dead
+        ranked = sorted(terms, key=lambda term: sum(segment.df(term) for segment in segments))
+        candidates: Optional[Set[int]] = None
+        for term in ranked:
+            if not exact and candidates is not None:
+                if len(candidates) * _CONFIRM_RATIO < sum(segment.df(term) for segment in segments):
+                    break
+            ids: Set[int] = set()
+            for segment, segment_dead in zip(segments, dead):
+                postings = segment.postings(term)
+                if candidates is None and not segment_dead:
+                    ids.update(postings)
+                    continue
+                found = set(postings) if candidates is None else candidates.intersection(postings)
+                ids.update(found.difference(segment_dead) if segment_dead else found)
+            candidates = ids
+            if not candidates:
+                return []
+        return sorted(candidates)
+
+    def segment_count(self) -> int:
+        return len(self._segments)
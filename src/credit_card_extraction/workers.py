@@ -0,0 +1,374 @@
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from .extractor import parse_pdf
+from .merchants import get_merchant_index
+from .models import ExtractionResult, PageCacheStats, RecycleEvent, WorkerPoolMetrics, WorkerStats
+from .pagecache import combine_page_cache_stats, configure_page_cache, get_page_cache
+from .resultcache import configure_result_cache, get_result_cache
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class WorkerCrashedError(RuntimeError):
+    """Raised for a task whose worker process died before returning a result."""
+
+
+def current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def parse_task(
+    file_path: str,
+    merchant_dict: Optional[str] = None,
+    fields: Optional[Iterable[str]] = None,
+) -> ExtractionResult:
+    """
+    Parse entry point for pool workers; the merchant index is loaded once per process
+    and the process's page and result caches (if configured) are shared by all its documents.
+    """
+    merchant_index = get_merchant_index(merchant_dict) if merchant_dict else None
+    return parse_pdf(
+        file_path,
+        merchant_index=merchant_index,
+        fields=fields,
+        page_cache=get_page_cache(),
+        result_cache=get_result_cache(),
+    )
+
+
+def _worker_main(conn, store_shrink_percent: int, page_cache_mb: float = 0.0, result_cache_mb: float = 0.0):
+    tasks = 0
+    page_cache = configure_page_cache(page_cache_mb)
+    result_cache = configure_result_cache(result_cache_mb)
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        fn, args, kwargs = message
+
+        rss_before = current_rss_bytes()
+        peak_before = peak_rss_bytes()
+        try:
+            status, payload = "ok", fn(*args, **kwargs)
+        except BaseException as exc:
+            status, payload = "error", exc
+        finally:
+            if store_shrink_percent:
+                # Release MuPDF's resource store (fonts, images, parsed objects) between documents.
+                fitz.TOOLS.store_shrink(store_shrink_percent)
+        tasks += 1
+
+        rss_after = current_rss_bytes()
+        peak_after = peak_rss_bytes()
+        # ru_maxrss is process-lifetime; if it grew during this task, the task set the new peak.
+        document_peak = peak_after if peak_after > peak_before else max(rss_before, rss_after)
+        stats = {"pid": os.getpid(), "tasks": tasks, "rss": rss_after, "document_peak": document_peak}
+        if page_cache is not None:
+            stats["page_cache"] = page_cache.stats()
+        if result_cache is not None:
+            stats["result_cache"] = result_cache.stats()
+        try:
+            conn.send((status, payload, stats))
+        except Exception as exc:
+            conn.send(("error", RuntimeError(f"Task result could not be sent back: {exc!r}"), stats))
+
+
+class _WorkerSlot:
+    def __init__(self, pool: "WorkerPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.conn = None
+        self.tasks = 0
+        self.rss = 0
+        self.page_cache: Optional[PageCacheStats] = None
+        self.result_cache: Optional[PageCacheStats] = None
+        self.thread = threading.Thread(target=self._run, name=f"worker-slot-{index}", daemon=True)
+
+    def _spawn(self):
+        parent_conn, child_conn = self.pool._context.Pipe()
+        process = self.pool._context.Process(
+            target=_worker_main,
+            args=(child_conn, self.pool.store_shrink_percent, self.pool.page_cache_mb, self.pool.result_cache_mb),
+            name=f"parse-worker-{self.index}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self.pool._retire_cache_stats("page_cache", self.page_cache)
+        self.pool._retire_cache_stats("result_cache", self.result_cache)
+        self.process, self.conn, self.tasks, self.rss = process, parent_conn, 0, 0
+        self.page_cache = self.result_cache = None
+
+    def _stop_process(self, timeout: float = 10.0):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+        self.process, self.conn = None, None
+
+    def _replace_crashed(self):
+        tasks, rss = self.tasks, self.rss
+        self._stop_process(timeout=1.0)
+        self.pool._record_recycle(self, "crash", tasks=tasks, rss=rss)
+
+    def _run(self):
+        pool = self.pool
+        while True:
+            item = pool._tasks.get()
+            if item is None:
+                break
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            if self.process is not None and not self.process.is_alive():
+                # Died while idle (e.g. OOM-killed between tasks).
+                self._replace_crashed()
+            if self.process is None:
+                self._spawn()
+            try:
+                try:
+                    self.conn.send((fn, args, kwargs))
+                except OSError:
+                    # Died after the liveness check: the task never reached it, so resend.
+                    self._replace_crashed()
+                    self._spawn()
+                    self.conn.send((fn, args, kwargs))
+            except Exception as exc:
+                # Pickling happens before anything is written, so the worker is still usable.
+                future.set_exception(exc)
+                continue
+
+            try:
+                status, payload, stats = self.conn.recv()
+            except (EOFError, OSError):
+                exitcode = self.process.exitcode if self.process else None
+                self._stop_process(timeout=1.0)
+                pool._record_recycle(self, "crash", tasks=self.tasks, rss=self.rss)
+                future.set_exception(WorkerCrashedError(f"Worker process exited (code {exitcode}) while parsing."))
+                continue
+
+            self.tasks, self.rss = stats["tasks"], stats["rss"]
+            self.page_cache = stats.get("page_cache")
+            self.result_cache = stats.get("result_cache")
+            pool._record_task(status == "ok", stats["document_peak"])
+            if status == "ok":
+                future.set_result(payload)
+            else:
+                future.set_exception(payload)
+
+            # Recycle only between tasks so no in-flight request is dropped.
+            reason = pool._recycle_reason(self)
+            if reason:
+                tasks, rss = self.tasks, self.rss
+                self._stop_process()
+                pool._record_recycle(self, reason, tasks=tasks, rss=rss)
+        self._stop_process()
+
+
+class WorkerPool(Executor):
+    """
+    Process pool for PyMuPDF-heavy parsing that governs worker memory.
+
+    Each worker empties MuPDF's resource store after every document and reports
+    its RSS and an estimate of the document's peak RSS. A worker is recycled
+    (replaced by a fresh process) after `max_tasks_per_worker` documents or when
+    its RSS exceeds `max_rss_mb`; recycling happens between tasks, so in-flight
+    work is never dropped. Recycle events are available from `metrics()`.
+    With `page_cache_mb`, each worker keeps a page-level extraction cache of that size,
+    and with `result_cache_mb` a cache of whole parse results (see resultcache.py).
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_tasks_per_worker: int = 500,
+        max_rss_mb: float = 1024.0,
+        store_shrink_percent: int = 100,
+        mp_context: Optional[str] = "spawn",
+        max_events: int = 100,
+        page_cache_mb: float = 0.0,
+        result_cache_mb: float = 0.0,
+    ):
+        self._max_workers = max_workers or os.cpu_count() or 1
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_rss_bytes = int(max_rss_mb * 1024 * 1024)
+        self.store_shrink_percent = store_shrink_percent
+        self.page_cache_mb = page_cache_mb
+        self.result_cache_mb = result_cache_mb
+        self._context = multiprocessing.get_context(mp_context)
+        self._tasks: "queue.Queue[Optional[Tuple[Future, Callable, tuple, dict]]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._completed = 0
+        self._failed = 0
+        self._peak_document_rss = 0
+        self._recycles: Dict[str, int] = {}
+        self._events: Deque[RecycleEvent] = deque(maxlen=max_events)
+        # Counters of caches that died with recycled workers, by cache name.
+        self._retired_caches: Dict[str, Optional[PageCacheStats]] = {}
+        self._slots: List[_WorkerSlot] = [_WorkerSlot(self, idx) for idx in range(self._max_workers)]
+        for slot in self._slots:
+            slot.thread.start()
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            future: Future = Future()
+            self._tasks.put((future, fn, args, kwargs))
+            return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        for _ in self._slots:
+            self._tasks.put(None)
+        if wait:
+            for slot in self._slots:
+                slot.thread.join()
+
+    def _recycle_reason(self, slot: _WorkerSlot) -> Optional[str]:
+        if self.max_tasks_per_worker and slot.tasks >= self.max_tasks_per_worker:
+            return "max_tasks"
+        if self.max_rss_bytes and slot.rss >= self.max_rss_bytes:
+            return "max_rss"
+        return None
+
+    def _record_task(self, ok: bool, document_peak: int):
+        with self._lock:
+            if ok:
+                self._completed += 1
+            else:
+                self._failed += 1
+            self._peak_document_rss = max(self._peak_document_rss, document_peak)
+
+    def _retire_cache_stats(self, name: str, stats: Optional[PageCacheStats]):
+        if stats is None:
+            return
+        with self._lock:
+            retired = stats.model_copy(update={"entries": 0, "size_mb": 0.0})
+            self._retired_caches[name] = combine_page_cache_stats([self._retired_caches.get(name), retired])
+
+    def _record_recycle(self, slot: _WorkerSlot, reason: str, tasks: int, rss: int):
+        with self._lock:
+            self._recycles[reason] = self._recycles.get(reason, 0) + 1
+            self._events.append(RecycleEvent(
+                worker=slot.index,
+                reason=reason,
+                tasks=tasks,
+                rss_mb=rss / (1024 * 1024),
+                at=time.time(),
+            ))
+
+    def metrics(self) -> WorkerPoolMetrics:
+        with self._lock:
+            workers = [
+                WorkerStats(
+                    worker=slot.index,
+                    pid=slot.process.pid if slot.process is not None else None,
+                    tasks=slot.tasks,
+                    rss_mb=slot.rss / (1024 * 1024),
+                )
+                for slot in self._slots
+            ]
+            return WorkerPoolMetrics(
+                workers=workers,
+                tasks_completed=self._completed,
+                tasks_failed=self._failed,
+                queued=self._tasks.qsize(),
+                peak_document_rss_mb=self._peak_document_rss / (1024 * 1024),
+                recycles=dict(self._recycles),
+                recent_recycles=list(self._events),
+                page_cache=combine_page_cache_stats(
+                    [self._retired_caches.get("page_cache")] + [slot.page_cache for slot in self._slots]
+                ),
+                result_cache=combine_page_cache_stats(
+                    [self._retired_caches.get("result_cache")] + [slot.result_cache for slot in self._slots]
+                ),
+            )
+
+
+class ThreadParsePool(ThreadPoolExecutor):
+    """
+    Single-process alternative to WorkerPool for small containers: one copy of the
+    interpreter, merchant index and page cache instead of one per worker.
+
+    The parser is reentrant, but PyMuPDF is not: extraction is serialized through
+    extractor.FITZ_LOCK (held per page), so only parsing overlaps between threads,
+    and only on free-threaded CPython builds. Exposes the same `metrics()` as WorkerPool.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        super().__init__(max_workers=max_workers or os.cpu_count() or 1, thread_name_prefix="parse-thread")
+        self._stats_lock = threading.Lock()
+        self._completed = 0
+        self._failed = 0
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(self._record)
+        return future
+
+    def _record(self, future: Future):
+        if future.cancelled():
+            return
+        with self._stats_lock:
+            if future.exception() is None:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+    def metrics(self) -> WorkerPoolMetrics:
+        with self._stats_lock:
+            completed, failed = self._completed, self._failed
+        return WorkerPoolMetrics(
+            workers=[WorkerStats(
+                worker=0,
+                pid=os.getpid(),
+                tasks=completed + failed,
+                rss_mb=current_rss_bytes() / (1024 * 1024),
+            )],
+            tasks_completed=completed,
+            tasks_failed=failed,
+            queued=self._work_queue.qsize(),
+        )
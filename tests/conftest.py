@@ -0,0 +1,45 @@
+from pathlib import Path
+
+import fitz
+import pytest
+
+FIXTURE_PATH = Path(__file__).parent / "fixtures" / "ttb_statement_sample.txt"
+
+
+def _fixture_texts() -> list[str]:
+    texts: list[str] = []
+    for raw in FIXTURE_PATH.read_text().splitlines():
+        stripped = raw.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        texts.append(stripped.split("|", 2)[2].strip())
+    return texts
+
+
+@pytest.fixture
+def make_statement_pdf(tmp_path):
+    """
+    Factory that renders pages of text rows into a real PDF with a text layer.
+    Defaults to a single page built from the sanitized TTB fixture.
+    """
+    counter = {"n": 0}
+
+    def _make(pages: list[list[str]] | None = None, name: str | None = None) -> Path:
+        pages = pages if pages is not None else [_fixture_texts()]
+        counter["n"] += 1
+        path = tmp_path / (name or f"statement_{counter['n']}.pdf")
+        doc = fitz.open()
+        for rows in pages:
+            page = doc.new_page()
+            for idx, text in enumerate(rows):
+                page.insert_text((40, 60 + idx * 20), text, fontsize=9)
+        doc.save(str(path))
+        doc.close()
+        return path
+
+    return _make
+
+
+@pytest.fixture
+def statement_pdf(make_statement_pdf) -> Path:
+    return make_statement_pdf()
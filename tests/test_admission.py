@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from credit_card_extraction.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    ScannedDocumentError,
+    check_text_layer,
+    preflight,
+)
+from credit_card_extraction import api
+from credit_card_extraction.api import app
+
+
+def test_preflight_reports_pages_and_text_layer(make_statement_pdf):
+    report = preflight(str(make_statement_pdf([["Page one"], ["Page two"], ["Page three"]])))
+    assert report.page_count == 3
+    assert report.has_text_layer is True
+    assert report.cost == 3.0
+
+
+def test_preflight_flags_scanned_only_pdf(make_statement_pdf):
+    report = preflight(str(make_statement_pdf([[], []])))
+    assert report.has_text_layer is False
+    with pytest.raises(ScannedDocumentError):
+        check_text_layer(report)
+
+
+def test_admission_rejects_when_lane_saturated():
+    controller = AdmissionController(workers=2, small_cost=10, small_capacity=20, large_capacity=500)
+    controller.admit(400)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.admit(200)
+    assert excinfo.value.lane == "large"
+    assert excinfo.value.retry_after >= 1
+
+    # Small statements have their own lane and are not blocked by the bundle.
+    assert controller.admit(5).name == "small"
+
+
+def test_admission_idle_lane_accepts_oversized_document():
+    controller = AdmissionController(large_capacity=100)
+    assert controller.admit(1000).name == "large"
+
+
+def test_admission_slot_releases_cost():
+    controller = AdmissionController(workers=1, small_cost=10, small_capacity=10)
+
+    async def _run():
+        async with controller.slot(8):
+            assert controller.lanes["small"].outstanding == 8
+        assert controller.lanes["small"].outstanding == 0
+
+    asyncio.run(_run())
+
+
+def test_parse_endpoint_preflight(tmp_path, monkeypatch, statement_pdf, make_statement_pdf):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("CCE_PARSE_WORKERS", "1")
+    with TestClient(app) as client:
+        ok = client.post("/parse", files={"file": ("s.pdf", statement_pdf.read_bytes(), "application/pdf")})
+        assert ok.status_code == 200
+        assert ok.json()["statement"]["new_balance"] == 5432.1
+
+        scanned = make_statement_pdf([[]]).read_bytes()
+        rejected = client.post("/parse", files={"file": ("scan.pdf", scanned, "application/pdf")})
+        assert rejected.status_code == 422
+
+        broken = client.post("/parse", files={"file": ("x.pdf", b"not a pdf", "application/pdf")})
+        assert broken.status_code == 400
+
+
+def test_parse_endpoint_rejects_when_lane_saturated(tmp_path, monkeypatch, statement_pdf):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("CCE_PARSE_WORKERS", "1")
+    monkeypatch.setenv("CCE_ADMISSION_SMALL_CAPACITY", "5")
+    original = api._preflight_upload
+
+    def preflight_off_loop(path):
+        with pytest.raises(RuntimeError):
+            asyncio.get_running_loop()
+        return original(path)
+
+    monkeypatch.setattr(api, "_preflight_upload", preflight_off_loop)
+    upload = {"file": ("s.pdf", statement_pdf.read_bytes(), "application/pdf")}
+    with TestClient(app) as client:
+        admission = client.app.state.admission
+        lane = admission.admit(5)
+        busy = client.post("/parse", files=upload)
+        assert busy.status_code == 503
+        assert busy.headers["Retry-After"] == str(admission.retry_after(lane))
+
+        lane.outstanding -= 5
+        assert client.post("/parse", files=upload).status_code == 200
@@ -0,0 +1,45 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from credit_card_extraction.api import app
+
+
+def _client(tmp_path, monkeypatch, **env):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("CCE_PARSE_WORKERS", "1")
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
+    return TestClient(app)
+
+
+def test_batch_streams_results_and_per_file_errors(tmp_path, monkeypatch, statement_pdf, make_statement_pdf):
+    scanned = make_statement_pdf([[]], name="scanned.pdf")
+    files = [
+        ("files", ("a.pdf", statement_pdf.read_bytes(), "application/pdf")),
+        ("files", ("broken.pdf", b"not a pdf", "application/pdf")),
+        ("files", ("scanned.pdf", scanned.read_bytes(), "application/pdf")),
+        ("files", ("b.pdf", statement_pdf.read_bytes(), "application/pdf")),
+    ]
+    with _client(tmp_path, monkeypatch) as client:
+        response = client.post("/parse/batch", files=files)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        items = {item["index"]: item for item in map(json.loads, response.text.splitlines())}
+        assert client.get("/metrics").json()["tasks_completed"] == 2
+
+    assert sorted(items) == [0, 1, 2, 3]
+    assert [items[idx]["status_code"] for idx in range(4)] == [200, 400, 422, 200]
+    assert items[0]["result"]["statement"]["new_balance"] == 5432.1
+    assert items[1]["filename"] == "broken.pdf" and items[1]["result"] is None
+    assert items[1]["error"] == "Failed to open PDF."
+
+
+def test_batch_over_caps_is_rejected(tmp_path, monkeypatch, statement_pdf):
+    upload = ("files", ("a.pdf", statement_pdf.read_bytes(), "application/pdf"))
+    with _client(tmp_path, monkeypatch, CCE_BATCH_MAX_FILES="2", CCE_BATCH_MAX_PAGES="1") as client:
+        assert client.post("/parse/batch", files=[upload] * 3).status_code == 413
+        response = client.post("/parse/batch", files=[upload] * 2)
+        assert response.status_code == 413
+        assert "limit is 1" in response.json()["detail"]
+        assert client.get("/metrics").json()["tasks_completed"] == 0
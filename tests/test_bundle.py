@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from credit_card_extraction.api import app
+from credit_card_extraction.bundle import parse_bundle, split_statements
+from credit_card_extraction.models import NormalizedLine
+
+STATEMENT_A = [
+    "1234-XXXX-XXXX-5678 Statement Date 01/01/2026 20/01/2026",
+    "Transaction Date Transaction Details Amount",
+    "08/12/2025 11/12/2025 KINSHO STORE MATSUBARA JP 393.71",
+]
+STATEMENT_A_CONTINUED = [
+    "1234-XXXX-XXXX-5678 Statement Date 01/01/2026 20/01/2026",
+    "Transaction Date Transaction Details Amount",
+    "15/12/2025 16/12/2025 GRAB BANGKOK TH 120.00",
+]
+STATEMENT_A_OVERFLOW = [
+    "15/12/2025 16/12/2025 GRAB BANGKOK TH 120.00",
+]
+STATEMENT_B = [
+    "1234-XXXX-XXXX-5678 Statement Date 01/02/2026 20/02/2026",
+    "Transaction Date Transaction Details Amount",
+    "05/01/2026 06/01/2026 STARBUCKS SILOM TH 155.00",
+]
+
+
+def _lines(pages: list[list[str]]) -> list[NormalizedLine]:
+    return [
+        NormalizedLine(text=text, page=page_num, y=10.0 * idx)
+        for page_num, texts in enumerate(pages, start=1)
+        for idx, text in enumerate(texts)
+    ]
+
+
+def test_split_statements_on_header_signature():
+    segments = split_statements(_lines([STATEMENT_A, STATEMENT_A_CONTINUED, STATEMENT_B]))
+
+    assert len(segments) == 2
+    assert {line.page for line in segments[0]} == {1, 2}
+    assert {line.page for line in segments[1]} == {3}
+
+
+def test_parse_bundle_returns_one_result_per_statement(make_statement_pdf):
+    pdf = make_statement_pdf([STATEMENT_A, STATEMENT_A_OVERFLOW, STATEMENT_B])
+
+    results = parse_bundle(str(pdf), max_workers=2)
+
+    assert [r.statement.statement_date for r in results] == [date(2026, 1, 1), date(2026, 2, 1)]
+    assert [t.description for t in results[0].transactions] == [
+        "KINSHO STORE MATSUBARA JP",
+        "GRAB BANGKOK TH",
+    ]
+    assert [t.description for t in results[1].transactions] == ["STARBUCKS SILOM TH"]
+
+
+def test_concurrent_bundles_share_segment_slots(make_statement_pdf):
+    pdf = make_statement_pdf([STATEMENT_A, STATEMENT_B, STATEMENT_A_CONTINUED, STATEMENT_B])
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    class CountingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, /, *args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            future = super().submit(fn, *args, **kwargs)
+            future.add_done_callback(lambda _: _finished())
+            return future
+
+    def _finished():
+        with lock:
+            in_flight[0] -= 1
+
+    slots = threading.BoundedSemaphore(1)
+    results = []
+    with CountingExecutor(max_workers=4) as executor:
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(parse_bundle(str(pdf), executor=executor, max_pending=4, segment_slots=slots))
+            )
+            for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert peak[0] == 1
+    assert [len(result) for result in results] == [4, 4, 4]
+
+
+def test_parse_bundle_endpoint(tmp_path, monkeypatch, make_statement_pdf):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("CCE_PARSE_WORKERS", "2")
+    pdf = make_statement_pdf([STATEMENT_A, STATEMENT_B])
+    with TestClient(app) as client:
+        response = client.post("/parse/bundle", files={"file": ("bundle.pdf", pdf.read_bytes(), "application/pdf")})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [r["statement"]["payment_due_date"] for r in body] == ["2026-01-20", "2026-02-20"]
@@ -0,0 +1,73 @@
+from datetime import date
+
+from credit_card_extraction.dedup import FingerprintIndex, iter_fingerprints, transaction_fingerprint
+from credit_card_extraction.models import ExtractionResult, StatementHeader, Transaction
+from credit_card_extraction.store import TransactionStore
+
+
+def _txn(day: int, description: str, amount: float) -> Transaction:
+    return Transaction(date=date(2025, 12, day), post_date=date(2025, 12, day + 1), description=description, amount=amount)
+
+
+def _result(statement_day: int, transactions: list[Transaction]) -> ExtractionResult:
+    return ExtractionResult(
+        statement=StatementHeader(account_last4="1111", statement_date=date(2026, 1, statement_day)),
+        transactions=transactions,
+    )
+
+
+def test_fingerprint_is_stable_across_formatting():
+    assert transaction_fingerprint(_txn(1, "KINSHO  STORE", 10.0)) == transaction_fingerprint(_txn(1, "kinsho store", 10.0))
+    assert transaction_fingerprint(_txn(1, "KINSHO STORE", 10.0)) != transaction_fingerprint(_txn(1, "KINSHO STORE", 10.5))
+
+
+def test_repeated_purchases_get_distinct_fingerprints():
+    coffee = _txn(2, "STARBUCKS", 155.0)
+    fingerprints = [fp for _, fp in iter_fingerprints(_result(1, [coffee, coffee]))]
+    assert len(set(fingerprints)) == 2
+
+
+def test_index_spills_to_disk_and_reopens(tmp_path):
+    path = str(tmp_path / "fingerprints")
+    index = FingerprintIndex(path, max_memory_items=2)
+    assert index.add(b"a" * 16) is True
+    assert index.add(b"b" * 16) is True
+    assert index.add(b"a" * 16) is False
+    index.add(b"c" * 16)
+    index.close()
+
+    reopened = FingerprintIndex(path)
+    assert b"a" * 16 in reopened
+    assert b"c" * 16 in reopened
+    assert b"d" * 16 not in reopened
+
+
+def test_index_filters_overlapping_statements():
+    index = FingerprintIndex()
+    coffee = _txn(2, "STARBUCKS", 155.0)
+    first, _ = index.filter_new(_result(1, [_txn(1, "KINSHO", 10.0), coffee]))
+    second, kept = index.filter_new(_result(2, [coffee, coffee, _txn(20, "GRAB", 80.0)]))
+
+    assert len(first.transactions) == 2
+    # One coffee was already ingested; the second one on the same day is new.
+    assert [t.description for t in second.transactions] == ["STARBUCKS", "GRAB"]
+    assert len(kept) == 2
+    assert second.validation.warnings == ["Skipped 1 duplicate transaction(s) already ingested."]
+
+
+def test_store_skips_duplicates_but_allows_reingest(tmp_path):
+    db_path = str(tmp_path / "txn.sqlite3")
+    store = TransactionStore(db_path, fingerprints=FingerprintIndex())
+    store.save_result(_result(1, [_txn(1, "KINSHO", 10.0), _txn(2, "STARBUCKS", 155.0)]))
+    store.save_result(_result(2, [_txn(2, "STARBUCKS", 155.0), _txn(20, "GRAB", 80.0)]))
+    assert [t.description for t in store.query_transactions().items] == ["KINSHO", "STARBUCKS", "GRAB"]
+
+    # Re-ingesting a statement replaces it instead of being filtered against itself.
+    store.save_result(_result(1, [_txn(1, "KINSHO", 10.0), _txn(2, "STARBUCKS", 155.0)]))
+    assert len(store.query_transactions().items) == 3
+    store.close()
+
+    # A fresh in-memory index is warmed from the stored fingerprints.
+    reopened = TransactionStore(db_path, fingerprints=FingerprintIndex())
+    reopened.save_result(_result(3, [_txn(20, "GRAB", 80.0)]))
+    assert len(reopened.query_transactions().items) == 3
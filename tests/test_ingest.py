@@ -0,0 +1,161 @@
+import json
+import shutil
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+
+import pytest
+
+from credit_card_extraction import ingest
+from credit_card_extraction.ingest import IngestDaemon
+from credit_card_extraction.models import ExtractionResult, StatementHeader
+from credit_card_extraction.store import TransactionStore
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    paths = {name: tmp_path / name for name in ("inbox", "out", "quarantine")}
+    paths["inbox"].mkdir()
+    return paths
+
+
+def _daemon(tmp_path, dirs, executor, **kwargs) -> IngestDaemon:
+    options = dict(settle_seconds=0.0, poll_interval=0.01, retry_backoff=0.0, use_inotify=False)
+    options.update(kwargs)
+    return IngestDaemon(
+        [str(dirs["inbox"])],
+        state_path=str(tmp_path / "ingest.sqlite3"),
+        quarantine_dir=str(dirs["quarantine"]),
+        executor=executor,
+        output_dir=str(dirs["out"]),
+        **options,
+    )
+
+
+def test_ingest_processes_each_content_hash_once(tmp_path, dirs, statement_pdf):
+    shutil.copy(statement_pdf, dirs["inbox"] / "jan.pdf")
+    shutil.copy(statement_pdf, dirs["inbox"] / "jan-copy.pdf")
+    (dirs["inbox"] / "notes.txt").write_text("ignored")
+
+    store = TransactionStore(str(tmp_path / "txn.sqlite3"))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        daemon = _daemon(tmp_path, dirs, executor, store=store)
+        daemon.run(once=True)
+        daemon.close()
+
+        outputs = list(dirs["out"].glob("*.json"))
+        assert len(outputs) == 1
+        assert json.loads(outputs[0].read_text())["statement"]["new_balance"] == 5432.1
+        assert len(store.query_transactions().items) == 1
+
+        # A restarted daemon does not reprocess known content.
+        restarted = _daemon(tmp_path, dirs, executor)
+        restarted.run(once=True)
+        restarted.close()
+        assert len(list(dirs["out"].glob("*.json"))) == 1
+
+
+def test_ingest_quarantines_after_retries(tmp_path, dirs):
+    (dirs["inbox"] / "broken.pdf").write_bytes(b"definitely not a pdf")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        daemon = _daemon(tmp_path, dirs, executor, max_retries=2)
+        daemon.run(once=True)
+        daemon.close()
+
+    assert len(list(dirs["quarantine"].glob("broken.*.pdf"))) == 1
+    assert not (dirs["inbox"] / "broken.pdf").exists()
+    assert list(dirs["out"].glob("*.json")) == []
+
+
+def test_quarantine_keeps_files_with_the_same_name(tmp_path, dirs):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        daemon = _daemon(tmp_path, dirs, executor, max_retries=1)
+        for content in (b"not a pdf", b"still not a pdf"):
+            (dirs["inbox"] / "statement.pdf").write_bytes(content)
+            daemon.run(once=True)
+        daemon.close()
+
+    quarantined = sorted(path.read_bytes() for path in dirs["quarantine"].glob("statement.*.pdf"))
+    assert quarantined == [b"not a pdf", b"still not a pdf"]
+
+
+def test_finished_parse_wakes_the_loop(tmp_path, dirs, make_statement_pdf):
+    for idx in range(4):
+        shutil.copy(make_statement_pdf([[f"Statement {idx}"]]), dirs["inbox"] / f"{idx}.pdf")
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # One slot and a long poll interval: each file must start as soon as the previous one finishes.
+        daemon = _daemon(tmp_path, dirs, executor, poll_interval=10.0, max_in_flight=1)
+        started = time.monotonic()
+        daemon.run(once=True)
+        elapsed = time.monotonic() - started
+        daemon.close()
+
+    assert len(list(dirs["out"].glob("*.json"))) == 4
+    assert elapsed < 5.0
+
+
+def test_ingest_waits_for_file_to_finish_writing(tmp_path, dirs, statement_pdf):
+    payload = statement_pdf.read_bytes()
+    target = dirs["inbox"] / "growing.pdf"
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        daemon = _daemon(tmp_path, dirs, executor, settle_seconds=0.3)
+        target.write_bytes(payload[: len(payload) // 2])
+        daemon.run_once()
+        time.sleep(0.2)
+        target.write_bytes(payload)
+        daemon.run_once()
+        time.sleep(0.2)
+        # Still inside the settle window of the rewritten file.
+        assert daemon.run_once() == 1
+
+        deadline = time.time() + 5
+        while daemon.run_once(timeout=0.05) and time.time() < deadline:
+            pass
+        daemon.close()
+
+    assert len(list(dirs["out"].glob("growing.*.json"))) == 1
+
+
+def test_ingest_with_inotify(tmp_path, dirs, statement_pdf):
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        daemon = _daemon(tmp_path, dirs, executor, use_inotify=True)
+        if daemon._watcher is None:
+            pytest.skip("inotify is not available on this platform")
+        daemon.run_once()
+        shutil.copy(statement_pdf, dirs["inbox"] / "feb.pdf")
+
+        deadline = time.time() + 5
+        while not list(dirs["out"].glob("*.json")) and time.time() < deadline:
+            daemon.run_once(timeout=0.05)
+        daemon.close()
+
+    assert len(list(dirs["out"].glob("feb.*.json"))) == 1
+
+
+class _InstantExecutor(Executor):
+    _max_workers = 4
+
+    def submit(self, fn, /, *args, **kwargs):
+        future: Future = Future()
+        future.set_result(ExtractionResult(statement=StatementHeader(account_last4="1111"), transactions=[]))
+        return future
+
+
+def test_burst_costs_constant_work_per_file(tmp_path, dirs, monkeypatch):
+    for idx in range(2000):
+        (dirs["inbox"] / f"{idx}.pdf").write_bytes(b"%PDF-" + str(idx).encode())
+    stats = []
+    original_stat = ingest.os.stat
+
+    def counting_stat(path, *args, **kwargs):
+        stats.append(path)
+        return original_stat(path, *args, **kwargs)
+
+    monkeypatch.setattr(ingest.os, "stat", counting_stat)
+    daemon = _daemon(tmp_path, dirs, _InstantExecutor())
+    daemon.run(once=True)
+    daemon.close()
+    monkeypatch.undo()
+
+    assert len(list(dirs["out"].glob("*.json"))) == 2000
+    # Each file is stat'ed a bounded number of times, not once per loop pass.
+    assert len(stats) <= 4 * 2000
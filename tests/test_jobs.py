@@ -0,0 +1,117 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from credit_card_extraction.api import app
+from credit_card_extraction.jobs import JobRunner, JobStore
+from credit_card_extraction.models import ExtractionResult, JobStatus, StatementHeader
+
+
+def _fake_parse(path: str) -> ExtractionResult:
+    return ExtractionResult(statement=StatementHeader(account_last4=path[-8:-4]))
+
+
+def test_job_store_claims_in_priority_order(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    low = store.enqueue(b"%PDF-low", filename="low.pdf", priority=0)
+    high = store.enqueue(b"%PDF-high", filename="high.pdf", priority=5)
+    later_low = store.enqueue(b"%PDF-low2", filename="low2.pdf", priority=0)
+
+    claimed = [store.claim()["id"], store.claim()["id"], store.claim()["id"]]
+    assert claimed == [high.id, low.id, later_low.id]
+    assert store.claim() is None
+
+
+def test_job_store_survives_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(db_path)
+    job = store.enqueue(b"%PDF-1", filename="a.pdf")
+    store.claim()
+    store.close()
+
+    # A job that was running when the process died is requeued on startup.
+    reopened = JobStore(db_path)
+    assert reopened.get(job.id).status == JobStatus.QUEUED
+    assert reopened.claim()["id"] == job.id
+
+
+
+def test_job_that_keeps_interrupting_is_failed(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(db_path, max_attempts=2)
+    job = store.enqueue(b"%PDF-poison", filename="poison.pdf")
+    store.claim()
+    store.close()
+
+    store = JobStore(db_path, max_attempts=2)
+    assert store.get(job.id).status == JobStatus.QUEUED
+    store.claim()
+    store.close()
+
+    # Second interrupted attempt: the job is failed rather than requeued forever.
+    store = JobStore(db_path, max_attempts=2)
+    info = store.get(job.id)
+    assert info.status == JobStatus.FAILED
+    assert info.attempts == 2
+    assert "interrupted" in info.error
+    assert store.claim() is None
+    assert not any((tmp_path / "spool").iterdir())
+
+
+def test_job_runner_completes_and_notifies(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    notified = []
+    runner = JobRunner(store, _fake_parse, notify=lambda url, info: notified.append((url, info)))
+    ok = store.enqueue(b"%PDF-ok", callback_url="http://localhost/hook")
+
+    def _boom(path):
+        raise ValueError("broken")
+
+    assert runner.run_once() is True
+    assert runner.run_once() is False
+
+    info = store.get(ok.id)
+    assert info.status == JobStatus.SUCCEEDED
+    assert info.result is not None
+    assert notified[0][0] == "http://localhost/hook"
+    assert notified[0][1].status == JobStatus.SUCCEEDED
+
+    bad = store.enqueue(b"%PDF-bad")
+    JobRunner(store, _boom).run_once()
+    failed = store.get(bad.id)
+    assert failed.status == JobStatus.FAILED
+    assert "broken" in failed.error
+
+
+def test_job_results_expire_after_retention(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), retention_seconds=60)
+    job = store.enqueue(b"%PDF-1")
+    JobRunner(store, _fake_parse).run_once()
+    assert store.get(job.id) is not None
+
+    assert store.purge_expired(now=time.time() + 120) == 1
+    assert store.get(job.id) is None
+
+
+def test_jobs_endpoint_round_trip(tmp_path, monkeypatch, statement_pdf):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    with TestClient(app) as client:
+        response = client.post(
+            "/jobs",
+            files={"file": ("statement.pdf", statement_pdf.read_bytes(), "application/pdf")},
+            data={"priority": "3"},
+        )
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+
+        body = None
+        for _ in range(100):
+            body = client.get(f"/jobs/{job_id}").json()
+            if body["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.05)
+
+        assert body["status"] == "succeeded"
+        assert body["priority"] == 3
+        assert body["result"]["statement"]["account_last4"] == "1234-XXXX-XXXX-5678"
+        assert client.get("/jobs/missing").status_code == 404
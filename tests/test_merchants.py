@@ -0,0 +1,72 @@
+import json
+from datetime import date
+
+from credit_card_extraction.extractor import parse_pdf
+from credit_card_extraction.merchants import MerchantEntry, MerchantIndex, compile_merchant_index, normalize_text
+from credit_card_extraction.models import ExtractionResult, StatementHeader, Transaction
+
+ENTRIES = [
+    {"merchant": "Kinsho Store", "category": "groceries", "patterns": ["KINSHO STORE", "KINSHO"]},
+    {"merchant": "Starbucks", "category": "coffee", "patterns": ["STARBUCKS", "สตาร์บัคส์"]},
+    {"merchant": "Grab Food", "category": "food_delivery", "patterns": ["GRAB FOOD", "GRABFOOD"]},
+    {"merchant": "Grab", "category": "transport", "patterns": ["GRAB"]},
+    {"merchant": "7-Eleven", "category": "convenience", "patterns": ["7-ELEVEN", "เซเว่น"]},
+]
+
+
+def _index() -> MerchantIndex:
+    return MerchantIndex(MerchantEntry.model_validate(e) for e in ENTRIES)
+
+
+def test_normalize_text_collapses_punctuation_and_case():
+    assert normalize_text("  7-Eleven*Silom BKK ") == "7 eleven silom bkk"
+    assert normalize_text("สตาร์บัคส์ สีลม") == "สตาร์บัคส์ สีลม"
+
+
+def test_lookup_prefers_longest_token_match():
+    index = _index()
+    assert index.lookup("KINSHO STORE MATSUBARA JP") == ("Kinsho Store", "groceries")
+    assert index.lookup("GRAB FOOD* BANGKOK") == ("Grab Food", "food_delivery")
+    assert index.lookup("GRAB RIDE BANGKOK") == ("Grab", "transport")
+    assert index.lookup("7-ELEVEN 01234 BANGKOK") == ("7-Eleven", "convenience")
+
+
+def test_lookup_requires_token_boundaries_for_latin():
+    # "GRAB" must not match inside another word.
+    assert _index().lookup("GRABENHOF RESTAURANT") is None
+
+
+def test_lookup_matches_thai_without_spaces():
+    index = _index()
+    assert index.lookup("ร้านสตาร์บัคส์สาขาสีลม") == ("Starbucks", "coffee")
+    assert index.lookup("ซื้อที่เซเว่นอีเลฟเว่น") == ("7-Eleven", "convenience")
+
+
+def test_compiled_index_is_cached_on_disk(tmp_path):
+    dict_path = tmp_path / "merchants.json"
+    dict_path.write_text(json.dumps(ENTRIES), encoding="utf-8")
+
+    first = compile_merchant_index(str(dict_path))
+    assert (tmp_path / "merchants.json.idx").exists()
+    cached = compile_merchant_index(str(dict_path))
+    assert cached.lookup("STARBUCKS SILOM") == first.lookup("STARBUCKS SILOM")
+
+    # Editing the dictionary invalidates the cache.
+    dict_path.write_text(json.dumps(ENTRIES[:1]), encoding="utf-8")
+    assert compile_merchant_index(str(dict_path)).lookup("STARBUCKS SILOM") is None
+
+
+def test_enrich_fills_merchant_fields(statement_pdf):
+    result = ExtractionResult(
+        statement=StatementHeader(account_last4="1111"),
+        transactions=[
+            Transaction(date=date(2025, 12, 1), description="STARBUCKS SILOM", amount=155.0),
+            Transaction(date=date(2025, 12, 2), description="UNKNOWN SHOP", amount=10.0),
+        ],
+    )
+    _index().enrich(result)
+    assert (result.transactions[0].merchant, result.transactions[0].category) == ("Starbucks", "coffee")
+    assert result.transactions[1].merchant is None
+
+    parsed = parse_pdf(str(statement_pdf), merchant_index=_index())
+    assert parsed.transactions[0].merchant == "Kinsho Store"
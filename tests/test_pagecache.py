@@ -0,0 +1,79 @@
+import fitz
+
+from credit_card_extraction.extractor import extract_text_with_coords, iter_page_lines
+from credit_card_extraction.pagecache import PageCache
+from credit_card_extraction.workers import WorkerPool, parse_task
+
+TERMS = ["Terms and Conditions", "Interest is charged daily on the outstanding balance."]
+
+
+def test_shared_pages_hit_across_documents(make_statement_pdf):
+    first = make_statement_pdf([["Statement A 01/01/2026"], TERMS])
+    second = make_statement_pdf([["Statement B 01/02/2026"], ["Marketing insert"], TERMS])
+    cache = PageCache()
+
+    assert extract_text_with_coords(str(first), cache) == extract_text_with_coords(str(first))
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    cached = list(iter_page_lines(str(second), cache))
+    assert (cache.hits, cache.misses) == (1, 4)
+    # Hits are re-labelled with the page number of the document being read.
+    assert cached == list(iter_page_lines(str(second)))
+    assert cached[2][1][0].page == 3
+
+
+def test_reexported_document_hits_every_page(tmp_path, make_statement_pdf):
+    original = make_statement_pdf([["Statement A 01/01/2026"], TERMS])
+    doc = fitz.open(str(original))
+    doc.set_metadata({"title": "re-exported", "producer": "another tool"})
+    reexported = tmp_path / "reexported.pdf"
+    doc.save(str(reexported), garbage=4, deflate=True)
+    doc.close()
+    assert reexported.read_bytes() != original.read_bytes()
+
+    cache = PageCache()
+    extract_text_with_coords(str(original), cache)
+    extract_text_with_coords(str(reexported), cache)
+    assert cache.stats().hits == 2
+
+
+def test_annotation_text_is_part_of_the_key(tmp_path, make_statement_pdf):
+    paths = []
+    for amount in ("100.00", "999.00"):
+        doc = fitz.open(str(make_statement_pdf([["Statement A 01/01/2026"]])))
+        doc[0].add_freetext_annot(fitz.Rect(40, 200, 300, 230), f"Amount due {amount}")
+        paths.append(tmp_path / f"annotated-{amount}.pdf")
+        doc.save(str(paths[-1]))
+        doc.close()
+
+    cache = PageCache()
+    texts = [" ".join(line.text for line in extract_text_with_coords(str(path), cache)) for path in paths]
+    assert "Amount due 100.00" in texts[0]
+    assert "Amount due 999.00" in texts[1]
+    assert cache.stats().hits == 0
+
+
+def test_page_cache_evicts_least_recently_used():
+    cache = PageCache(max_mb=300 / (1024 * 1024))
+    block = (0.0, 0.0, 1.0, 1.0, "x" * 36)  # 100 bytes with overhead
+    for key in (b"a", b"b", b"c"):
+        cache.put(key, [block])
+    assert cache.get(b"a") is not None
+    cache.put(b"d", [block])
+
+    assert cache.get(b"b") is None
+    assert cache.get(b"a") is not None
+    stats = cache.stats()
+    assert stats.evictions == 1 and stats.entries == 3
+    assert (stats.hits, stats.misses) == (2, 1)
+
+
+def test_worker_pool_reports_page_cache(statement_pdf):
+    pool = WorkerPool(max_workers=1, page_cache_mb=8)
+    try:
+        for _ in range(3):
+            pool.submit(parse_task, str(statement_pdf)).result()
+    finally:
+        pool.shutdown()
+    stats = pool.metrics().page_cache
+    assert (stats.hits, stats.misses) == (2, 1)
@@ -0,0 +1,83 @@
+import json
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from credit_card_extraction import pipeline as pipeline_module
+from credit_card_extraction.pipeline import Pipeline
+
+
+def test_pipeline_writes_results_and_reports_stages(tmp_path, statement_pdf):
+    inbox = tmp_path / "inbox"
+    (inbox / "nested").mkdir(parents=True)
+    shutil.copy(statement_pdf, inbox / "a.pdf")
+    shutil.copy(statement_pdf, inbox / "nested" / "b.pdf")
+    (inbox / "broken.pdf").write_bytes(b"not a pdf")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        report = Pipeline(str(tmp_path / "out"), executor).run([str(inbox), str(tmp_path / "missing.pdf")])
+
+    outputs = sorted((tmp_path / "out").glob("*.json"))
+    assert [path.name.split(".")[0] for path in outputs] == ["a", "b"]
+    assert json.loads(outputs[0].read_text())["statement"]["new_balance"] == 5432.1
+    assert (report.documents, report.failed) == (2, 2)
+    assert [stage.name for stage in report.stages] == ["read", "parse", "write"]
+    assert [stage.items for stage in report.stages] == [3, 2, 2]
+    assert report.bottleneck in {"read", "parse", "write"}
+
+
+def test_slow_sink_applies_backpressure(tmp_path, monkeypatch, statement_pdf):
+    inputs = []
+    for idx in range(10):
+        target = tmp_path / f"doc-{idx}.pdf"
+        shutil.copy(statement_pdf, target)
+        inputs.append(str(target))
+
+    outstanding = []
+    original_write = pipeline_module.write_atomic
+
+    def slow_write(path, data):
+        outstanding.append(pipe._read_timer.stats.items - pipe._written)
+        time.sleep(0.05)
+        original_write(path, data)
+
+    monkeypatch.setattr(pipeline_module, "write_atomic", slow_write)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pipe = Pipeline(str(tmp_path / "out"), executor, readers=1, writers=1, read_queue_size=1, max_in_flight=2)
+        report = pipe.run(inputs)
+
+    assert report.documents == 10
+    # Read-but-unwritten documents: in flight + read queue + one held by the blocked reader.
+    assert max(outstanding) <= 2 + 1 + 1
+    write = report.stages[2]
+    assert report.bottleneck == "write" and write.utilization > 0.5
+    assert report.stages[1].blocked_s > 0
+
+
+def test_failed_submit_releases_its_slot(tmp_path, statement_pdf):
+    inputs = []
+    for idx in range(4):
+        target = tmp_path / f"doc-{idx}.pdf"
+        shutil.copy(statement_pdf, target)
+        inputs.append(str(target))
+
+    class FlakyExecutor(ThreadPoolExecutor):
+        calls = 0
+
+        def submit(self, *args, **kwargs):
+            self.calls += 1
+            if self.calls % 2:
+                raise RuntimeError("pool is broken")
+            return super().submit(*args, **kwargs)
+
+    reports = []
+    with FlakyExecutor(max_workers=1) as executor:
+        pipe = Pipeline(str(tmp_path / "out"), executor, readers=1, writers=1, max_in_flight=1)
+        # A leaked slot or pending count would hang the run.
+        runner = threading.Thread(target=lambda: reports.append(pipe.run(inputs)), daemon=True)
+        runner.start()
+        runner.join(timeout=10)
+
+    assert not runner.is_alive()
+    assert (reports[0].documents, reports[0].failed) == (2, 2)
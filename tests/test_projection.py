@@ -0,0 +1,77 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from credit_card_extraction import extractor
+from credit_card_extraction.api import app
+from credit_card_extraction.extractor import FieldProjection, parse_pdf
+
+HEADER_ROWS = [
+    "1234-XXXX-XXXX-5678 Statement Date 01/01/2026 20/01/2026",
+    "123-4-56789-0 5,432.10",
+    "100,000 1,000.00 0.00 1,000.00",
+]
+TRANSACTION_ROWS = [
+    "Transaction Date Transaction Details Amount",
+    "08/12/2025 11/12/2025 KINSHO STORE MATSUBARA JP 393.71",
+]
+
+
+@pytest.fixture
+def page_counter(monkeypatch):
+    calls = []
+    original = extractor.extract_page_lines
+
+    def counting(page, page_num):
+        calls.append(page_num)
+        return original(page, page_num)
+
+    monkeypatch.setattr(extractor, "extract_page_lines", counting)
+    return calls
+
+
+def test_projection_rejects_unknown_fields():
+    with pytest.raises(ValueError):
+        FieldProjection(["balance"])
+    projection = FieldProjection.parse("statement.new_balance, transactions")
+    assert projection.header_fields == {"new_balance"}
+    assert projection.transactions and not projection.header_only
+
+
+def test_header_projection_stops_after_header_page(make_statement_pdf, page_counter):
+    pdf = make_statement_pdf([HEADER_ROWS, TRANSACTION_ROWS, TRANSACTION_ROWS[1:]])
+
+    result = parse_pdf(str(pdf), fields=["payment_due_date", "min_payment", "outstanding_balance"])
+    assert page_counter == [1]
+    assert result.statement.payment_due_date.isoformat() == "2026-01-20"
+    assert result.statement.min_payment == 1000.0
+    assert result.transactions == []
+
+    # new_balance is only derived at the end, so parsing continues until the header section closes.
+    page_counter.clear()
+    result = parse_pdf(str(pdf), fields=["new_balance"])
+    assert page_counter == [1, 2]
+    assert result.statement.new_balance == 5432.1
+
+
+def test_projection_without_transactions_matches_full_header(make_statement_pdf):
+    pdf = make_statement_pdf([HEADER_ROWS + TRANSACTION_ROWS])
+    full = parse_pdf(str(pdf))
+    projected = parse_pdf(str(pdf), fields=["statement", "validation"])
+    assert len(full.transactions) == 1
+    assert projected.transactions == []
+    assert projected.statement == full.statement
+
+
+def test_parse_endpoint_fields(tmp_path, monkeypatch, statement_pdf):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("CCE_PARSE_WORKERS", "1")
+    with TestClient(app) as client:
+        files = {"file": ("s.pdf", statement_pdf.read_bytes(), "application/pdf")}
+        response = client.post("/parse", params={"fields": "new_balance,payment_due_date,min_payment"}, files=files)
+        assert response.status_code == 200
+        assert response.json() == {
+            "statement": {"new_balance": 5432.1, "payment_due_date": "2026-01-20", "min_payment": 1000.0}
+        }
+
+        bad = client.post("/parse", params={"fields": "nope"}, files=files)
+        assert bad.status_code == 400
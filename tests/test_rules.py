@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from credit_card_extraction.extractor import StatementParser, parse_pdf
+from credit_card_extraction.resultcache import ResultCache, result_cache_key
+from credit_card_extraction.rules import DEFAULT_RULES_DIR, RuleRegistry, RuleSet, configure_rules
+
+
+@pytest.fixture
+def rules_dir(tmp_path):
+    target = tmp_path / "rules"
+    shutil.copytree(DEFAULT_RULES_DIR, target)
+    yield target
+    configure_rules()
+
+
+def _edit(path, **changes):
+    spec = json.loads(path.read_text(encoding="utf-8"))
+    spec.update(changes)
+    path.write_text(json.dumps(spec, ensure_ascii=False), encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_footer_alternation_finds_earliest_keyword():
+    rules = RuleRegistry().get()
+    text = "shop 100.00 grand total 5.00 bank's copy"
+    assert rules.find_footer(text) == min(text.find(k) for k in rules.footer_keywords if k in text)
+    assert rules.find_footer("coffee 50.00") is None
+
+
+def test_rules_are_swapped_atomically_and_pinned_per_parse(rules_dir):
+    registry = configure_rules(str(rules_dir), check_interval=0)
+    parser = StatementParser()
+    parser.reset()
+    before = parser.rules
+    assert before.version == "2026.1"
+
+    _edit(rules_dir / "ttb.json", version="2026.2", footer_keywords=["grand total"])
+    assert registry.get().version == "2026.2"
+    # The document in progress finishes with the rules it started with.
+    assert parser.rules is before
+    assert StatementParser().session.rules.footer_keywords == ("grand total",)
+
+    # A broken edit is rejected and the current rules stay in service.
+    (rules_dir / "ttb.json").write_text("{", encoding="utf-8")
+    assert registry.reload() == []
+    assert registry.get().version == "2026.2"
+
+
+def test_result_cache_key_follows_rule_version(rules_dir, statement_pdf):
+    registry = configure_rules(str(rules_dir), check_interval=0)
+    spec = json.loads((rules_dir / "ttb.json").read_text(encoding="utf-8"))
+    spec["provider"] = "other"
+    (rules_dir / "other.json").write_text(json.dumps(spec, ensure_ascii=False), encoding="utf-8")
+    registry.reload()
+    other_key = result_cache_key(b"doc", registry.get("other"))
+
+    cache = ResultCache(max_mb=1)
+    first = parse_pdf(str(statement_pdf), result_cache=cache)
+    second = parse_pdf(str(statement_pdf), result_cache=cache)
+    assert second == first and second is not first
+    parse_pdf(str(statement_pdf), fields=["new_balance"], result_cache=cache)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    _edit(rules_dir / "ttb.json", version="2026.2")
+    assert parse_pdf(str(statement_pdf), result_cache=cache) == first
+    assert (cache.hits, cache.misses) == (1, 3)
+    # Only the edited provider's keys changed.
+    assert result_cache_key(b"doc", registry.get("other")) == other_key
+
+
+def test_invalid_rule_set_is_rejected():
+    with pytest.raises(ValueError):
+        RuleSet({"provider": "x", "version": "1", "patterns": {"date": "("}}, digest="0")
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from credit_card_extraction import sharding
+from credit_card_extraction.sharding import (
+    ShardWorker,
+    document_key,
+    merge,
+    plan,
+    shard_name,
+    shard_of,
+)
+from credit_card_extraction.workers import WorkerCrashedError
+
+
+def _plan(tmp_path, statement_pdf, docs: int = 6, shards: int = 4):
+    inbox = tmp_path / "inbox"
+    (inbox / "2025").mkdir(parents=True)
+    for idx in range(docs):
+        shutil.copy(statement_pdf, inbox / "2025" / f"doc-{idx}.pdf")
+    shared = tmp_path / "shared"
+    assert plan(str(shared), str(inbox), shards=shards) == docs
+    return shared
+
+
+def _manifest(shared, shard):
+    return (shared / "manifest" / f"{shard_name(shard)}.txt").read_text().split()
+
+
+def test_plan_is_deterministic(tmp_path, statement_pdf):
+    shared = _plan(tmp_path, statement_pdf)
+    for shard in range(4):
+        assert all(shard_of(doc, 4) == shard for doc in _manifest(shared, shard))
+
+
+def test_orphaned_and_live_shards_are_completed_exactly_once(tmp_path, statement_pdf):
+    shared = _plan(tmp_path, statement_pdf)
+    busy = [s for s in range(4) if _manifest(shared, s)]
+    orphan, live = busy[0], busy[1]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # "ghost" crashed holding a shard lease and one document claim; it never heartbeats.
+        ghost = ShardWorker(str(shared), executor, host_id="ghost", lease_timeout=30)
+        assert ghost._acquire(ghost._lease_path(orphan))
+        first = document_key(_manifest(shared, orphan)[0])
+        (shared / "claims" / shard_name(orphan)).mkdir(parents=True)
+        assert ghost._acquire(ghost._claim_path(orphan, first))
+
+        # "busy" is alive and owns another shard but has not processed anything yet.
+        holder = ShardWorker(str(shared), executor, host_id="busy", lease_timeout=30)
+        holder.heartbeat()
+        assert holder._acquire(holder._lease_path(live))
+
+        worker = ShardWorker(str(shared), executor, host_id="worker", lease_timeout=30)
+        processed = worker.run(poll_interval=0.01)
+
+    assert processed == 6
+    assert (shared / "done" / shard_name(live)).exists()
+    # The live owner's lease is untouched; its shard was finished by stealing.
+    assert json.loads((shared / "leases" / f"{shard_name(live)}.lease").read_text())["host"] == "busy"
+
+    merged = tmp_path / "merged.jsonl"
+    assert merge(str(shared), str(merged)) == 6
+    records = [json.loads(line) for line in merged.read_text().splitlines()]
+    assert len({r["doc_id"] for r in records}) == 6
+    assert all(r["result"]["statement"]["new_balance"] == 5432.1 for r in records)
+
+
+def test_takeover_race_over_dead_lease_has_one_winner(tmp_path, statement_pdf):
+    shared = _plan(tmp_path, statement_pdf)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        ghost = ShardWorker(str(shared), executor, host_id="ghost", lease_timeout=30)
+        lease = ghost._lease_path(0)
+        assert ghost._acquire(lease)
+        dead = sharding._read_record(lease)
+
+        # Both contenders saw the same dead owner; "a" replaces it first.
+        a = ShardWorker(str(shared), executor, host_id="a", lease_timeout=30)
+        b = ShardWorker(str(shared), executor, host_id="b", lease_timeout=30)
+        assert a._take_over(lease, json.dumps({"host": "a", "at": 1.0}), dead)
+        assert not b._take_over(lease, json.dumps({"host": "b", "at": 2.0}), dead)
+        assert sharding._read_owner(lease) == "a"
+        assert sorted(p.name for p in (shared / "leases").iterdir()) == [f"{shard_name(0)}.lease"]
+
+        # Many contenders racing through _acquire over a fresh dead lease.
+        os.remove(lease)
+        assert ghost._acquire(lease)
+        workers = [ShardWorker(str(shared), executor, host_id=f"w{idx}", lease_timeout=30) for idx in range(8)]
+        barrier = threading.Barrier(len(workers))
+
+        def contend(worker):
+            worker.heartbeat()
+            barrier.wait()
+            return worker._acquire(lease)
+
+        with ThreadPoolExecutor(max_workers=len(workers)) as pool:
+            wins = list(pool.map(contend, workers))
+    assert wins.count(True) == 1
+    assert sharding._read_owner(lease) == workers[wins.index(True)].host_id
+
+
+def test_worker_crash_is_retried_not_recorded(tmp_path, statement_pdf, monkeypatch):
+    shared = _plan(tmp_path, statement_pdf, docs=3, shards=1)
+    real_parse = sharding.parse_task
+    crashed = []
+
+    def crash_once(path, merchant_dict=None):
+        if path.endswith("doc-1.pdf") and not crashed:
+            crashed.append(path)
+            raise WorkerCrashedError("worker died")
+        return real_parse(path, merchant_dict)
+
+    monkeypatch.setattr(sharding, "parse_task", crash_once)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        worker = ShardWorker(str(shared), executor, host_id="worker", lease_timeout=30)
+        assert worker.run(poll_interval=0.01) == 3
+
+    assert crashed
+    merged = tmp_path / "merged.jsonl"
+    assert merge(str(shared), str(merged)) == 3
+    records = [json.loads(line) for line in merged.read_text().splitlines()]
+    assert all("error" not in r for r in records)
+
+
+def test_repeated_worker_crash_is_recorded(tmp_path, statement_pdf, monkeypatch):
+    shared = _plan(tmp_path, statement_pdf, docs=1, shards=1)
+    attempts = []
+
+    def always_crash(path, merchant_dict=None):
+        attempts.append(path)
+        raise WorkerCrashedError("worker died")
+
+    monkeypatch.setattr(sharding, "parse_task", always_crash)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        worker = ShardWorker(str(shared), executor, host_id="worker", lease_timeout=30, max_crashes=2)
+        assert worker.run(poll_interval=0.01) == 1
+
+    assert len(attempts) == 2
+    record = json.loads(next((shared / "out" / shard_name(0)).iterdir()).read_text())
+    assert "WorkerCrashedError" in record["error"]
@@ -0,0 +1,142 @@
+import sqlite3
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from credit_card_extraction.api import app
+from credit_card_extraction.models import ExtractionResult, StatementHeader, Transaction
+from credit_card_extraction.store import TransactionStore
+
+
+def _result(account: str, statement_date: date | None, transactions: list[tuple[date, str, float]]) -> ExtractionResult:
+    return ExtractionResult(
+        statement=StatementHeader(account_last4=account, statement_date=statement_date, new_balance=100.0),
+        transactions=[
+            Transaction(date=txn_date, post_date=txn_date, description=desc, amount=amount)
+            for txn_date, desc, amount in transactions
+        ],
+    )
+
+
+def test_store_keyset_pagination_and_filters(tmp_path):
+    store = TransactionStore(str(tmp_path / "txn.sqlite3"), batch_size=2)
+    store.save_result(_result("1111", date(2026, 1, 1), [
+        (date(2025, 12, 3), "GRAB BANGKOK", 120.0),
+        (date(2025, 12, 1), "KINSHO STORE", 393.71),
+        (date(2025, 12, 2), "STARBUCKS SILOM", 155.0),
+    ]))
+    store.save_result(_result("2222", date(2026, 1, 1), [(date(2025, 12, 5), "GRAB FOOD", 80.0)]))
+
+    first = store.query_transactions(account="1111", limit=2)
+    assert [t.description for t in first.items] == ["KINSHO STORE", "STARBUCKS SILOM"]
+    assert first.next_cursor is not None
+
+    second = store.query_transactions(account="1111", cursor=first.next_cursor, limit=2)
+    assert [t.description for t in second.items] == ["GRAB BANGKOK"]
+    assert second.next_cursor is None
+
+    grab = store.query_transactions(q="grab")
+    assert {t.account for t in grab.items} == {"1111", "2222"}
+
+    ranged = store.query_transactions(date_from=date(2025, 12, 2), date_to=date(2025, 12, 3))
+    assert len(ranged.items) == 2
+
+
+def test_store_replaces_reingested_statement(tmp_path):
+    store = TransactionStore(str(tmp_path / "txn.sqlite3"))
+    store.save_result(_result("1111", date(2026, 1, 1), [(date(2025, 12, 1), "OLD", 1.0)]))
+    statement_id = store.save_result(_result("1111", date(2026, 1, 1), [(date(2025, 12, 1), "NEW", 2.0)]))
+
+    items = store.query_transactions().items
+    assert [t.description for t in items] == ["NEW"]
+    assert items[0].statement_id == statement_id
+    assert store.get_statement(statement_id).new_balance == 100.0
+
+
+def test_transactions_endpoint_reads_persisted_parse(tmp_path, monkeypatch, statement_pdf):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("CCE_PARSE_WORKERS", "1")
+    monkeypatch.setenv("CCE_STORE_PATH", str(tmp_path / "txn.sqlite3"))
+    with TestClient(app) as client:
+        parsed = client.post("/parse", files={"file": ("s.pdf", statement_pdf.read_bytes(), "application/pdf")})
+        assert parsed.status_code == 200
+
+        response = client.get("/transactions", params={"account": "1234-XXXX-XXXX-5678", "from": "2025-12-01"})
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert [t["description"] for t in items] == ["KINSHO STORE MATSUBARA JP"]
+        assert client.get("/transactions", params={"cursor": "garbage"}).status_code == 400
+
+        rollups = client.get("/rollups", params={"account": "1234-XXXX-XXXX-5678", "from": "2025-12"}).json()
+        assert [(r["month"], r["foreign_currency"], r["total"]) for r in rollups] == [("2025-12", "JPY", 393.71)]
+        assert client.get("/rollups", params={"from": "December"}).status_code == 422
+
+
+def test_rollups_follow_saves_and_replacements(tmp_path):
+    store = TransactionStore(str(tmp_path / "txn.sqlite3"))
+    january = _result("1111", date(2026, 1, 1), [
+        (date(2025, 12, 1), "KINSHO STORE", 393.71),
+        (date(2025, 12, 2), "PAYMENT", -500.0),
+        (date(2025, 11, 30), "GRAB", 0.1),
+    ])
+    january.transactions[0].foreign_currency, january.transactions[0].foreign_amount = "JPY", 2580.0
+    store.save_result(january)
+    store.save_result(_result("2222", date(2026, 1, 1), [(date(2025, 12, 5), "GRAB FOOD", 80.0)]))
+
+    rollups = {(r.account, r.month, r.foreign_currency): r for r in store.query_rollups()}
+    assert rollups[("1111", "2025-12", None)].total == -500.0
+    assert rollups[("1111", "2025-12", "JPY")].foreign_total == 2580.0
+    assert rollups[("1111", "2025-11", None)].debits == 0.1
+
+    # A corrected re-ingest replaces the statement's contribution exactly.
+    store.save_result(_result("1111", date(2026, 1, 1), [(date(2025, 12, 1), "KINSHO STORE", 0.2)]))
+    incremental = [r.model_dump() for r in store.query_rollups()]
+    store.rebuild_rollups()
+    assert [r.model_dump() for r in store.query_rollups()] == incremental
+    assert [(r.account, r.month, r.count, r.total) for r in store.query_rollups(account="1111")] == [
+        ("1111", "2025-12", 1, 0.2)
+    ]
+    assert [r.account for r in store.query_rollups(month_from="2025-12", foreign_currency="")] == ["1111", "2222"]
+
+
+def test_unparsed_statements_are_never_replaced(tmp_path):
+    store = TransactionStore(str(tmp_path / "txn.sqlite3"))
+    store.save_result(_result("UNKNOWN", None, [(date(2025, 12, 1), "FIRST", 1.0)]))
+    store.save_result(_result("UNKNOWN", None, [(date(2025, 12, 2), "SECOND", 2.0)]))
+    store.save_result(_result("UNKNOWN", date(2026, 1, 1), [(date(2025, 12, 3), "THIRD", 3.0)]))
+    store.save_result(_result("UNKNOWN", date(2026, 1, 1), [(date(2025, 12, 4), "FOURTH", 4.0)]))
+
+    assert [t.description for t in store.query_transactions().items] == ["FIRST", "SECOND", "THIRD", "FOURTH"]
+    assert store.query_rollups()[0].count == 4
+
+
+def test_store_created_by_first_layout_is_migrated(tmp_path):
+    db = tmp_path / "txn.sqlite3"
+    conn = sqlite3.connect(db)
+    conn.executescript("""
+        CREATE TABLE statements (
+            id INTEGER PRIMARY KEY, provider TEXT NOT NULL, account TEXT NOT NULL, statement_date TEXT,
+            header TEXT NOT NULL, ingested_at REAL NOT NULL, UNIQUE (provider, account, statement_date)
+        );
+        CREATE TABLE transactions (
+            id INTEGER PRIMARY KEY,
+            statement_id INTEGER NOT NULL REFERENCES statements (id) ON DELETE CASCADE,
+            account TEXT NOT NULL, date TEXT NOT NULL, post_date TEXT, description TEXT NOT NULL,
+            amount REAL NOT NULL, currency TEXT NOT NULL, foreign_amount REAL, foreign_currency TEXT,
+            conversion_rate REAL, notes TEXT
+        );
+        INSERT INTO statements VALUES (1, 'ttb', '1111', '2026-01-01', '{"account_last4": "1111"}', 0);
+        INSERT INTO transactions (statement_id, account, date, post_date, description, amount, currency)
+            VALUES (1, '1111', '2025-12-01', '2025-12-01', 'OLD ROW', 5.0, 'THB');
+    """)
+    conn.close()
+
+    store = TransactionStore(str(db))
+    assert [t.description for t in store.query_transactions().items] == ["OLD ROW"]
+    assert store.query_rollups()[0].total == 5.0
+    store.save_result(_result("2222", date(2026, 1, 1), [(date(2025, 12, 2), "NEW ROW", 1.0)]))
+    store.save_result(_result("1111", date(2026, 1, 1), [(date(2025, 12, 3), "REPLACED", 2.0)]))
+    assert [t.description for t in store.query_transactions().items] == ["NEW ROW", "REPLACED"]
+    assert [t.description for t in store.query_transactions(q="row").items] == ["NEW ROW"]
+    store.close()
+    assert TransactionStore(str(db))._conn.execute("PRAGMA user_version").fetchone()[0] == 3
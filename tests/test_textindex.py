@@ -0,0 +1,163 @@
+import random
+import threading
+from datetime import date
+
+from credit_card_extraction.models import ExtractionResult, StatementHeader, Transaction
+from credit_card_extraction.store import TransactionStore
+from credit_card_extraction.textindex import TextIndex, decode_postings, encode_postings, query_tokens, tokenize
+
+
+def _result(account: str, statement_date: date, descriptions: list[str]) -> ExtractionResult:
+    return ExtractionResult(
+        statement=StatementHeader(account_last4=account, statement_date=statement_date),
+        transactions=[
+            Transaction(date=date(2025, 12, idx + 1), description=desc, amount=10.0 + idx)
+            for idx, desc in enumerate(descriptions)
+        ],
+    )
+
+
+def test_tokenize_latin_words_and_thai_trigrams():
+    assert tokenize("7-ELEVEN สาขา") == {"7", "eleven", "สาข", "าขา"}
+    assert tokenize("ร้านKINSHO") == {"ร้า", "้าน", "kinsho"}
+    assert query_tokens("สา") is None
+    assert query_tokens("  ") is None
+
+
+def test_postings_round_trip():
+    ids = sorted(random.Random(3).sample(range(1, 10_000_000), 500))
+    encoded = encode_postings(ids)
+    assert decode_postings(encoded) == ids
+    assert len(encoded) < 4 * len(ids)
+
+
+def test_index_updates_merges_and_reopens(tmp_path):
+    index = TextIndex(str(tmp_path / "idx"))
+    for start in range(1, 65, 8):
+        index.update([(doc_id, f"GRAB FOOD {doc_id} ร้านกาแฟ") for doc_id in range(start, start + 8)])
+    index.update([(100, "STARBUCKS SILOM")], removed=[1, 2])
+
+    assert index.search("grab food") == list(range(3, 65))
+    assert index.search("กาแฟ") == list(range(3, 65))
+    assert index.search("starbucks") == [100]
+    assert index.search("grab starbucks") == []
+    assert index.segment_count() <= 3
+
+    reopened = TextIndex(str(tmp_path / "idx"))
+    assert reopened.search("grab 7") == [7]
+    assert reopened.docs == 63
+    reopened.compact()
+    assert reopened.segment_count() == 1
+    assert TextIndex(str(tmp_path / "idx")).search("grab") == list(range(3, 65))
+
+
+def test_reused_id_does_not_revive_old_postings(tmp_path):
+    index = TextIndex(str(tmp_path / "idx"))
+    index.update([(1, "GRAB FOOD"), (2, "GRAB TAXI")])
+    index.update([(2, "KFC")], removed=[2])
+    assert index.search("grab") == [1]
+    assert index.search("kfc") == [2]
+    assert index.estimate("taxi") <= 1
+
+    # Merged, reopened and compacted, the old postings stay dead.
+    index.update([(3, "GRAB BIKE")])
+    reopened = TextIndex(str(tmp_path / "idx"))
+    assert reopened.search("grab") == [1, 3]
+    assert reopened.search("taxi") == []
+    reopened.update([(2, "TAXI")], removed=[2])
+    reopened.compact()
+    assert reopened.search("taxi") == [2]
+    assert reopened.search("kfc") == []
+    assert reopened.estimate("kfc") == 0
+
+
+def test_store_search_follows_replacements_and_rebuilds(tmp_path):
+    db = str(tmp_path / "txn.sqlite3")
+    store = TransactionStore(db, text_index=TextIndex(str(tmp_path / "txn.textindex")))
+    store.save_result(_result("1111", date(2026, 1, 1), ["KINSHO STORE MATSUBARA JP", "ร้านกาแฟอเมซอน"]))
+    store.save_result(_result("2222", date(2026, 1, 1), ["GRAB FOOD", "เซเว่น อีเลฟเว่น"]))
+
+    assert [t.description for t in store.query_transactions(q="kinsho store").items] == ["KINSHO STORE MATSUBARA JP"]
+    assert [t.account for t in store.query_transactions(q="กาแฟ").items] == ["1111"]
+    # Trigrams present but not in this order: rejected by the confirmation step.
+    assert store.query_transactions(q="แฟกา").items == []
+    # Latin terms are whole words; short Thai queries fall back to a scan.
+    assert store.query_transactions(q="kins").items == []
+    assert [t.account for t in store.query_transactions(q="เซ").items] == ["2222"]
+
+    # Replacing the newest statement reuses its row ids for the new rows.
+    store.save_result(_result("2222", date(2026, 1, 1), ["GRAB TAXI"]))
+    assert store.query_transactions(q="food").items == []
+    assert [t.description for t in store.query_transactions(q="grab").items] == ["GRAB TAXI"]
+    store.close()
+
+    # An index that missed a save is rebuilt when the store opens.
+    TransactionStore(db).save_result(_result("3333", date(2026, 1, 1), ["GRAB BIKE"]))
+    store = TransactionStore(db, text_index=TextIndex(str(tmp_path / "txn.textindex")))
+    assert [t.description for t in store.query_transactions(q="grab").items] == ["GRAB TAXI", "GRAB BIKE"]
+
+
+def test_common_and_selective_queries_agree(tmp_path):
+    store = TransactionStore(str(tmp_path / "txn.sqlite3"), text_index=TextIndex(str(tmp_path / "txn.textindex")))
+    descriptions = [f"GRAB FOOD M{idx % 40} ร้านกาแฟ" for idx in range(400)] + ["KINSHO STORE", "ร้านKINSHO"]
+    for month in range(1, 5):
+        store.save_result(
+            ExtractionResult(
+                statement=StatementHeader(account_last4=str(month), statement_date=date(2026, month, 1)),
+                transactions=[
+                    Transaction(date=date(2025, 12, 1 + idx % 28), description=desc, amount=1.0)
+                    for idx, desc in enumerate(descriptions)
+                ],
+            )
+        )
+    index = store.text_index
+    assert index.estimate("grab") ** 2 > 100 * index.docs  # scanned in date order
+    assert index.estimate("m7") ** 2 <= 100 * index.docs  # read from the index
+
+    def walk(q: str, limit: int) -> list[int]:
+        ids, cursor = [], None
+        while True:
+            page = store.query_transactions(q=q, cursor=cursor, limit=limit)
+            ids.extend(t.id for t in page.items)
+            if page.next_cursor is None:
+                return ids
+            cursor = page.next_cursor
+
+    every = walk(None, 500)
+    rows = {t.id: t.description for t in store.query_transactions(limit=5000).items}
+    assert len(walk("grab", 100)) == 1600
+    assert walk("m7", 7) == [doc_id for doc_id in every if rows[doc_id].startswith("GRAB FOOD M7 ")]
+    assert walk("kinsho", 3) == [doc_id for doc_id in every if "KINSHO" in rows[doc_id]]
+    assert walk("m3 ร้านกาแฟ", 50) == [doc_id for doc_id in every if " M3 " in rows[doc_id]]
+    assert store.query_transactions(q="kins").items == []
+
+    # Without the index the same matching rules apply, only by scanning.
+    plain = TransactionStore(str(tmp_path / "txn.sqlite3"))
+    for q in ("grab", "m7", "kinsho", "kins", "ร้านกาแฟ", "กาแฟ m3", "m4"):
+        assert [t.id for t in plain.query_transactions(q=q, limit=5000).items] == walk(q, 5000), q
+
+
+def test_decode_postings_mixes_short_and_long_gaps():
+    ids = [1, 2, 3, 130, 131, 20_000, 20_001, 20_005, 3_000_000, 3_000_001]
+    assert decode_postings(encode_postings(ids)) == ids
+    assert decode_postings(encode_postings(range(1, 128))) == list(range(1, 128))
+    assert decode_postings(b"") == []
+
+
+def test_concurrent_replacing_saves_keep_index_in_commit_order(tmp_path):
+    store = TransactionStore(str(tmp_path / "txn.sqlite3"), text_index=TextIndex(str(tmp_path / "txn.textindex")))
+
+    def save(worker: int):
+        for round_ in range(10):
+            store.save_result(_result(str(worker % 2), date(2026, 1, 1), [f"W{worker} R{round_}", "GRAB"]))
+
+    threads = [threading.Thread(target=save, args=(worker,)) for worker in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    live = [t.id for t in store.query_transactions().items if t.description == "GRAB"]
+    assert len(live) == 2
+    assert store.text_index.search("grab") == sorted(live)
+    assert store.text_index.synced_to == store._generation()
@@ -0,0 +1,62 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from credit_card_extraction.api import app
+from credit_card_extraction.extractor import StatementParser
+from credit_card_extraction.models import NormalizedLine
+from credit_card_extraction.workers import ThreadParsePool, parse_task
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def _fixture_lines() -> list[NormalizedLine]:
+    lines = []
+    for raw in (FIXTURES / "ttb_statement_sample.txt").read_text().splitlines():
+        if raw.strip() and not raw.startswith("#"):
+            page, y, text = raw.split("|", 2)
+            lines.append(NormalizedLine(text=text.strip(), page=int(page), y=float(y)))
+    return lines
+
+
+def test_parser_is_reusable_and_shared_across_threads():
+    expected = json.loads((FIXTURES / "ttb_statement_sample_golden.json").read_text())
+    lines = _fixture_lines()
+    parser = StatementParser()
+
+    # Reuse does not accumulate state from earlier documents.
+    assert parser.parse(lines).model_dump(mode="json") == expected
+    assert parser.parse(lines).model_dump(mode="json") == expected
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: parser.parse(lines).model_dump(mode="json"), range(200)))
+    assert all(result == expected for result in results)
+
+
+def test_thread_pool_parses_pdfs_concurrently(statement_pdf):
+    pool = ThreadParsePool(max_workers=4)
+    try:
+        futures = [pool.submit(parse_task, str(statement_pdf)) for _ in range(16)]
+        results = [future.result() for future in futures]
+        failing = pool.submit(parse_task, "/nonexistent.pdf")
+        assert failing.exception() is not None
+    finally:
+        pool.shutdown()
+
+    assert all(result == results[0] for result in results)
+    assert results[0].statement.new_balance == 5432.1
+    metrics = pool.metrics()
+    assert (metrics.tasks_completed, metrics.tasks_failed) == (16, 1)
+
+
+def test_api_thread_mode(tmp_path, monkeypatch, statement_pdf):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("CCE_PARSE_MODE", "thread")
+    monkeypatch.setenv("CCE_PARSE_WORKERS", "2")
+    with TestClient(app) as client:
+        response = client.post("/parse", files={"file": ("s.pdf", statement_pdf.read_bytes(), "application/pdf")})
+        assert response.status_code == 200
+        assert response.json()["statement"]["new_balance"] == 5432.1
+        assert client.get("/metrics").json()["tasks_completed"] == 1
@@ -0,0 +1,104 @@
+import os
+import signal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from credit_card_extraction.api import app
+from credit_card_extraction.extractor import parse_pdf
+from credit_card_extraction.workers import WorkerCrashedError, WorkerPool
+
+
+def _pid(_: int) -> int:
+    return os.getpid()
+
+
+def _fail(message: str):
+    raise ValueError(message)
+
+
+def _die(_: int):
+    os._exit(3)
+
+
+def test_pool_recycles_after_max_tasks_without_dropping_work():
+    pool = WorkerPool(max_workers=1, max_tasks_per_worker=2, max_rss_mb=0)
+    try:
+        pids = list(pool.map(_pid, range(5)))
+    finally:
+        pool.shutdown()
+    metrics = pool.metrics()
+
+    assert len(pids) == 5
+    assert len(set(pids)) == 3
+    assert metrics.tasks_completed == 5
+    assert metrics.recycles == {"max_tasks": 2}
+    assert metrics.recent_recycles[0].reason == "max_tasks"
+
+
+def test_pool_recycles_above_memory_threshold():
+    pool = WorkerPool(max_workers=1, max_tasks_per_worker=0, max_rss_mb=1)
+    try:
+        pids = list(pool.map(_pid, range(2)))
+    finally:
+        pool.shutdown()
+    metrics = pool.metrics()
+
+    assert pids[0] != pids[1]
+    assert metrics.recycles["max_rss"] == 2
+    assert metrics.peak_document_rss_mb > 1
+
+
+def test_pool_propagates_errors_and_survives_crashes():
+    pool = WorkerPool(max_workers=1)
+    try:
+        with pytest.raises(ValueError, match="bad statement"):
+            pool.submit(_fail, "bad statement").result()
+        with pytest.raises(WorkerCrashedError):
+            pool.submit(_die, 0).result()
+        # The crashed worker is replaced transparently.
+        assert pool.submit(_pid, 0).result() > 0
+    finally:
+        pool.shutdown()
+    metrics = pool.metrics()
+
+    assert metrics.tasks_failed == 1
+    assert metrics.recycles == {"crash": 1}
+
+
+def test_pool_replaces_worker_killed_while_idle():
+    pool = WorkerPool(max_workers=1)
+    try:
+        first = pool.submit(_pid, 0).result()
+        os.kill(first, signal.SIGKILL)
+        pool._slots[0].process.join(5)
+        # The next task goes to a fresh worker instead of failing on the dead one's pipe.
+        second = pool.submit(_pid, 0).result()
+        assert pool.submit(_pid, 0).result() == second
+    finally:
+        pool.shutdown()
+
+    assert second != first
+    metrics = pool.metrics()
+    assert metrics.recycles == {"crash": 1}
+    assert metrics.tasks_failed == 0
+
+
+def test_pool_parses_pdfs(statement_pdf):
+    pool = WorkerPool(max_workers=1, max_tasks_per_worker=1)
+    try:
+        results = list(pool.map(parse_pdf, [str(statement_pdf)] * 2))
+    finally:
+        pool.shutdown()
+    assert [r.statement.new_balance for r in results] == [5432.1, 5432.1]
+
+
+def test_metrics_endpoint_reports_pool(tmp_path, monkeypatch, statement_pdf):
+    monkeypatch.setenv("CCE_DATA_DIR", str(tmp_path / "data"))
+    monkeypatch.setenv("CCE_PARSE_WORKERS", "1")
+    with TestClient(app) as client:
+        client.post("/parse", files={"file": ("s.pdf", statement_pdf.read_bytes(), "application/pdf")})
+        metrics = client.get("/metrics").json()
+
+    assert metrics["tasks_completed"] == 1
+    assert metrics["workers"][0]["rss_mb"] > 0